@@ -0,0 +1,15 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  __init__.py
+@Time    :  2026/10/19 19:48:10
+@Author  :  Kevin Wang
+@Desc    :  Offline benchmarks against a local fake NHK server, run with ``python -m benchmarks.run``
+"""
+
+from pathlib import Path
+import sys
+
+# 與 conftest.py 相同，讓 src 內的模組可直接 import
+scripts_path = Path(__file__).resolve().parents[1].joinpath("src")
+if str(scripts_path) not in sys.path:
+    sys.path.append(str(scripts_path))
@@ -0,0 +1,319 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  fake_nhk.py
+@Time    :  2026/10/19 19:52:40
+@Author  :  Kevin Wang
+@Desc    :  Local stand-in for www3.nhk.or.jp and vod-stream.nhk.jp serving synthetic news
+"""
+
+from datetime import (datetime,
+                      timedelta,
+                      timezone,
+                      )
+from email.utils import format_datetime
+from http.server import (BaseHTTPRequestHandler,
+                         ThreadingHTTPServer,
+                         )
+from typing import (Dict,
+                    List,
+                    Optional,
+                    Tuple,
+                    )
+from urllib.parse import urlsplit
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from Crypto.Cipher import AES
+
+JST = timezone(timedelta(hours=9))
+CATEGORIES = range(1, 8)  # 與 NHKNewsType 相同的 7 個分類
+
+def _padding(size:int) -> str:
+    """Inert markup standing in for the navigation, scripts and footers of real pages."""
+    block = '<li class="nav-item"><a href="/news/">ニュース</a></li>\n'
+    return "<!-- padding -->\n<ul>" + block * max(0, size // len(block)) + "</ul>\n"
+
+def _article_text(seed:str, paragraphs:int=6) -> str:
+    rng = random.Random(seed)
+    words = ["東京", "会社", "ニュース", "天気", "電車", "学校", "病院", "地震", "選挙", "試合"]
+    return "\n".join("".join(f"{rng.choice(words)}が{rng.randint(1, 99)}日に変わりました。" for _ in range(8))
+                     for _ in range(paragraphs))
+
+class FakeNHKServer:
+    def __init__(self,
+                 easy_news:int=20,
+                 news_per_category:int=10,
+                 page_size:int=20,
+                 segments:int=5,
+                 segment_size:int=64 * 1024,
+                 page_padding:int=20 * 1024,
+                 latency:float=0.0,
+                 error_rate:float=0.0,
+                 seed:int=0,
+                 host:str="127.0.0.1",
+                 port:int=0,
+                 ) -> None:
+        """HTTP server answering the NHK endpoints the crawlers use with synthetic content.
+
+        Serves ``news-list.json``, the ``catNN_XXX.json`` sheets, article pages that the real
+        parsers understand, and AES-128 encrypted HLS playlists, keys and segments, each with an
+        ETag answered by 304 on a matching ``If-None-Match``. Every response can be delayed by
+        ``latency`` seconds, and a fraction ``error_rate`` of the requests is dropped without a
+        response so that ``MyRequests`` has to retry.
+
+        Example:
+            with FakeNHKServer(latency=0.01) as server:
+                ProjectConfigs.NHK_WEB_BASE_URL = server.url
+                ProjectConfigs.NHK_VOD_BASE_URL = server.url
+
+        Args:
+            easy_news (int, optional): Articles in the NHK Easy news list. Defaults to 20.
+            news_per_category (int, optional): Articles per NHK News category. Defaults to 10.
+            page_size (int, optional): Items per ``catNN_XXX.json`` sheet. Defaults to 20.
+            segments (int, optional): Segments per HLS playlist. Defaults to 5.
+            segment_size (int, optional): Bytes per segment, rounded up to the AES block size.
+                Defaults to 64 KiB.
+            page_padding (int, optional): Extra bytes of markup per article page. Defaults to 20 KiB.
+            latency (float, optional): Seconds to wait before each response. Defaults to 0.
+            error_rate (float, optional): Probability of dropping a request. Defaults to 0.
+            seed (int, optional): Seed of the error injection. Defaults to 0.
+            host (str, optional): Address to bind. Defaults to "127.0.0.1".
+            port (int, optional): Port to bind, 0 picks a free one. Defaults to 0.
+        """
+        self.easy_news = easy_news
+        self.news_per_category = news_per_category
+        self.page_size = page_size
+        self.segments = segments
+        self.segment_size = -(-segment_size // AES.block_size) * AES.block_size
+        self.page_padding = page_padding
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._segment_cache:Dict[Tuple[str, int], bytes] = {}
+        self.requests = 0
+        self.dropped = 0
+        self.not_modified = 0
+        # NHK News 文章 id -> 改版次數，見 revise()
+        self.revisions:Dict[str, int] = {}
+        # 以本機時區產生時間，避免跨日時最新的新聞落在爬蟲的日期範圍之外
+        self.now = datetime.now().astimezone().replace(minute=0, second=0, microsecond=0)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                server.handle(self)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread:Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use for both ``NHK_WEB_BASE_URL`` and ``NHK_VOD_BASE_URL``."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeNHKServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-nhk", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeNHKServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    # 合成資料
+    def easy_items(self) -> List[dict]:
+        """The NHK Easy news list entries, newest first, spread over the last days."""
+        items = []
+        for index in range(self.easy_news):
+            published = (self.now - timedelta(hours=6 * index)).replace(tzinfo=None)
+            news_id = f"ne{published:%Y%m%d}{index:05d}"
+            items.append({"news_id": news_id,
+                          "title": f"やさしいニュース {index}",
+                          "news_publication_time": f"{published:%Y-%m-%d %H:%M:%S}",
+                          "news_preview_time": f"{published:%Y-%m-%d %H:%M:%S}",
+                          "news_creation_time": f"{published:%Y-%m-%d %H:%M:%S}",
+                          "news_prearranged_time": f"{published:%Y-%m-%d %H:%M:%S}",
+                          "news_easy_voice_uri": f"{news_id}_voice.m4a",
+                          })
+        return items
+
+    def revise(self, news_id:str) -> None:
+        """Edit an NHK News article: its text, JSON-LD ``dateModified`` and feed ``pubDate`` change."""
+        self.revisions[news_id] = self.revisions.get(news_id, 0) + 1
+
+    def news_times(self, news_id:str) -> Tuple[datetime, datetime]:
+        """Publication and last modification time of an NHK News article."""
+        category, index = int(news_id[5:7]), int(news_id[7:12])
+        published = self.now - timedelta(hours=2 * index, minutes=category)
+        return published, published + timedelta(minutes=5 * self.revisions.get(news_id, 0))
+
+    def news_text(self, news_id:str) -> str:
+        """Article body of an NHK News page, one sentence rewritten and one paragraph added per revision."""
+        revision = self.revisions.get(news_id, 0)
+        lines = _article_text(news_id).splitlines()
+        if revision:
+            lines[0] = f"{revision}回目の訂正があります。" + lines[0].split("。", 1)[1]
+            lines += [f"{number}回目の続報です。" for number in range(1, revision + 1)]
+        return "\n".join(lines)
+
+    def news_items(self, category:int) -> List[dict]:
+        """The NHK News entries of one category, newest first, every other one with a video."""
+        items = []
+        for index in range(self.news_per_category):
+            news_id = f"k1001{category:02d}{index:05d}1000"
+            published, modified = self.news_times(news_id)
+            items.append({"title": f"ニュース {category}-{index}",
+                          "pubDate": format_datetime(modified),
+                          "link": f"html/{published:%Y%m%d}/{news_id}.html",
+                          "videoPath": f"{news_id}_video.mp4" if index % 2 == 0 else "",
+                          })
+        return items
+
+    def easy_page(self, news_id:str) -> str:
+        published = datetime.strptime(news_id[2:10], "%Y%m%d")
+        return ("<html><head><title>NEWS WEB EASY</title></head><body>\n"
+                + _padding(self.page_padding // 2)
+                + f'<h1 class="article-title"><ruby>{news_id}<rt>にゅーす</rt></ruby></h1>\n'
+                + f'<p class="article-date">{published:%Y年%m月%d日} 19時23分</p>\n'
+                + '<div class="article-body">\n'
+                + "".join(f"<p>{line}</p>\n" for line in _article_text(news_id).splitlines())
+                + "</div>\n"
+                + _padding(self.page_padding // 2)
+                + "</body></html>\n")
+
+    def news_page(self, date:str, news_id:str) -> str:  # pylint: disable=unused-argument
+        published, modified = (value.astimezone(JST) for value in self.news_times(news_id))
+        meta = {"@context": "http://schema.org",
+                "@type": "NewsArticle",
+                "headline": f"ニュース {news_id}",
+                "datePublished": published.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "dateModified": modified.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "genre": ["社会"],
+                "keywords": ["ニュース"],
+                }
+        return ("<html><head><title>NHK NEWS WEB</title>\n"
+                + f'<script type="application/ld+json">{json.dumps(meta, ensure_ascii=False)}</script>\n'
+                + "</head><body>\n"
+                + _padding(self.page_padding // 2)
+                + f'<h1 class="content--title">ニュース {news_id}</h1>\n'
+                + '<div class="content--detail-more">\n'
+                + "".join(f"<p>{line}</p>\n" for line in self.news_text(news_id).splitlines())
+                + "</div>\n"
+                + _padding(self.page_padding // 2)
+                + "</body></html>\n")
+
+    @staticmethod
+    def key(uri:str) -> bytes:
+        """AES-128 key of one media."""
+        return hashlib.md5(uri.encode()).digest()
+
+    def plain_segment(self, uri:str, index:int) -> bytes:
+        """Decrypted content of one segment, what the downloader should end up with."""
+        seed = hashlib.sha256(f"{uri}/{index}".encode()).digest()
+        return (seed * (self.segment_size // len(seed) + 1))[:self.segment_size]
+
+    def segment(self, uri:str, index:int) -> bytes:
+        cached = self._segment_cache.get((uri, index))
+        if cached is None:
+            cipher = AES.new(self.key(uri), AES.MODE_CBC, iv=index.to_bytes(16, "big"))
+            cached = self._segment_cache[(uri, index)] = cipher.encrypt(self.plain_segment(uri, index))
+        return cached
+
+    def playlist(self, uri:str) -> str:
+        # 不指定 IV，由媒體序號推導，與 NHK 的串流相同
+        lines = ["#EXTM3U",
+                 "#EXT-X-VERSION:3",
+                 "#EXT-X-TARGETDURATION:10",
+                 "#EXT-X-MEDIA-SEQUENCE:0",
+                 f'#EXT-X-KEY:METHOD=AES-128,URI="/keys/{uri}.key"',
+                 ]
+        for index in range(self.segments):
+            lines += ["#EXTINF:10.0,", f"{index}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    # HTTP
+    def route(self, path:str) -> Tuple[int, str, bytes]:
+        """Status, content type and body of one GET request."""
+        if path == "/news/easy/news-list.json":
+            grouped:Dict[str, list] = {}
+            for item in self.easy_items():
+                grouped.setdefault(item["news_publication_time"][:10], []).append(item)
+            return 200, "application/json", json.dumps([grouped], ensure_ascii=False).encode()
+        match = re.fullmatch(r"/news/json16/cat(\d{2})_(\d{3})\.json", path)
+        if match:
+            category, sheet = int(match.group(1)), int(match.group(2))
+            if category not in CATEGORIES:
+                return 404, "text/plain", b"not found"
+            items = self.news_items(category)
+            page = items[(sheet - 1) * self.page_size:sheet * self.page_size]
+            channel = {"hasNext": sheet * self.page_size < len(items), "item": page}
+            return 200, "application/json", json.dumps({"channel": channel}, ensure_ascii=False).encode()
+        match = re.fullmatch(r"/news/easy/(\w+)/\1\.html", path)
+        if match:
+            return 200, "text/html; charset=utf-8", self.easy_page(match.group(1)).encode()
+        match = re.fullmatch(r"/news/html/(\d{8})/(\w+)\.html", path)
+        if match:
+            return 200, "text/html; charset=utf-8", self.news_page(match.group(1), match.group(2)).encode()
+        match = re.fullmatch(r"/keys/(\w+)\.key", path)
+        if match:
+            return 200, "application/octet-stream", self.key(match.group(1))
+        match = re.fullmatch(r"/news/(?:easy_audio/)?(\w+)/index\.m3u8", path)
+        if match:
+            return 200, "application/vnd.apple.mpegurl", self.playlist(match.group(1)).encode()
+        match = re.fullmatch(r"/news/(?:easy_audio/)?(\w+)/(\d+)\.ts", path)
+        if match and int(match.group(2)) < self.segments:
+            return 200, "video/mp2t", self.segment(match.group(1), int(match.group(2)))
+        return 404, "text/plain", b"not found"
+
+    def handle(self, handler:BaseHTTPRequestHandler) -> None:
+        with self._random_lock:
+            self.requests += 1
+            drop = self._random.random() < self.error_rate
+            if drop:
+                self.dropped += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if drop:
+            # 不回應直接斷線，客戶端會收到 ConnectionError 並重試
+            handler.close_connection = True
+            return
+        status, content_type, body = self.route(urlsplit(handler.path).path)
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if status == 200 and handler.headers.get("If-None-Match") == etag:
+            # 內容未變動時以 304 回應條件請求
+            with self._random_lock:
+                self.not_modified += 1
+            handler.send_response(304)
+            handler.send_header("ETag", etag)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        if status == 200:
+            handler.send_header("ETag", etag)
+        handler.end_headers()
+        handler.wfile.write(body)
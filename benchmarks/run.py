@@ -0,0 +1,399 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  run.py
+@Time    :  2026/10/19 20:10:05
+@Author  :  Kevin Wang
+@Desc    :  Benchmark scenarios for crawling, HLS download, parsing and exporting
+
+Usage:
+    python -m benchmarks.run                          # all scenarios
+    python -m benchmarks.run crawl_easy hls --latency 0.02 --error-rate 0.05
+    python -m benchmarks.run --items 500 --json .reports/benchmark.json
+    python -m benchmarks.run crawl_easy crawl_news --cassette data/raw/cassettes   # 回放錄下的真實流量
+    python -m benchmarks.run hls_window --segments 64 --latency 0.05             # 片段下載量隨同時請求數增加
+"""
+
+from dataclasses import (asdict,
+                         dataclass,
+                         field,
+                         )
+from datetime import (datetime,
+                      timedelta,
+                      )
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import (Callable,
+                    Dict,
+                    Iterable,
+                    List,
+                    Optional,
+                    )
+import argparse
+import json
+import multiprocessing
+import queue
+import resource
+import sys
+import uuid
+
+from benchmarks.fake_nhk import FakeNHKServer
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("tests/data")
+# 等待子行程結果時，每隔多久檢查一次它是否已經結束
+RESULT_POLL_SECONDS = 1.0
+
+@dataclass
+class Options:
+    """Knobs shared by the scenarios."""
+    items:int=20
+    segments:int=5
+    segment_size:int=64 * 1024
+    latency:float=0.0
+    error_rate:float=0.0
+    batch_size:int=100
+    cassette:Optional[str]=None
+    cassette_timing:str="fast"
+
+@dataclass
+class Result:
+    """Measurements of one scenario."""
+    scenario:str
+    items:int=0
+    seconds:float=0.0
+    latencies:List[float]=field(default_factory=list, repr=False)
+    peak_rss_mb:float=0.0
+    extra:Dict[str, float]=field(default_factory=dict)
+    skipped:Optional[str]=None
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def percentile(self, q:float) -> float:
+        """Nearest-rank percentile of the per-item latencies in seconds."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+    def to_json_dict(self) -> dict:
+        data = asdict(self)
+        del data["latencies"]
+        data.update(throughput=self.throughput,
+                    p50_ms=self.percentile(50) * 1000,
+                    p99_ms=self.percentile(99) * 1000,
+                    )
+        return data
+
+def _timed(iterable:Iterable, result:Result) -> Iterable:
+    """Yield from ``iterable`` while recording the time spent producing each item."""
+    start = last = perf_counter()
+    for item in iterable:
+        now = perf_counter()
+        result.latencies.append(now - last)
+        result.items += 1
+        yield item
+        last = perf_counter()
+    result.seconds = perf_counter() - start
+
+def _point_at(server_url:str, options:Options) -> None:
+    """Send the crawler requests to the fake server, or replay them from a recorded cassette."""
+    from config import ProjectConfigs  # pylint: disable=import-outside-toplevel
+    ProjectConfigs.REQUEST_LAPSE = 0
+    if options.cassette:
+        ProjectConfigs.CASSETTE_MODE = "replay"
+        ProjectConfigs.CASSETTE_DIR = Path(options.cassette)
+        ProjectConfigs.CASSETTE_TIMING = options.cassette_timing
+        return
+    ProjectConfigs.NHK_WEB_BASE_URL = server_url
+    ProjectConfigs.NHK_VOD_BASE_URL = server_url
+
+def _synthetic_news(count:int) -> list:
+    from objects import (HTMLContent,  # pylint: disable=import-outside-toplevel
+                         Media,
+                         News,
+                         )
+    published = datetime(2024, 12, 5, 16, 0)
+    news = []
+    for index in range(count):
+        html_content = HTMLContent(status=200,
+                                   id=f"k{index}",
+                                   url=f"https://example.com/k{index}.html",
+                                   filepath=None,
+                                   title=f"title {index}",
+                                   article="東京の会社が勉強会をしました。" * 40,
+                                   publication_time=published - timedelta(hours=index),
+                                   download_time=published,
+                                   )
+        media = Media(status=200,
+                      id=f"v{index}",
+                      type="Audio",
+                      url=f"https://example.com/v{index}.m3u8",
+                      download_time=published,
+                      )
+        news.append(News("NHK Easy Web", f"k{index}", f"title {index}", html_content.url,
+                         html_content.publication_time, published, None, media, html_content))
+    return news
+
+# 各情境：在子行程內執行，回傳量測結果
+def bench_crawl_easy(server_url:str, options:Options, result:Result) -> None:
+    from crawler import NHKEasyWebCrawler  # pylint: disable=import-outside-toplevel
+    _point_at(server_url, options)
+    with TemporaryDirectory() as tmp:
+        news = NHKEasyWebCrawler().iter_recent_news(start_date=datetime.now() - timedelta(days=300),
+                                                    save_dir=Path(tmp),
+                                                    )
+        for _ in _timed(news, result):
+            pass
+
+def bench_crawl_news(server_url:str, options:Options, result:Result) -> None:
+    from crawler import NHKWebCrawler  # pylint: disable=import-outside-toplevel
+    _point_at(server_url, options)
+    with TemporaryDirectory() as tmp:
+        news = NHKWebCrawler().iter_recent_news(start_date=datetime.now() - timedelta(days=300),
+                                                save_dir=Path(tmp),
+                                                )
+        for _ in _timed(news, result):
+            pass
+
+def bench_hls(server_url:str, options:Options, result:Result) -> None:
+    from storage import MediaStore  # pylint: disable=import-outside-toplevel
+    from utils import HLSMediaDownloader  # pylint: disable=import-outside-toplevel
+    if options.cassette:
+        result.skipped = "downloads synthetic media, not replayable from a cassette"
+        return
+    _point_at(server_url, options)
+    with TemporaryDirectory() as tmp:
+        store = MediaStore(Path(tmp))
+        downloads = (HLSMediaDownloader().save(f"{server_url}/news/easy_audio/bench{index}/index.m3u8",
+                                               f"bench{index}.mp3",
+                                               store=store,
+                                               )
+                     for index in range(options.items))
+        size = sum(path.stat().st_size for path in _timed(downloads, result))
+    if result.seconds:
+        result.extra["segments_per_second"] = result.items * options.segments / result.seconds
+        result.extra["mb_per_second"] = size / 2**20 / result.seconds
+
+# hls_window 依序比較的同時請求數，與伺服器延遲為 0 時代替的延遲（延遲為 0 時平行下載沒有可節省的等待）
+HLS_WINDOWS = (1, 2, 4, 8, 16)
+HLS_WINDOW_MIN_LATENCY = 0.02
+
+def bench_hls_window(server_url:str, options:Options, result:Result) -> None:
+    """Segment throughput of one HLS download for a fixed concurrency window of 1, 2, 4, ... requests.
+
+    The window is pinned by setting the initial and maximum AIMD limit and the segment workers
+    to the same value, so ``extra`` shows what the adaptive control gains when it opens up.
+    """
+    from config import ProjectConfigs  # pylint: disable=import-outside-toplevel
+    from utils import HLSMediaDownloader  # pylint: disable=import-outside-toplevel
+    if options.cassette:
+        result.skipped = "downloads synthetic media, not replayable from a cassette"
+        return
+    latency = max(options.latency, HLS_WINDOW_MIN_LATENCY)
+    with FakeNHKServer(segments=options.segments,
+                       segment_size=options.segment_size,
+                       latency=latency,
+                       error_rate=options.error_rate,
+                       ) as server:
+        # 片段的 host 只受同時請求數控制，不受 HOST_RATE_LIMIT 影響
+        _point_at(server.url, options)
+        start = perf_counter()
+        for window in HLS_WINDOWS:
+            ProjectConfigs.HOST_CONCURRENCY_INITIAL = ProjectConfigs.HOST_CONCURRENCY_MAX = window
+            ProjectConfigs.HLS_SEGMENT_WORKERS = window
+            downloader = HLSMediaDownloader()
+            playlists = downloader.fetch_playlist(f"{server.url}/news/easy_audio/window{window}/index.m3u8")
+            segments = sum(len(playlist.segments) for playlist in playlists)
+            began = perf_counter()
+            for playlist in playlists:
+                downloader.download_m3u8(playlist)
+            seconds = perf_counter() - began
+            result.latencies.append(seconds)
+            result.items += segments
+            result.extra[f"window_{window}_segments_per_second"] = segments / seconds
+        result.seconds = perf_counter() - start
+    result.extra["server_latency_ms"] = latency * 1000
+
+def bench_parse(server_url:str, options:Options, result:Result) -> None:
+    from crawler import (NHKEasyWebCrawler,  # pylint: disable=import-outside-toplevel
+                         NHKWebCrawler,
+                         )
+    pages = []
+    for path in sorted(FIXTURE_DIR.glob("*.html")):
+        content = path.read_bytes()
+        is_easy = b"NEWS WEB EASY" in content
+        pages.append((NHKEasyWebCrawler.parse_html if is_easy else NHKWebCrawler.parse_html, content))
+
+    def parse_all():
+        for index in range(options.items):
+            parse, content = pages[index % len(pages)]
+            yield parse(content)
+
+    for _ in _timed(parse_all(), result):
+        pass
+
+def _bench_export(exporter, options:Options, result:Result) -> None:
+    news = _synthetic_news(options.items)
+    batches = (exporter.insert_many(news[i:i + options.batch_size])
+               for i in range(0, len(news), options.batch_size))
+    for _ in _timed(batches, result):
+        pass
+    # 以批次量測延遲，吞吐量仍以則數計算
+    result.items = len(news)
+
+def bench_export_postgresql(server_url:str, options:Options, result:Result) -> None:
+    import psycopg2  # pylint: disable=import-outside-toplevel
+    from export import Export2PostgreSQL  # pylint: disable=import-outside-toplevel
+    from spool import DeadLetterSpool  # pylint: disable=import-outside-toplevel
+    with TemporaryDirectory() as tmp:
+        exporter = Export2PostgreSQL(schema=f"benchmark_{uuid.uuid4().hex[:8]}",
+                                     spool=DeadLetterSpool(Path(tmp)),
+                                     )
+        try:
+            exporter.conn
+        except psycopg2.OperationalError as err:
+            result.skipped = f"PostgreSQL not available: {err}".strip()
+            return
+        try:
+            _bench_export(exporter, options, result)
+        finally:
+            exporter.cursor.execute(f'DROP SCHEMA "{exporter.schema}" CASCADE;')
+            exporter.conn.commit()
+            exporter.close()
+
+def bench_export_parquet(server_url:str, options:Options, result:Result) -> None:
+    from export import (Export2Parquet,  # pylint: disable=import-outside-toplevel
+                        pyarrow,
+                        )
+    if pyarrow is None:
+        result.skipped = "pyarrow not installed"
+        return
+    with TemporaryDirectory() as tmp, Export2Parquet(root=Path(tmp)) as exporter:
+        _bench_export(exporter, options, result)
+
+SCENARIOS:Dict[str, Callable[[str, Options, Result], None]] = {
+    "crawl_easy": bench_crawl_easy,
+    "crawl_news": bench_crawl_news,
+    "hls": bench_hls,
+    "hls_window": bench_hls_window,
+    "parse": bench_parse,
+    "export_postgresql": bench_export_postgresql,
+    "export_parquet": bench_export_parquet,
+}
+
+def _run_in_child(name:str, server_url:str, options:Options, results) -> None:
+    result = Result(scenario=name)
+    SCENARIOS[name](server_url, options, result)
+    # Linux 的 ru_maxrss 單位為 KiB，macOS 為 bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result.peak_rss_mb = peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    results.put(result)
+
+def run_scenario(name:str,
+                 server_url:str,
+                 options:Options,
+                 ) -> Result:
+    """Run one scenario in a fresh process so that its peak RSS is its own.
+
+    Args:
+        name (str): One of ``SCENARIOS``.
+        server_url (str): Base URL of the fake NHK server.
+        options (Options): Scenario options.
+
+    Raises:
+        RuntimeError: The scenario process failed.
+
+    Returns:
+        Result: The measurements.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_in_child, args=(name, server_url, options, results))
+    process.start()
+    # 必須先取出結果再 join：結果大於 pipe 緩衝區時，子行程要等到結果被讀走才能結束
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+            # 子行程結束前已寫完的結果仍留在 pipe 中，最後再讀一次
+            try:
+                result = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                break
+    process.join()
+    if process.exitcode != 0 or result is None:
+        raise RuntimeError(f"Scenario {name} failed with exit code {process.exitcode}")
+    return result
+
+def format_table(results:List[Result]) -> str:
+    header = f"{'scenario':<18}{'items':>7}{'seconds':>9}{'items/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>8}  extra"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        if result.skipped:
+            lines.append(f"{result.scenario:<18}skipped: {result.skipped}")
+            continue
+        extra = ", ".join(f"{key}={value:.1f}" for key, value in result.extra.items())
+        lines.append(f"{result.scenario:<18}{result.items:>7}{result.seconds:>9.2f}{result.throughput:>10.1f}"
+                     f"{result.percentile(50) * 1000:>9.1f}{result.percentile(99) * 1000:>9.1f}"
+                     f"{result.peak_rss_mb:>8.1f}  {extra}")
+    return "\n".join(lines)
+
+def main(argv:Optional[List[str]]=None) -> List[Result]:
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a fake NHK server")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"scenarios to run, all by default: {', '.join(SCENARIOS)}")
+    parser.add_argument("--items", type=int, default=Options.items,
+                        help="news per crawler, media downloads, parsed pages and exported news")
+    parser.add_argument("--segments", type=int, default=Options.segments, help="segments per HLS playlist")
+    parser.add_argument("--segment-size", type=int, default=Options.segment_size, help="bytes per segment")
+    parser.add_argument("--latency", type=float, default=Options.latency, help="server latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=Options.error_rate,
+                        help="fraction of requests dropped by the server")
+    parser.add_argument("--batch-size", type=int, default=Options.batch_size, help="news per export batch")
+    parser.add_argument("--cassette", help="replay the crawl scenarios from this recorded cassette directory")
+    parser.add_argument("--cassette-timing", choices=["original", "fast"], default=Options.cassette_timing,
+                        help="replay with the recorded response times or as fast as possible")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}, expected some of {list(SCENARIOS)}")
+
+    options = Options(items=args.items,
+                      segments=args.segments,
+                      segment_size=args.segment_size,
+                      latency=args.latency,
+                      error_rate=args.error_rate,
+                      batch_size=args.batch_size,
+                      cassette=args.cassette,
+                      cassette_timing=args.cassette_timing,
+                      )
+    server = FakeNHKServer(easy_news=options.items,
+                           # 7 個分類合計約 items 則
+                           news_per_category=max(1, -(-options.items // 7)),
+                           segments=options.segments,
+                           segment_size=options.segment_size,
+                           latency=options.latency,
+                           error_rate=options.error_rate,
+                           )
+    results = []
+    with server:
+        for name in args.scenarios or list(SCENARIOS):
+            results.append(run_scenario(name, server.url, options))
+    print(format_table(results))
+    print(f"fake server: {server.requests} requests, {server.dropped} dropped")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps({"options": asdict(options),
+                                         "results": [result.to_json_dict() for result in results],
+                                         }, indent=2), encoding="utf-8")
+    return results
+
+if __name__ == "__main__":
+    main()
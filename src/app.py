@@ -1,23 +1,140 @@
 # app.py
-from flask import Flask, request, jsonify
-from main import run_nhk_easy_crawler, run_nhk_crawler
+from datetime import datetime
+from functools import partial
+from hashlib import md5
+import json
+import os
+
+from flask import Flask, Response, request, jsonify, stream_with_context, url_for
+from cache import TTLCache
+from jobs import JobManager
+from metrics import REGISTRY
+from main import (get_news,
+                  iter_nhk_crawler,
+                  iter_nhk_easy_crawler,
+                  list_news,
+                  run_all_crawlers,
+                  run_nhk_crawler,
+                  run_nhk_easy_crawler,
+                  search_news,
+                  )
 
 def get_dates():
     # GET/POST 一樣從 values 取
     return request.values.get("start_date"), request.values.get("end_date")
 
+def get_time_budget():
+    # 爬取的時間上限（秒），超過 Flask 或 proxy 的逾時前結束，剩下的留給下一次
+    time_budget = request.values.get("time_budget")
+    if not time_budget:
+        return None
+    time_budget = float(time_budget)
+    if time_budget < 0:
+        raise ValueError("time_budget must not be negative")
+    return time_budget
+
+def validate_dates(start_date, end_date):
+    # 提早檢查格式，避免排入一定會失敗的 job
+    for date in (start_date, end_date):
+        if date:
+            datetime.strptime(date, "%Y-%m-%d")
+
+def wants_stream():
+    return request.values.get("stream", "").lower() in ("1", "true", "yes")
+
+def stream_news(news_iter):
+    """每爬到一筆就送出一行 NDJSON；開始送出後無法再改 HTTP status，錯誤以最後一行回報"""
+    def generate():
+        try:
+            for news in news_iter:
+                yield json.dumps(news.to_json_dict(), ensure_ascii=False) + "\n"
+        except Exception as err:  # pylint: disable=broad-except
+            yield json.dumps({"status": "error", "message": str(err)}, ensure_ascii=False) + "\n"
+    return Response(stream_with_context(generate()),
+                    mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"},  # 避免 nginx 等 proxy 累積整個回應
+                    )
+
+def crawl_job(crawler):
+    def runner(params, progress):
+        count = 0
+        def on_news(_):
+            nonlocal count
+            count += 1
+            progress(count)
+        return crawler(on_news=on_news, **params)
+    return runner
+
 app = Flask(__name__)
 app.json.ensure_ascii = False   # 關掉 unicode escape
 
+# 背景執行爬蟲的 job，同樣參數的 job 執行中時不會重複啟動
+job_manager = JobManager({"easy": crawl_job(run_nhk_easy_crawler),
+                          "news": crawl_job(run_nhk_crawler),
+                          # 同時爬取所有來源
+                          "all": crawl_job(run_all_crawlers),
+                          # 只抓新文章與改版過的文章
+                          "refresh": crawl_job(partial(run_nhk_crawler, refresh=True)),
+                          },
+                         max_workers=int(os.getenv("JOB_WORKERS", "2")),
+                         )
+
+# 讀取 API 的回應快取，key 為完整的網址（含 query string）
+read_cache = TTLCache(max_size=int(os.getenv("READ_CACHE_SIZE", "256")),
+                      ttl=float(os.getenv("READ_CACHE_TTL", "60")),
+                      )
+
+def last_modified_of(*times):
+    # 資料庫的時間為本地時間，轉為帶時區的時間才能正確換算成 HTTP 日期
+    times = [datetime.fromisoformat(time) for time in times if time]
+    return max(times).astimezone() if times else None
+
+def cached_json(build):
+    """回應快取在記憶體中，並附上 ETag / Last-Modified，client 可用條件請求取得 304
+
+    build() 回傳 (payload, last_modified)，資料不存在時回傳 None（不快取）。
+    """
+    entry = read_cache.get(request.full_path)
+    if entry is None:
+        result = build()
+        if result is None:
+            return jsonify(status="error", message="not found"), 404
+        payload, last_modified = result
+        body = json.dumps(payload, ensure_ascii=False)
+        entry = (body, md5(body.encode("utf-8")).hexdigest(), last_modified)
+        read_cache.set(request.full_path, entry)
+    body, etag, last_modified = entry
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = int(read_cache.ttl)
+    return response.make_conditional(request)
+
 @app.route("/status", methods=["GET"])
 def status_check():
     return jsonify(status="ok"), 200
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/crawler/easy", methods=["GET","POST"])
 def crawler_easy():
     start_date, end_date = get_dates()
+    try:
+        time_budget = get_time_budget()
+    except ValueError as err:
+        return jsonify(status="error", message=str(err)), 400
+    if wants_stream():
+        try:
+            validate_dates(start_date, end_date)
+        except ValueError as err:
+            return jsonify(status="error", message=str(err)), 400
+        return stream_news(iter_nhk_easy_crawler(start_date=start_date, end_date=end_date, time_budget=time_budget))
     data = run_nhk_easy_crawler(start_date=start_date,
                                 end_date=end_date,
+                                time_budget=time_budget,
                                 )
     return jsonify(status="success",
                    count=len(data),
@@ -27,16 +144,108 @@ def crawler_easy():
 @app.route("/crawler/news", methods=["GET","POST"])
 def crawler_news():
     start_date, end_date = get_dates()
+    try:
+        time_budget = get_time_budget()
+    except ValueError as err:
+        return jsonify(status="error", message=str(err)), 400
+    if wants_stream():
+        try:
+            validate_dates(start_date, end_date)
+        except ValueError as err:
+            return jsonify(status="error", message=str(err)), 400
+        return stream_news(iter_nhk_crawler(start_date=start_date, end_date=end_date, time_budget=time_budget))
     data = run_nhk_crawler(start_date=start_date,
                            end_date=end_date,
+                           time_budget=time_budget,
+                           )
+    return jsonify(status="success",
+                   count=len(data),
+                   data=data,
+                   )
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    kind = request.values.get("kind")
+    start_date, end_date = get_dates()
+    if kind not in job_manager.runners:
+        return jsonify(status="error", message=f"kind must be one of {list(job_manager.runners)}"), 400
+    try:
+        validate_dates(start_date, end_date)
+        time_budget = get_time_budget()
+    except ValueError as err:
+        return jsonify(status="error", message=str(err)), 400
+    params = {"start_date": start_date, "end_date": end_date}
+    if time_budget is not None:
+        params["time_budget"] = time_budget
+    job, created = job_manager.submit(kind, params)
+    response = jsonify(status="accepted" if created else "in_progress",
+                       job=job.to_json_dict(include_result=False),
+                       url=url_for("get_job", job_id=job.id),
+                       )
+    response.headers["Location"] = url_for("get_job", job_id=job.id)
+    return response, 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify(status="error", message="job not found"), 404
+    return jsonify(status="success",
+                   job=job.to_json_dict(),
+                   )
+
+@app.route("/news", methods=["GET"])
+def news_list():
+    start_date, end_date = get_dates()
+    try:
+        validate_dates(start_date, end_date)
+        limit = min(max(int(request.args.get("limit", 50)), 1), 500)
+        def build():
+            data, next_cursor = list_news(source=request.args.get("source"),
+                                          start_date=start_date,
+                                          end_date=end_date,
+                                          cursor=request.args.get("cursor"),
+                                          limit=limit,
+                                          )
+            return ({"status": "success", "count": len(data), "data": data, "next_cursor": next_cursor},
+                    last_modified_of(*(news["download_time"] for news in data)))
+        return cached_json(build)
+    except ValueError as err:
+        return jsonify(status="error", message=str(err)), 400
+
+@app.route("/news/<news_id>", methods=["GET"])
+def news_detail(news_id):
+    def build():
+        news = get_news(news_id)
+        if news is None:
+            return None
+        times = [news["download_time"]] + [news[key]["download_time"]
+                                           for key in ("media", "html_content") if news[key]]
+        return {"status": "success", "data": news}, last_modified_of(*times)
+    return cached_json(build)
+
+@app.route("/search", methods=["GET"])
+def search():
+    query = request.args.get("q", "")
+    if not query.strip():
+        return jsonify(status="error", message="missing query parameter q"), 400
+    start_date, end_date = get_dates()
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+        data = search_news(query,
+                           start_date=start_date,
+                           end_date=end_date,
+                           source=request.args.get("source"),
+                           limit=limit,
                            )
+    except ValueError as err:
+        return jsonify(status="error", message=str(err)), 400
     return jsonify(status="success",
                    count=len(data),
                    data=data,
                    )
 
 if __name__ == "__main__":
-    import os
     app.run(host="0.0.0.0",
             port=int(os.getenv("SERVICE_PORT")),
             debug=True,
@@ -0,0 +1,316 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  budget.py
+@Time    :  2026/10/19 23:58:12
+@Author  :  Kevin Wang
+@Desc    :  Process-wide HTTP resources shared by every crawler: connection pool, rate, concurrency and bandwidth limits
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from statistics import median
+from time import (monotonic,
+                  sleep,
+                  )
+from typing import (Dict,
+                    FrozenSet,
+                    Iterable,
+                    Iterator,
+                    Optional,
+                    Tuple,
+                    )
+from urllib.parse import urlsplit
+import threading
+
+from requests.adapters import HTTPAdapter
+import requests
+
+from cassette import get_cassette_adapter
+from config import ProjectConfigs
+from metrics import (BANDWIDTH_WAIT_SECONDS,
+                     HOST_CONCURRENCY_ADJUSTMENTS,
+                     HOST_CONCURRENCY_LIMIT,
+                     HTTP_RATE_LIMIT_SECONDS,
+                     )
+from tracing import span
+
+class HostRateLimiter:
+    def __init__(self, rate:float, exempt:Iterable[str]=()) -> None:
+        """Space out request starts to at most ``rate`` per second for each host.
+
+        Every caller reserves the next free slot of its host under a lock and then sleeps until
+        the slot outside of it, so threads crawling different hosts never wait on each other and
+        threads sharing a host are served in arrival order.
+
+        Args:
+            rate (float): Requests per second per host, 0 or less disables the limit.
+            exempt (Iterable[str], optional): Hosts throttled by ``HostConcurrency`` alone, e.g.
+                the HLS segment CDN, whose throughput should grow with the adaptive window.
+                Defaults to ().
+        """
+        self.rate = rate
+        self.exempt = frozenset(exempt)
+        self._next:Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host:str) -> float:
+        """Block until ``host`` may be requested again.
+
+        Returns:
+            float: Seconds waited.
+        """
+        if self.rate <= 0 or host in self.exempt:
+            return 0.0
+        with self._lock:
+            now = monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + 1 / self.rate
+        delay = start - now
+        if delay > 0:
+            with span("http.rate_limit"):
+                sleep(delay)
+            HTTP_RATE_LIMIT_SECONDS.labels(host=host).inc(delay)
+        return delay
+
+class BandwidthLimiter:
+    def __init__(self, rate:float) -> None:
+        """Token bucket capping the bytes per second downloaded by all callers together.
+
+        The bucket holds at most one second of budget. A caller reports what it has just
+        downloaded and sleeps off any debt, so a segment larger than the bucket still goes
+        through and the average rate stays at ``rate``.
+
+        Args:
+            rate (float): Bytes per second, 0 or less disables the cap.
+        """
+        self.rate = rate
+        self._available = rate
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes:int) -> float:
+        """Account for ``nbytes`` downloaded and wait until the average rate is back under the cap.
+
+        Returns:
+            float: Seconds waited.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = monotonic()
+            self._available = min(self.rate, self._available + (now - self._last) * self.rate) - nbytes
+            self._last = now
+            delay = -self._available / self.rate if self._available < 0 else 0.0
+        if delay > 0:
+            with span("bandwidth.wait"):
+                sleep(delay)
+            BANDWIDTH_WAIT_SECONDS.inc(delay)
+        return delay
+
+@dataclass
+class RequestOutcome:
+    """Filled in by the caller holding a concurrency slot, e.g. ``failed`` for a 5xx answer."""
+    failed:bool=False
+
+class AIMDLimit:
+    def __init__(self,
+                 host:str,
+                 initial:float,
+                 maximum:float,
+                 minimum:float=1,
+                 tolerance:float=2.0,
+                 backoff:float=0.5,
+                 window:int=50,
+                 latency_floor:float=0.05,
+                 ) -> None:
+        """Concurrent requests allowed to one host, tuned additive-increase / multiplicative-decrease.
+
+        Every healthy request completed while the limit is saturated raises it by ``1 / limit``,
+        i.e. by one after a full round of requests. A request that fails (timeout, connection
+        error, 429 or 5xx) or takes longer than ``tolerance`` times the fastest of the last
+        ``window`` latencies multiplies the limit by ``backoff``, at most once per median
+        latency so that a burst of failures of requests sent together counts as one signal.
+
+        Args:
+            host (str): Host name, used for the metrics.
+            initial (float): Limit before anything is observed.
+            maximum (float): Upper bound of the limit.
+            minimum (float, optional): Lower bound of the limit. Defaults to 1.
+            tolerance (float, optional): Latency over the baseline still counted as healthy.
+                Defaults to 2.0.
+            backoff (float, optional): Factor applied on degradation. Defaults to 0.5.
+            window (int, optional): Latencies the baseline is taken from. Defaults to 50.
+            latency_floor (float, optional): Latencies below this many seconds are always
+                healthy, so jitter on fast answers does not shrink the limit. Defaults to 0.05.
+        """
+        self.host = host
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.latency_floor = latency_floor
+        self.limit = min(max(float(initial), self.minimum), self.maximum)
+        self.in_flight = 0
+        self._waiting = 0
+        self._latencies = deque(maxlen=window)
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+        HOST_CONCURRENCY_LIMIT.labels(host=host).set(int(self.limit))
+
+    def acquire(self) -> None:
+        """Wait until fewer than ``limit`` requests are in flight."""
+        with self._condition:
+            self._waiting += 1
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self._waiting -= 1
+            self.in_flight += 1
+
+    def release(self, latency:float, failed:bool) -> None:
+        """Record the outcome of a request started with ``acquire`` and adjust the limit."""
+        with self._condition:
+            saturated = self.in_flight >= int(self.limit) or self._waiting > 0
+            self.in_flight -= 1
+            before = int(self.limit)
+            baseline = min(self._latencies) if self._latencies else latency
+            if not failed:
+                self._latencies.append(latency)
+            if failed or latency > max(self.latency_floor, self.tolerance * baseline):
+                now = monotonic()
+                round_trip = median(self._latencies) if self._latencies else latency
+                if now - self._last_decrease >= round_trip:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif saturated:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if int(self.limit) != before:
+                HOST_CONCURRENCY_LIMIT.labels(host=self.host).set(int(self.limit))
+                HOST_CONCURRENCY_ADJUSTMENTS.labels(host=self.host,
+                                                    direction="increase" if self.limit > before else "decrease",
+                                                    ).inc()
+            self._condition.notify_all()
+
+class HostConcurrency:
+    def __init__(self, initial:float, maximum:float) -> None:
+        """An ``AIMDLimit`` per host, so a slow host is throttled without holding back the others.
+
+        Args:
+            initial (float): Starting limit of every host.
+            maximum (float): Upper bound of every host's limit, 0 or less disables the control.
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self._limits:Dict[str, AIMDLimit] = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, host:str) -> AIMDLimit:
+        with self._lock:
+            limit = self._limits.get(host)
+            if limit is None:
+                limit = self._limits[host] = AIMDLimit(host, self.initial, self.maximum)
+            return limit
+
+    @contextmanager
+    def slot(self, host:str) -> Iterator[RequestOutcome]:
+        """Hold one of the host's concurrent request slots while the request is sent.
+
+        Example:
+            with concurrency.slot(host) as outcome:
+                response = session.get(url)
+                outcome.failed = response.status_code >= 500
+
+        An exception leaving the block counts as a failure.
+        """
+        outcome = RequestOutcome()
+        if self.maximum <= 0:
+            yield outcome
+            return
+        limit = self.limit_for(host)
+        with span("http.concurrency"):
+            limit.acquire()
+        start = monotonic()
+        try:
+            yield outcome
+        except BaseException:
+            outcome.failed = True
+            raise
+        finally:
+            limit.release(monotonic() - start, outcome.failed)
+
+# 以設定值為 key 的共用物件，測試或設定變更後會建立新的一份
+_sessions:Dict[Tuple[int, Optional[int]], requests.Session] = {}
+_limiters:Dict[Tuple[float, FrozenSet[str]], HostRateLimiter] = {}
+_download_slots:Dict[int, threading.BoundedSemaphore] = {}
+_bandwidth_limiters:Dict[float, BandwidthLimiter] = {}
+_concurrency:Dict[Tuple[float, float], HostConcurrency] = {}
+_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """The session shared by every ``MyRequests``, its pool keeps ``HTTP_POOL_SIZE`` connections per host.
+
+    Requests only pass per-call headers and never change the session itself, so one session can
+    serve all crawler threads; the cassette adapter is mounted when ``CASSETTE_MODE`` is set.
+    """
+    adapter = get_cassette_adapter()
+    key = (ProjectConfigs.HTTP_POOL_SIZE, id(adapter) if adapter is not None else None)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = requests.Session()
+            if adapter is None:
+                adapter = HTTPAdapter(pool_connections=ProjectConfigs.HTTP_POOL_SIZE,
+                                      pool_maxsize=ProjectConfigs.HTTP_POOL_SIZE,
+                                      )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return session
+
+def get_host_limiter() -> HostRateLimiter:
+    """The limiter shared by every ``MyRequests``, allowing ``HOST_RATE_LIMIT`` requests per second per host.
+
+    While the adaptive concurrency is on (``HOST_CONCURRENCY_MAX`` > 0), the media host of
+    ``NHK_VOD_BASE_URL`` is left to it alone: a fixed rate would cap parallel segment downloads
+    no matter how far the window opens, while the window already backs off on errors and latency.
+    """
+    exempt = frozenset([urlsplit(ProjectConfigs.NHK_VOD_BASE_URL).netloc]
+                       if ProjectConfigs.HOST_CONCURRENCY_MAX > 0 else [])
+    key = (ProjectConfigs.HOST_RATE_LIMIT, exempt)
+    with _lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = HostRateLimiter(*key)
+        return limiter
+
+def get_host_concurrency() -> HostConcurrency:
+    """The adaptive per-host concurrency shared by every ``MyRequests``, between 1 and ``HOST_CONCURRENCY_MAX``."""
+    key = (ProjectConfigs.HOST_CONCURRENCY_INITIAL, ProjectConfigs.HOST_CONCURRENCY_MAX)
+    with _lock:
+        concurrency = _concurrency.get(key)
+        if concurrency is None:
+            concurrency = _concurrency[key] = HostConcurrency(*key)
+        return concurrency
+
+def get_bandwidth_limiter() -> BandwidthLimiter:
+    """The cap shared by every HLS download, ``MEDIA_BANDWIDTH_LIMIT`` bytes per second in total."""
+    rate = ProjectConfigs.MEDIA_BANDWIDTH_LIMIT
+    with _lock:
+        limiter = _bandwidth_limiters.get(rate)
+        if limiter is None:
+            limiter = _bandwidth_limiters[rate] = BandwidthLimiter(rate)
+        return limiter
+
+@contextmanager
+def download_slot() -> Iterator[None]:
+    """Hold one of the ``DOWNLOAD_CONCURRENCY`` media download slots shared by all crawlers."""
+    size = max(1, ProjectConfigs.DOWNLOAD_CONCURRENCY)
+    with _lock:
+        slots = _download_slots.get(size)
+        if slots is None:
+            slots = _download_slots[size] = threading.BoundedSemaphore(size)
+    with span("download.slot"):
+        slots.acquire()
+    try:
+        yield
+    finally:
+        slots.release()
@@ -0,0 +1,326 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  cache.py
+@Time    :  2026/10/19 18:48:30
+@Author  :  Kevin Wang
+@Desc    :  In-process caches and the on-disk HTTP response cache
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+from hashlib import sha256
+from pathlib import Path
+from time import (monotonic,
+                  time,
+                  )
+from typing import (Any,
+                    Callable,
+                    Dict,
+                    Hashable,
+                    Optional,
+                    Tuple,
+                    Union,
+                    )
+import json
+import threading
+
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+import requests
+
+from cassette import (DROPPED_HEADERS,
+                      request_key,
+                      )
+from config import ProjectConfigs
+from storage import RawStorage
+
+class TTLCache:
+    def __init__(self,
+                 max_size:int=256,
+                 ttl:float=60,
+                 ) -> None:
+        """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being stored.
+
+        Args:
+            max_size (int, optional): Entries kept, the least recently used is evicted first.
+                Defaults to 256.
+            ttl (float, optional): Lifetime of an entry in seconds, 0 disables the cache.
+                Defaults to 60.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries:"OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key:Hashable) -> Optional[Any]:
+        """The cached value, None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key:Hashable, value:Any) -> None:
+        """Store a value, evicting the least recently used entries beyond ``max_size``."""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key:Hashable, factory:Callable[[], Any]) -> Any:
+        """Return the cached value or compute, store and return it.
+
+        Concurrent misses of the same key may each call ``factory``; the last result wins.
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class HTTPDiskCache:
+    def __init__(self,
+                 root:Union[str, Path],
+                 ttl:float=0,
+                 max_bytes:int=512 << 20,
+                 compression:Optional[str]=ProjectConfigs.RAW_COMPRESSION,
+                 ) -> None:
+        """On-disk cache of GET responses, revalidated with conditional requests.
+
+        A stored response younger than ``ttl`` seconds is served without touching the network.
+        An older one is revalidated with ``If-None-Match`` / ``If-Modified-Since``; a 304 answer
+        refreshes it and the stored body is served again. Requests are matched like the cassette
+        does, ignoring the ``_`` cache-buster, so polling ``news-list.json`` reuses one entry.
+        Once the cache grows beyond ``max_bytes``, the least recently used entries are evicted.
+
+        Each entry is a metadata file and a (compressed) body under a sharded layout:
+        ``root/ab/cd/{sha256 of the request key}.json`` and ``.body``.
+
+        Args:
+            root (Union[str, Path]): Cache directory.
+            ttl (float, optional): Seconds a response is served without revalidation.
+                Defaults to 0 (always revalidate).
+            max_bytes (int, optional): Disk space of all entries. Defaults to 512 MiB.
+            compression (Optional[str], optional): Body compression, None, "gzip" or "zstd".
+                Defaults to ``ProjectConfigs.RAW_COMPRESSION``.
+        """
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._storage = RawStorage(self.root, compression=compression)
+        self._lock = threading.Lock()
+        # digest -> [佔用位元組數, 最後使用時間]，第一次使用時由磁碟重建
+        self._index:Optional[Dict[str, list]] = None
+
+    def _load_index(self) -> Dict[str, list]:
+        if self._index is None:
+            index = {}
+            for path in self._storage.iter_files(".json"):
+                digest = path.name.split(".", 1)[0]
+                body = self._storage.locate(digest, ".body")
+                index[digest] = [path.stat().st_size + (body.stat().st_size if body else 0),
+                                 path.stat().st_mtime,
+                                 ]
+            self._index = index
+        return self._index
+
+    @staticmethod
+    def _digest(url:str) -> str:
+        return sha256(request_key("GET", url).encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load_index())
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(size for size, _ in self._load_index().values())
+
+    def lookup(self, url:str) -> Optional[dict]:
+        """The stored entry of a GET request, None if not cached.
+
+        Args:
+            url (str): Full URL including the query string.
+
+        Returns:
+            Optional[dict]: Entry metadata (status, headers, validators, stored time).
+        """
+        digest = self._digest(url)
+        path = self._storage.locate(digest, ".json")
+        if path is None or self._storage.locate(digest, ".body") is None:
+            return None
+        try:
+            entry = json.loads(self._storage.read(digest, ".json"))
+        except (OSError, ValueError):
+            return None
+        entry["digest"] = digest
+        return entry
+
+    def is_fresh(self, entry:dict) -> bool:
+        """Whether the entry may be served without asking the server."""
+        return time() - entry["stored_time"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry:dict) -> Dict[str, str]:
+        """Validators to send when revalidating the entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def response(self, entry:dict, url:str) -> Optional[requests.Response]:
+        """Rebuild the stored response, marking it as used for the LRU order.
+
+        Returns None and drops the entry when its body has been evicted since ``lookup``.
+        """
+        try:
+            content = self._storage.read(entry["digest"], ".body")
+        except FileNotFoundError:
+            self.discard(entry["digest"])
+            return None
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry.get("headers") or {})
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content  # pylint: disable=protected-access
+        response.url = url
+        response.elapsed = timedelta(0)
+        self._touch(entry["digest"])
+        return response
+
+    def store(self, url:str, response:requests.Response) -> None:
+        """Cache a 200 response to a GET request."""
+        if response.status_code != 200:
+            return
+        self._write(self._digest(url), response, response.content)
+
+    def revalidated(self,
+                    entry:dict,
+                    response:requests.Response,
+                    url:str,
+                    ) -> Optional[requests.Response]:
+        """Refresh an entry after a 304 answer and return the stored response.
+
+        Args:
+            entry (dict): The entry that was revalidated.
+            response (requests.Response): The 304 response, its validators replace the stored ones.
+            url (str): Full URL of the request.
+
+        Returns:
+            Optional[requests.Response]: The stored response, None if another thread evicted it
+                while the request was in flight; the caller then has to ask unconditionally.
+        """
+        cached = self.response(entry, url)
+        if cached is None:
+            return None
+        for name in ("ETag", "Last-Modified", "Cache-Control", "Expires", "Date"):
+            if name in response.headers:
+                cached.headers[name] = response.headers[name]
+        self._write(entry["digest"], cached, None)
+        return cached
+
+    def _write(self,
+               digest:str,
+               response:requests.Response,
+               body:Optional[bytes],
+               ) -> None:
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS}
+        entry = {"url": response.url,
+                 "status": response.status_code,
+                 "reason": response.reason,
+                 "headers": headers,
+                 "etag": response.headers.get("ETag"),
+                 "last_modified": response.headers.get("Last-Modified"),
+                 "stored_time": time(),
+                 }
+        with self._lock:
+            index = self._load_index()
+            if body is not None:
+                body_path = self._storage.write(digest, body, ".body")
+            else:
+                body_path = self._storage.locate(digest, ".body")
+                if body_path is None:
+                    # 本體在重新驗證期間已被淘汰，留下 metadata 只會造成之後的 304 找不到內容
+                    self._drop(index, digest)
+                    return
+            meta_path = self._storage.write(digest, json.dumps(entry, ensure_ascii=False).encode("utf-8"), ".json")
+            index[digest] = [meta_path.stat().st_size + body_path.stat().st_size, time()]
+            self._evict(index)
+
+    def _touch(self, digest:str) -> None:
+        with self._lock:
+            index = self._load_index()
+            if digest in index:
+                index[digest][1] = time()
+                path = self._storage.locate(digest, ".json")
+                if path is not None:
+                    path.touch()
+
+    def _drop(self, index:Dict[str, list], digest:str) -> None:
+        for suffix in (".json", ".body"):
+            path = self._storage.locate(digest, suffix)
+            if path is not None:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+        index.pop(digest, None)
+
+    def _evict(self, index:Dict[str, list]) -> None:
+        total = sum(size for size, _ in index.values())
+        for digest, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            self._drop(index, digest)
+            total -= size
+
+    def discard(self, digest:str) -> None:
+        """Remove one entry, e.g. when its body is gone."""
+        with self._lock:
+            self._drop(self._load_index(), digest)
+
+    def clear(self) -> None:
+        with self._lock:
+            index = self._load_index()
+            for digest in list(index):
+                self._drop(index, digest)
+
+# 同一個 process 內的 MyRequests 共用同一個快取（同一份 LRU 索引）
+_http_cache:Optional[HTTPDiskCache] = None
+_http_cache_lock = threading.Lock()
+
+def get_http_cache() -> Optional[HTTPDiskCache]:
+    """The shared cache configured by ``HTTP_CACHE_DIR``, None when caching is off."""
+    global _http_cache  # pylint: disable=global-statement
+    if not ProjectConfigs.HTTP_CACHE_DIR:
+        return None
+    with _http_cache_lock:
+        if (_http_cache is None
+            or _http_cache.root != Path(ProjectConfigs.HTTP_CACHE_DIR)
+            or _http_cache.ttl != ProjectConfigs.HTTP_CACHE_TTL
+            or _http_cache.max_bytes != ProjectConfigs.HTTP_CACHE_MAX_BYTES):
+            _http_cache = HTTPDiskCache(ProjectConfigs.HTTP_CACHE_DIR,
+                                        ttl=ProjectConfigs.HTTP_CACHE_TTL,
+                                        max_bytes=ProjectConfigs.HTTP_CACHE_MAX_BYTES,
+                                        )
+        return _http_cache
@@ -0,0 +1,250 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  cassette.py
+@Time    :  2026/10/19 20:52:18
+@Author  :  Kevin Wang
+@Desc    :  Record / replay transport for MyRequests, storing real NHK traffic on disk
+"""
+
+from collections import (defaultdict,
+                         deque,
+                         )
+from datetime import (datetime,
+                      timedelta,
+                      )
+from hashlib import sha256
+from pathlib import Path
+from time import (perf_counter,
+                  sleep,
+                  )
+from typing import (Deque,
+                    Dict,
+                    Optional,
+                    Tuple,
+                    Union,
+                    )
+from urllib.parse import (parse_qsl,
+                          urlencode,
+                          urlsplit,
+                          urlunsplit,
+                          )
+import json
+import threading
+
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+import requests
+
+from config import ProjectConfigs
+from storage import RawStorage
+
+MODES = ("record", "replay")
+TIMINGS = ("original", "fast")
+
+# 每次請求都會變動、不影響回應的參數（NHK 的 cache buster），比對請求時忽略
+VOLATILE_PARAMS = {"_"}
+
+# 回放時可重現的錯誤
+ERRORS = {"ConnectionError": requests.exceptions.ConnectionError,
+          "ReadTimeout": requests.exceptions.ReadTimeout,
+          "ConnectTimeout": requests.exceptions.ConnectTimeout,
+          "Timeout": requests.exceptions.Timeout,
+          }
+
+# 內容已由 requests 解壓，回放時不可再宣告編碼或長度
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+class CassetteMiss(LookupError):
+    """A replayed request was never recorded."""
+
+def request_key(method:str,
+                url:str,
+                body:Optional[Union[str, bytes]]=None,
+                ) -> str:
+    """Identity of a request for matching recordings, ignoring ``VOLATILE_PARAMS``.
+
+    Args:
+        method (str): HTTP method.
+        url (str): Full URL including the query string.
+        body (Optional[Union[str, bytes]], optional): Request body. Defaults to None.
+
+    Returns:
+        str: ``METHOD url`` with the remaining query parameters sorted, plus the SHA-256 of
+            the body if there is one.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if name not in VOLATILE_PARAMS))
+    key = f"{method.upper()} {urlunsplit(parts._replace(query=query, fragment=''))}"
+    if body:
+        key += f" {sha256(body if isinstance(body, bytes) else body.encode('utf-8')).hexdigest()}"
+    return key
+
+class CassetteStore:
+    def __init__(self,
+                 root:Union[str, Path],
+                 compression:Optional[str]=ProjectConfigs.RAW_COMPRESSION,
+                 ) -> None:
+        """On-disk store of recorded HTTP interactions.
+
+        ``interactions.jsonl`` holds one line of metadata per request in the order they were
+        sent. Response bodies are stored once per SHA-256 under ``bodies/`` in the sharded,
+        compressed raw layout, so repeated responses (pages fetched again, retried segments)
+        cost no extra space.
+
+        Args:
+            root (Union[str, Path]): Cassette directory.
+            compression (Optional[str], optional): Body compression, None, "gzip" or "zstd".
+                Defaults to ``ProjectConfigs.RAW_COMPRESSION``.
+        """
+        self.root = Path(root)
+        self.index_path = self.root.joinpath("interactions.jsonl")
+        self.bodies = RawStorage(self.root.joinpath("bodies"), compression=compression)
+        self._lock = threading.Lock()
+
+    def append(self,
+               interaction:dict,
+               body:Optional[bytes]=None,
+               ) -> None:
+        """Store one interaction, its body by digest."""
+        if body is not None:
+            digest = sha256(body).hexdigest()
+            if self.bodies.locate(digest, ".body") is None:
+                self.bodies.write(digest, body, ".body")
+            interaction = dict(interaction, body=digest)
+        line = json.dumps(interaction, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path, "a", encoding="utf-8") as file:
+                file.write(line)
+
+    def load(self) -> Dict[str, Deque[dict]]:
+        """Recorded interactions grouped by request key, in recording order.
+
+        Raises:
+            FileNotFoundError: The cassette has no recordings.
+        """
+        interactions:Dict[str, Deque[dict]] = defaultdict(deque)
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    interaction = json.loads(line)
+                    interactions[interaction["key"]].append(interaction)
+        return interactions
+
+    def body(self, digest:str) -> bytes:
+        return self.bodies.read(digest, ".body")
+
+class CassetteAdapter(HTTPAdapter):
+    def __init__(self,
+                 store:CassetteStore,
+                 mode:str="replay",
+                 timing:str="fast",
+                 **kwargs,
+                 ) -> None:
+        """Transport adapter recording real traffic into a cassette or serving it back.
+
+        In ``record`` mode every request goes to the network as usual and the response, or the
+        connection error / timeout it ended with, is appended to the store. In ``replay`` mode
+        no request leaves the machine: each request is answered with the next recording of the
+        same key (the last one repeats once they run out), reproducing failures too. With
+        ``timing="original"`` every replayed response takes as long as it originally did.
+
+        Example:
+            session = requests.Session()
+            session.mount("https://", CassetteAdapter(CassetteStore("cassettes/run1"), mode="replay"))
+
+        Args:
+            store (CassetteStore): Where interactions are recorded / replayed from.
+            mode (str, optional): "record" or "replay". Defaults to "replay".
+            timing (str, optional): Replay speed, "original" or "fast". Defaults to "fast".
+            **kwargs: Passed to ``HTTPAdapter``.
+
+        Raises:
+            ValueError: Unknown mode or timing.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {list(MODES)}")
+        if timing not in TIMINGS:
+            raise ValueError(f"Unknown cassette timing {timing!r}, expected one of {list(TIMINGS)}")
+        super().__init__(**kwargs)
+        self.store = store
+        self.mode = mode
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._interactions = store.load() if mode == "replay" else {}
+
+    def send(self, request:requests.PreparedRequest, **kwargs) -> requests.Response:  # pylint: disable=arguments-differ
+        if self.mode == "record":
+            return self._record(request, **kwargs)
+        return self._replay(request)
+
+    def _record(self, request:requests.PreparedRequest, **kwargs) -> requests.Response:
+        interaction = {"key": request_key(request.method, request.url, request.body),
+                       "method": request.method,
+                       "url": request.url,
+                       "recorded_time": datetime.now().isoformat(),
+                       }
+        start = perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+            body = response.content  # 讀完 body 才算完整的回應時間
+        except tuple(ERRORS.values()) as err:
+            self.store.append(dict(interaction, error=type(err).__name__, message=str(err),
+                                   elapsed=perf_counter() - start))
+            raise
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS}
+        self.store.append(dict(interaction,
+                               status=response.status_code,
+                               reason=response.reason,
+                               headers=headers,
+                               elapsed=perf_counter() - start,
+                               ),
+                          body)
+        return response
+
+    def _next(self, key:str) -> dict:
+        with self._lock:
+            recordings = self._interactions.get(key)
+            if not recordings:
+                raise CassetteMiss(f"No recording of {key} in {self.store.root}")
+            return recordings.popleft() if len(recordings) > 1 else recordings[0]
+
+    def _replay(self, request:requests.PreparedRequest) -> requests.Response:
+        interaction = self._next(request_key(request.method, request.url, request.body))
+        if self.timing == "original":
+            sleep(interaction["elapsed"])
+        if interaction.get("error"):
+            raise ERRORS.get(interaction["error"], requests.exceptions.ConnectionError)(interaction.get("message"),
+                                                                                        request=request)
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction.get("reason")
+        response.headers = CaseInsensitiveDict(interaction.get("headers") or {})
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.store.body(interaction["body"]) if interaction.get("body") else b""  # pylint: disable=protected-access
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(seconds=interaction["elapsed"])
+        return response
+
+# 同一個 process 內的 MyRequests 共用同一個 adapter，回放時只載入一次紀錄
+_adapters:Dict[Tuple[str, str, str], CassetteAdapter] = {}
+_adapters_lock = threading.Lock()
+
+def get_cassette_adapter() -> Optional[CassetteAdapter]:
+    """The shared adapter configured by ``CASSETTE_MODE``, None when recording is off."""
+    mode = ProjectConfigs.CASSETTE_MODE
+    if not mode:
+        return None
+    key = (mode, str(ProjectConfigs.CASSETTE_DIR), ProjectConfigs.CASSETTE_TIMING)
+    with _adapters_lock:
+        adapter = _adapters.get(key)
+        if adapter is None:
+            adapter = _adapters[key] = CassetteAdapter(CassetteStore(ProjectConfigs.CASSETTE_DIR),
+                                                       mode=mode,
+                                                       timing=ProjectConfigs.CASSETTE_TIMING,
+                                                       )
+        return adapter
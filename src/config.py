@@ -11,9 +11,13 @@
 """
 
 from pathlib import Path
+import os
 
+from dotenv import load_dotenv
 import yaml
 
+load_dotenv()
+
 module_folder_path = Path(__file__).resolve().parent
 # config_path = module_folder_path.joinpath('configs', 'config.yaml')
 
@@ -41,3 +45,54 @@ class ProjectConfigs:
     INTERIM_DIR = package_path.joinpath("data/interim")
     PROCESSED_DIR = package_path.joinpath("data/processed")
 
+    # raw 存檔的分層目錄深度（0 為舊的單層目錄）與 html 壓縮方式（空字串表示不壓縮，可選 gzip / zstd）
+    # 預設維持舊的單層、不壓縮格式；改用新格式前先以 migrate-raw 轉換既有的存檔
+    RAW_SHARD_DEPTH = int(os.getenv("RAW_SHARD_DEPTH", "0"))
+    RAW_COMPRESSION = os.getenv("RAW_COMPRESSION", "") or None
+
+    # NHK 網站與影音串流的網址（benchmark 等離線測試時可改指向本機的假伺服器）與每次請求後的間隔秒數
+    NHK_WEB_BASE_URL = os.getenv("NHK_WEB_BASE_URL", "https://www3.nhk.or.jp").rstrip("/")
+    NHK_VOD_BASE_URL = os.getenv("NHK_VOD_BASE_URL", "https://vod-stream.nhk.jp").rstrip("/")
+    REQUEST_LAPSE = float(os.getenv("REQUEST_LAPSE", "0.1"))
+
+    # 所有爬蟲共用的 HTTP 連線池大小（每個 host）、每個 host 每秒最多發出的請求數（0 表示不限制）與同時下載影音的上限
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HOST_RATE_LIMIT = float(os.getenv("HOST_RATE_LIMIT", "10"))
+    DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "2"))
+
+    # 每個 host 同時進行的請求數依延遲與錯誤自動調整（AIMD）的起始值與上限（上限 0 表示不控制），與每個 HLS 同時下載的片段數
+    HOST_CONCURRENCY_INITIAL = float(os.getenv("HOST_CONCURRENCY_INITIAL", "2"))
+    HOST_CONCURRENCY_MAX = float(os.getenv("HOST_CONCURRENCY_MAX", "16"))
+    HLS_SEGMENT_WORKERS = int(os.getenv("HLS_SEGMENT_WORKERS", "8"))
+
+    # 每次爬取的時間上限（秒，0 表示不限制），到期時剩下的新聞留給下一次執行
+    CRAWL_TIME_BUDGET = float(os.getenv("CRAWL_TIME_BUDGET", "0"))
+
+    # 先寫入文章、影音改由背景佇列下載（1 開啟）、佇列的下載 thread 數與影音下載合計的頻寬上限（bytes/s，0 表示不限制）
+    DEFER_MEDIA = os.getenv("DEFER_MEDIA", "0") == "1"
+    MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+    MEDIA_BANDWIDTH_LIMIT = float(os.getenv("MEDIA_BANDWIDTH_LIMIT", "0"))
+
+    # 錄製／回放 NHK 的 HTTP 流量（record / replay，空字串表示關閉），回放速度 original（原始耗時）/ fast
+    CASSETTE_MODE = os.getenv("CASSETTE_MODE", "") or None
+    CASSETTE_DIR = Path(os.getenv("CASSETTE_DIR", "") or package_path.joinpath("data/raw/cassettes"))
+    CASSETTE_TIMING = os.getenv("CASSETTE_TIMING", "fast")
+
+    # MyRequests 的磁碟 HTTP 快取目錄（空字串表示關閉）、免重新驗證的秒數與容量上限（bytes）
+    HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR")) if os.getenv("HTTP_CACHE_DIR") else None
+    HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "0"))
+    HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(512 << 20)))
+
+    # 每次爬取結束後輸出各階段耗時 profile（JSON 與 flame graph 用的 collapsed stacks）的目錄，空字串表示關閉
+    TRACE_DIR = Path(os.getenv("TRACE_DIR")) if os.getenv("TRACE_DIR") else None
+
+    # 常駐排程（main.py schedule）兩次輪詢間隔的下限與上限（秒），實際間隔依最近的發布時間自動調整
+    SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", "60"))
+    SCHEDULER_MAX_INTERVAL = float(os.getenv("SCHEDULER_MAX_INTERVAL", "1800"))
+    # 常駐排程在記憶體中保留的已知文章數上限（超過時淘汰最久未出現在列表中的），與未設定 HTTP_CACHE_DIR 時使用的快取目錄
+    SCHEDULER_KNOWN_ARTICLES = int(os.getenv("SCHEDULER_KNOWN_ARTICLES", "5000"))
+    SCHEDULER_HTTP_CACHE_DIR = INTERIM_DIR.joinpath("http_cache")
+
+    # 爬蟲同時附加寫入 PROCESSED_DIR/columnar 的欄式格式（parquet / ipc，空字串表示不輸出，需安裝 pyarrow）
+    COLUMNAR_FORMAT = os.getenv("COLUMNAR_FORMAT", "") or None
+
@@ -6,13 +6,34 @@
 @Desc    :  None
 """
 
+from contextlib import contextmanager
+from dataclasses import replace
 from datetime import datetime, timedelta
-from typing import List
+from functools import partial
+from pathlib import Path
+from typing import (Callable,
+                    Dict,
+                    Iterator,
+                    List,
+                    Optional,
+                    Tuple,
+                    )
 import json
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只能在同一個 process 內互斥
+    fcntl = None
 
 from bs4 import BeautifulSoup
 
 from config import ProjectConfigs
+from media_queue import MediaDownloadQueue
+from metrics import (DEADLINE_REMAINDER,
+                     PARSE_SECONDS,
+                     REFRESH_RESULTS,
+                     )
 from objects import (HTMLContent,
                      News,
                      Media,
@@ -20,6 +41,11 @@ from objects import (HTMLContent,
 from parser import (NHKEasyNewsWebParser,
                     NHKNewsWebParser,
                     )
+from storage import (MediaStore,
+                     RawStorage,
+                     write_atomic,
+                     )
+from tracing import span
 from utils import (HLSMediaDownloader,
                    NHKEasyNewsClient,
                    NHKNewsClient,
@@ -60,10 +86,10 @@ class NHKEasyWebCrawler:
                    containing metadata and file path.
         """
         response = self.crawler.get_voice_m3u8(voice_id)
-        path = voice_dir.joinpath(f'{voice_id}.mp3')
-
-        voice_dir.mkdir(exist_ok=True, parents=True)
-        HLSMediaDownloader().save(response.url, path)
+        path = HLSMediaDownloader().save(response.url,
+                                         f"{voice_id}.mp3",
+                                         store=MediaStore(voice_dir),
+                                         )
         return Media(status=response.status_code,
                      id=voice_id,
                      type="Audio",
@@ -73,6 +99,25 @@ class NHKEasyWebCrawler:
                      download_time=datetime.now(),
                      )
 
+    @staticmethod
+    def parse_html(content:bytes) -> Tuple[str, str, Optional[datetime]]:
+        """Parse the title, article and publication time out of a raw NHK Easy News page.
+
+        Args:
+            content (bytes): Raw HTML of the article page.
+
+        Returns:
+            Tuple[str, str, Optional[datetime]]: Title, article body and publication time
+                (None if the date block cannot be parsed).
+        """
+        soup = BeautifulSoup(content, 'html.parser')
+        parser = NHKEasyNewsWebParser(soup)
+        try:
+            publication_time = datetime.strptime(parser.date, "%Y年%m月%d日 %H時%M分")
+        except ValueError:
+            publication_time = None
+        return parser.title, parser.body, publication_time
+
     def download_html(self,
                       content_id:str,
                       content_dir=ProjectConfigs.RAW_DIR.joinpath("nhk_easy_web/contents"),
@@ -89,24 +134,21 @@ class NHKEasyWebCrawler:
                          containing metadata and file path.
         """
         response = self.crawler.get_content(content_id)
-        path = content_dir.joinpath(f'{content_id}.html')
-        soup = BeautifulSoup(response.content, 'html.parser')
-        parser = NHKEasyNewsWebParser(soup)
+        storage = RawStorage(content_dir)
+        path = storage.path_for(content_id, ".html")
+        with PARSE_SECONDS.labels(source="easy").time(), span("parse") as traced:
+            traced.add_bytes(len(response.content))
+            title, article, publication_time = self.parse_html(response.content)
 
-        content_dir.mkdir(exist_ok=True, parents=True)
         if response.status_code == 200:
-            with open(path, 'wb') as file:
-                file.write(response.content)
-        try:
-            publication_time = datetime.strptime(parser.date, "%Y年%m月%d日 %H時%M分")
-        except ValueError:
-            publication_time = None
+            with span("raw.write"):
+                storage.write(content_id, response.content, ".html")
         return HTMLContent(status=response.status_code,
                            id=content_id,
                            url=response.url,
                            filepath=path,
-                           title=parser.title,
-                           article=parser.body,
+                           title=title,
+                           article=article,
                            publication_time=publication_time,
                            download_time=datetime.now(),
                            html=response.text,
@@ -133,6 +175,42 @@ class NHKEasyWebCrawler:
             List[News]: A list of News objects containing article details, 
                         content, and voice recordings.
 
+        Raises:
+            ValueError: If the start date is more than one year in the past.
+        """
+        return list(self.iter_recent_news(start_date, end_date, save_dir))
+
+    def iter_recent_news(self,
+                         start_date:datetime=None,
+                         end_date:datetime=None,
+                         save_dir=ProjectConfigs.RAW_DIR.joinpath("nhk_easy_web"),
+                         stored_times:Optional[Callable[[List[str]], Dict[str, datetime]]]=None,
+                         media_queue:Optional[MediaDownloadQueue]=None,
+                         deadline:Optional[datetime]=None,
+                         ) -> Iterator[News]:
+        """Same as ``download_recent_news``, but yield each News as soon as it is downloaded.
+
+        ``news.json`` is written once the iteration is exhausted.
+
+        The newest news are downloaded first. A run reaching ``deadline`` stops before the next
+        news and leaves the rest in ``remainder.json`` under ``save_dir``; the next run downloads
+        them along with the news of its own date range.
+
+        Args:
+            stored_times (Optional[Callable[[List[str]], Dict[str, datetime]]], optional): Looks up
+                which of the given article ids are already stored, e.g.
+                ``Export2PostgreSQL.fetch_modified_times``. Those are skipped without a request,
+                Easy articles are not revised after publication. Defaults to None, downloading
+                every article.
+            media_queue (Optional[MediaDownloadQueue], optional): Yield each News without its
+                voice and download the voice in this queue after the News has been consumed.
+                Defaults to None, downloading the voice before yielding.
+            deadline (Optional[datetime], optional): Stop starting new downloads at this time.
+                Defaults to None, without a time limit.
+
+        Yields:
+            News: News object containing article details, content, and voice recording.
+
         Raises:
             ValueError: If the start date is more than one year in the past.
         """
@@ -141,51 +219,201 @@ class NHKEasyWebCrawler:
         if start_date < (datetime.now() - timedelta(days=365)).date():
             raise ValueError("Start date cannot be more than one year ago.")
 
-        def iterate_news_list(start_date, end_date) -> dict:
+        def iterate_news_list(start_date, end_date) -> List[dict]:
             news_list = self.crawler.get_news_summary()
-            for _date in news_list:
-                date = datetime.strptime(_date, "%Y-%m-%d").date()
-                if date < start_date or date > end_date:
+            items = [news for _date in news_list
+                     if start_date <= datetime.strptime(_date, "%Y-%m-%d").date() <= end_date
+                     for news in news_list[_date]]
+            # 上次執行到期時沒處理完的新聞一併處理
+            ids = {news["news_id"] for news in items}
+            items += [news for news in _load_remainder(save_dir) if news["news_id"] not in ids]
+            known = stored_times([news["news_id"] for news in items]) if stored_times is not None else {}
+            pending = []
+            for news in items:
+                if news["news_id"] in known:
+                    REFRESH_RESULTS.labels(source="easy", result="unchanged_feed").inc()
                     continue
-                yield from news_list[_date]
-
-        news_list = []
-        news_json = []
-        for news_info in iterate_news_list(start_date, end_date):
-            publication_time = (news_info["news_publication_time"]
-                                or news_info["news_preview_time"]
-                                or news_info["news_creation_time"]
-                                or news_info["news_prearranged_time"]
-                                )
-            publication_time = datetime.strptime(publication_time, "%Y-%m-%d %H:%M:%S")
-            voice_id = news_info["news_easy_voice_uri"].split(".")[0]
-
-            # Download Article content and voice file
-            html_content:HTMLContent = self.download_html(news_info["news_id"],
-                                                          save_dir.joinpath("contents"),
+                if stored_times is not None:
+                    REFRESH_RESULTS.labels(source="easy", result="new").inc()
+                pending.append(news)
+            # 最新的新聞先下載，時間不夠時留下的是最舊的
+            pending.sort(key=_easy_feed_time, reverse=True)
+            return pending
+
+        # 同一個 save_dir 的爬取依序進行，news.json 與 remainder.json 不會被另一次執行覆蓋
+        with _source_lock(save_dir):
+            news_json = _NewsJson(save_dir.joinpath(NEWS_FILE))
+            pending = iterate_news_list(start_date, end_date)
+            for index, news_info in enumerate(pending):
+                if deadline is not None and datetime.now() >= deadline:
+                    _save_remainder(save_dir, pending[index:])
+                    DEADLINE_REMAINDER.labels(source="easy").inc(len(pending) - index)
+                    print(f"Deadline reached, {len(pending) - index} news left for the next run")
+                    break
+                publication_time = _easy_feed_time(news_info)
+                voice_id = news_info["news_easy_voice_uri"].split(".")[0]
+
+                # Download Article content and voice file
+                with span("easy.download_html"):
+                    html_content:HTMLContent = self.download_html(news_info["news_id"],
+                                                                  save_dir.joinpath("contents"),
+                                                                  )
+                voice = None
+                if media_queue is None:
+                    with span("easy.download_voice"):
+                        voice:Media = self.download_voice(voice_id,
+                                                          save_dir.joinpath("voices"),
                                                           )
-            voice:Media = self.download_voice(voice_id,
-                                              save_dir.joinpath("voices"),
-                                              )
-
-            news = News("NHK Easy Web",
-                        news_info["news_id"],
-                        news_info["title"],
-                        html_content.url,
-                        publication_time,
-                        datetime.now(),
-                        None,
-                        voice,
-                        html_content,
+
+                news = News("NHK Easy Web",
+                            news_info["news_id"],
+                            news_info["title"],
+                            html_content.url,
+                            publication_time,
+                            datetime.now(),
+                            None,
+                            voice,
+                            html_content,
+                            )
+                self._news.append(news)
+                entry = news_json.append(news)
+                yield news
+                if media_queue is not None:
+                    # 呼叫端處理完（例如交給 exporter）之後才排入，補上音檔的版本一定在後面寫入
+                    media_queue.submit(news,
+                                       news_json.defer(entry, partial(self.download_voice,
+                                                                      voice_id,
+                                                                      save_dir.joinpath("voices"),
+                                                                      )),
+                                       "Audio",
+                                       )
+            else:
+                _save_remainder(save_dir, [])
+
+            # Save news object 
+            with span("news_json.write"):
+                news_json.write()
+
+# 每次爬取的結果，存於 save_dir 之下
+NEWS_FILE = "news.json"
+# 爬取到期時剩下的 feed 項目，存於 save_dir 之下，下一次執行時優先處理
+REMAINDER_FILE = "remainder.json"
+# 同一個 save_dir 同時只能有一次爬取，跨 process 以此檔案的 flock 互斥
+LOCK_FILE = ".crawl.lock"
+
+_source_locks:Dict[Path, threading.Lock] = {}
+_source_locks_lock = threading.Lock()
+
+@contextmanager
+def _source_lock(save_dir:Path) -> Iterator[None]:
+    """Hold ``save_dir`` for one crawl, so that runs of the same source do not mix their files.
+
+    A thread lock serializes the runs of this process and ``flock`` on ``LOCK_FILE`` those of
+    other processes (e.g. the API and a scheduled crawl). A second run waits for the first one,
+    then picks up its ``remainder.json`` and skips what it already stored.
+    """
+    save_dir = Path(save_dir).resolve()
+    with _source_locks_lock:
+        lock = _source_locks.setdefault(save_dir, threading.Lock())
+    with lock:
+        save_dir.mkdir(parents=True, exist_ok=True)
+        with open(save_dir.joinpath(LOCK_FILE), "a", encoding="utf-8") as file:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)  # 關閉檔案時釋放
+            yield
+
+def _write_json(path:Path, data:list) -> None:
+    """Replace ``path`` atomically, readers never see a partially written file."""
+    write_atomic(Path(path), json.dumps(data, ensure_ascii=False, indent=4).encode("utf-8"))
+
+class _NewsJson:
+    def __init__(self, path:Path) -> None:
+        """``news.json`` of one crawl, completed with the media a ``MediaDownloadQueue`` downloads later.
+
+        A deferred download wrapped by ``defer`` records its media in the entry of its news.
+        Media done before the crawl ends are part of the first ``write``; if some are still
+        downloading then, the file is rewritten once the last of them finishes, unless a later
+        run has replaced the file in the meantime.
+        """
+        self.path = Path(path)
+        self._news:List[News] = []
+        self._deferred = 0
+        self._written:Optional[int] = None  # 本次寫入的檔案 inode，被其他執行取代後就不再改寫
+        self._lock = threading.Lock()
+
+    def append(self, news:News) -> int:
+        """Add a news, returns its entry for ``defer``."""
+        with self._lock:
+            self._news.append(news)
+            return len(self._news) - 1
+
+    def defer(self, entry:int, download:Callable[[], Media]) -> Callable[[], Media]:
+        """Wrap the deferred media download of entry ``entry`` to record its result."""
+        with self._lock:
+            self._deferred += 1
+
+        def run() -> Media:
+            media = None
+            try:
+                media = download()
+                return media
+            finally:
+                # 下載失敗也算完成，影音維持空白
+                with self._lock:
+                    self._deferred -= 1
+                    if media is not None:
+                        self._news[entry] = replace(self._news[entry], media=media)
+                    if self._deferred == 0 and self._written is not None and self._is_ours():
+                        self._write()
+        return run
+
+    def _is_ours(self) -> bool:
+        try:
+            return self.path.stat().st_ino == self._written
+        except FileNotFoundError:
+            return False
+
+    def _write(self) -> None:
+        _write_json(self.path, [news.to_json_dict() for news in self._news])
+        self._written = self.path.stat().st_ino
+
+    def write(self) -> None:
+        """Write the news crawled so far with the media completed so far."""
+        with self._lock:
+            self._write()
+
+def _load_remainder(save_dir:Path) -> List[dict]:
+    """Feed items a previous run left when it reached its deadline."""
+    path = Path(save_dir).joinpath(REMAINDER_FILE)
+    if not path.is_file():
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def _save_remainder(save_dir:Path, items:List[dict]) -> None:
+    """Keep the unprocessed feed items for the next run, or remove the file once none are left."""
+    path = Path(save_dir).joinpath(REMAINDER_FILE)
+    if not items:
+        path.unlink(missing_ok=True)
+        return
+    _write_json(path, items)
+
+def _easy_feed_time(news_info:dict) -> datetime:
+    """Publication time of an NHK Easy News item of ``news-list.json``."""
+    publication_time = (news_info["news_publication_time"]
+                        or news_info["news_preview_time"]
+                        or news_info["news_creation_time"]
+                        or news_info["news_prearranged_time"]
                         )
-            news_list.append(news)
-            news_json.append(news.to_json_dict())
+    return datetime.strptime(publication_time, "%Y-%m-%d %H:%M:%S")
 
-        # Save news object 
-        with open(save_dir.joinpath("news.json"), "w", encoding="utf-8") as file:
-            json.dump(news_json, file, ensure_ascii=False, indent=4)
-        self._news += news_list
-        return news_list
+def _feed_time(news_info:dict) -> datetime:
+    """``pubDate`` of an NHK News feed item, updated whenever the article is revised."""
+    return datetime.strptime(news_info["pubDate"], "%a, %d %b %Y %H:%M:%S %z")
+
+def _feed_id(news_info:dict) -> str:
+    """Article id (HTMLContent.id) of an NHK News feed item."""
+    return news_info["link"].replace(".html", "").split("/")[-1]
 
 class NHKWebCrawler:
     """A web crawler for NHK News, designed to download news content and associated video.
@@ -221,10 +449,10 @@ class NHKWebCrawler:
                    containing metadata and file path.
         """
         response = self.crawler.get_video_m3u8(video_id)
-        path = video_dir.joinpath(f'{video_id}.mp4')
-
-        video_dir.mkdir(exist_ok=True, parents=True)
-        HLSMediaDownloader().save(response.url, path)
+        path = HLSMediaDownloader().save(response.url,
+                                         f"{video_id}.mp4",
+                                         store=MediaStore(video_dir),
+                                         )
         return Media(status=response.status_code,
                      id=video_id,
                      type="Video",
@@ -234,32 +462,21 @@ class NHKWebCrawler:
                      download_time=datetime.now(),
                      )
 
-    def download_html(self,
-                      date:str,
-                      content_id:str,
-                      content_dir=ProjectConfigs.RAW_DIR.joinpath("nhk_news/contents"),
-                      ) -> HTMLContent:
-        """Download the HTML content for a specific news article.
+    @staticmethod
+    def parse_html(content:bytes) -> Tuple[Optional[str], Optional[str], Optional[datetime]]:
+        """Parse the title, article and publication time out of a raw NHK News page.
 
         Args:
-            content_id (str): Unique identifier for the news article.
-            content_dir (Path, optional): Directory to save the HTML content. 
-                Defaults to a predefined path in project configurations.
+            content (bytes): Raw HTML of the article page.
 
         Returns:
-            HTMLContent: An object representing the downloaded content, 
-                         containing metadata and file path.
+            Tuple[Optional[str], Optional[str], Optional[datetime]]: Title, article body and
+                publication time (None if no date can be parsed).
         """
-        response = self.crawler.get_content(date, content_id)
-        path = content_dir.joinpath(f'{content_id}.html')
-        soup = BeautifulSoup(response.content, 'html.parser')
-        parser = NHKNewsWebParser(soup)
+        return NHKWebCrawler._parse(NHKNewsWebParser(BeautifulSoup(content, 'html.parser')))
 
-        content_dir.mkdir(exist_ok=True, parents=True)
-        if response.status_code == 200:
-            with open(path, 'wb') as file:
-                file.write(response.content)
-        
+    @staticmethod
+    def _parse(parser:NHKNewsWebParser) -> Tuple[Optional[str], Optional[str], Optional[datetime]]:
         # Get publication_time
         pairs = [(parser.published_date, "%Y-%m-%dT%H:%M:%S%z"),
                  (parser.modified_date, "%Y-%m-%dT%H:%M:%S%z"),
@@ -273,15 +490,54 @@ class NHKWebCrawler:
                 publication_time = datetime.strptime(val, fmt)
             except ValueError:
                 continue
+        return parser.title, parser.body, publication_time
+
+    @staticmethod
+    def parse_modified_time(parser:NHKNewsWebParser) -> Optional[datetime]:
+        """The JSON-LD ``dateModified`` of a parsed page, None if missing or malformed."""
+        try:
+            return datetime.strptime(parser.modified_date, "%Y-%m-%dT%H:%M:%S%z")
+        except (TypeError, ValueError):
+            return None
+
+    def download_html(self,
+                      date:str,
+                      content_id:str,
+                      content_dir=ProjectConfigs.RAW_DIR.joinpath("nhk_news/contents"),
+                      ) -> HTMLContent:
+        """Download the HTML content for a specific news article.
+
+        Args:
+            content_id (str): Unique identifier for the news article.
+            content_dir (Path, optional): Directory to save the HTML content. 
+                Defaults to a predefined path in project configurations.
+
+        Returns:
+            HTMLContent: An object representing the downloaded content, 
+                         containing metadata and file path.
+        """
+        response = self.crawler.get_content(date, content_id)
+        storage = RawStorage(content_dir)
+        path = storage.path_for(content_id, ".html")
+        with PARSE_SECONDS.labels(source="news").time(), span("parse") as traced:
+            traced.add_bytes(len(response.content))
+            parser = NHKNewsWebParser(BeautifulSoup(response.content, 'html.parser'))
+            title, article, publication_time = self._parse(parser)
+            modified_time = self.parse_modified_time(parser)
+
+        if response.status_code == 200:
+            with span("raw.write"):
+                storage.write(content_id, response.content, ".html")
 
         return HTMLContent(status=response.status_code,
                            id=content_id,
                            url=response.url,
                            filepath=path,
-                           title=parser.title,
-                           article=parser.body,
+                           title=title,
+                           article=article,
                            publication_time=publication_time,
                            download_time=datetime.now(),
+                           modified_time=modified_time,
                            html=response.text,
                            )
 
@@ -309,60 +565,144 @@ class NHKWebCrawler:
         Raises:
             ValueError: If the start date is more than one year in the past.
         """
+        return list(self.iter_recent_news(start_date, end_date, save_dir))
+
+    def iter_recent_news(self,
+                         start_date:datetime=None,
+                         end_date:datetime=None,
+                         save_dir=ProjectConfigs.RAW_DIR.joinpath("nhk_news"),
+                         stored_times:Optional[Callable[[List[str]], Dict[str, datetime]]]=None,
+                         media_queue:Optional[MediaDownloadQueue]=None,
+                         deadline:Optional[datetime]=None,
+                         ) -> Iterator[News]:
+        """Same as ``download_recent_news``, but yield each News as soon as it is downloaded.
+
+        ``news.json`` is written once the iteration is exhausted.
+
+        With ``stored_times`` the crawl only refreshes what changed: an article already stored is
+        skipped without a request when its feed ``pubDate`` is not newer than the stored time, and
+        dropped after the page download when its JSON-LD ``dateModified`` is not newer either.
+
+        Articles not stored yet are downloaded first, then the newest ones; an article listed in
+        several categories is downloaded once. A run reaching ``deadline`` stops before the next
+        article and leaves the rest in ``remainder.json`` under ``save_dir`` for the next run.
+
+        Args:
+            stored_times (Optional[Callable[[List[str]], Dict[str, datetime]]], optional): Looks up
+                the last modification time (timezone-aware) of the given article ids that are
+                already stored, e.g. ``Export2PostgreSQL.fetch_modified_times``. Defaults to None,
+                downloading every article.
+            media_queue (Optional[MediaDownloadQueue], optional): Yield each News without its
+                video and download the video in this queue after the News has been consumed.
+                Defaults to None, downloading the video before yielding.
+            deadline (Optional[datetime], optional): Stop starting new downloads at this time.
+                Defaults to None, without a time limit.
+
+        Yields:
+            News: News object containing article details, content, and video (if exists).
+        """
         start_date = start_date.date() if start_date else (datetime.now() - timedelta(days=10)).date()
         end_date = end_date.date() if end_date else datetime.now().date()
+        known:Dict[str, datetime] = {}
 
-        def iterate_news_list(start_date, end_date) -> dict:
+        def iterate_news_list(start_date, end_date) -> List[dict]:
+            items:List[dict] = []
+            seen = set()
             for news_type in NHKNewsType:
                 summary = self.crawler.get_news_summary(news_type)
-                news_list = summary["channel"]["item"]
-                for news in news_list:
-                    date = datetime.strptime(news["pubDate"], "%a, %d %b %Y %H:%M:%S %z").date()
-                    if date < start_date or date > end_date:
+                news_list = [news for news in summary["channel"]["item"]
+                             if start_date <= _feed_time(news).date() <= end_date and _feed_id(news) not in seen]
+                seen.update(_feed_id(news) for news in news_list)
+                if stored_times is not None:
+                    # 每個分類查詢一次，不必逐篇詢問資料庫
+                    known.update(stored_times([_feed_id(news) for news in news_list]))
+                items += news_list
+            # 上次執行到期時沒處理完的文章一併處理
+            remainder = [news for news in _load_remainder(save_dir) if _feed_id(news) not in seen]
+            if remainder and stored_times is not None:
+                known.update(stored_times([_feed_id(news) for news in remainder]))
+            pending = []
+            for news in items + remainder:
+                stored = known.get(_feed_id(news))
+                if stored is not None and _feed_time(news) <= stored:
+                    REFRESH_RESULTS.labels(source="news", result="unchanged_feed").inc()
+                    continue
+                pending.append(news)
+            # 尚未儲存的文章優先，其次是較新的，時間不夠時留下的是最舊的改版
+            pending.sort(key=lambda news: (_feed_id(news) in known, -_feed_time(news).timestamp()))
+            return pending
+
+        # 同一個 save_dir 的爬取依序進行，news.json 與 remainder.json 不會被另一次執行覆蓋
+        with _source_lock(save_dir):
+            news_json = _NewsJson(save_dir.joinpath(NEWS_FILE))
+            pending = iterate_news_list(start_date, end_date)
+            for index, news_info in enumerate(pending):
+                if deadline is not None and datetime.now() >= deadline:
+                    _save_remainder(save_dir, pending[index:])
+                    DEADLINE_REMAINDER.labels(source="news").inc(len(pending) - index)
+                    print(f"Deadline reached, {len(pending) - index} articles left for the next run")
+                    break
+                publication_time = _feed_time(news_info)
+
+                # Download article
+                _, link_date, identifier = news_info["link"].replace(".html", "").split("/")
+                with span("news.download_html"):
+                    html_content:HTMLContent = self.download_html(date=link_date,
+                                                                  content_id=identifier,
+                                                                  content_dir=save_dir.joinpath("contents"),
+                                                                  )
+                if stored_times is not None:
+                    stored = known.get(identifier)
+                    if stored is None:
+                        REFRESH_RESULTS.labels(source="news", result="new").inc()
+                    elif html_content.modified_time is not None and html_content.modified_time <= stored:
+                        # feed 時間變了但內文沒有改版，不必再下載影片
+                        REFRESH_RESULTS.labels(source="news", result="unchanged_page").inc()
                         continue
-                    yield news
-
-        news_list = []
-        news_json = []
-        for news_info in iterate_news_list(start_date, end_date):
-            publication_time = datetime.strptime(news_info["pubDate"], "%a, %d %b %Y %H:%M:%S %z")
-
-            # Download article
-            _, link_date, identifier = news_info["link"].replace(".html", "").split("/")
-            html_content:HTMLContent = self.download_html(date=link_date,
-                                                          content_id=identifier,
-                                                          content_dir=save_dir.joinpath("contents"),
+                    else:
+                        REFRESH_RESULTS.labels(source="news", result="changed").inc()
+
+                # Download video (if exists)
+                video, video_id = None, None
+                if news_info["videoPath"]:
+                    video_id = news_info["videoPath"].replace(".mp4", "")
+                if video_id is not None and media_queue is None:
+                    with span("news.download_video"):
+                        video:Media = self.download_video(video_id,
+                                                          save_dir.joinpath("videos"),
                                                           )
 
-            # Download video (if exists)
-            video = None
-            if news_info["videoPath"]:
-                video_id = news_info["videoPath"].replace(".mp4", "")
-                video:Media = self.download_video(video_id,
-                                                  save_dir.joinpath("videos"),
-                                                  )
-
-            news = News("NHK News",
-                        f"{link_date}-{identifier}",
-                        news_info["title"],
-                        html_content.url,
-                        publication_time,
-                        datetime.now(),
-                        None,
-                        video,
-                        html_content,
-                        )
-            if not news.html_content.title or not news.html_content.article:
-                print(f"Lack of title or article: {news.url}, skipped")
-                continue
-            news_list.append(news)
-            news_json.append(news.to_json_dict())
-
-        # Save news object 
-        with open(save_dir.joinpath("news.json"), "w", encoding="utf-8") as file:
-            json.dump(news_json, file, ensure_ascii=False, indent=4)
-        self._news += news_list
-        return news_list
+                news = News("NHK News",
+                            f"{link_date}-{identifier}",
+                            news_info["title"],
+                            html_content.url,
+                            publication_time,
+                            datetime.now(),
+                            None,
+                            video,
+                            html_content,
+                            )
+                if not news.html_content.title or not news.html_content.article:
+                    print(f"Lack of title or article: {news.url}, skipped")
+                    continue
+                self._news.append(news)
+                entry = news_json.append(news)
+                yield news
+                if video_id is not None and media_queue is not None:
+                    # 呼叫端處理完（例如交給 exporter）之後才排入，補上影片的版本一定在後面寫入
+                    media_queue.submit(news,
+                                       news_json.defer(entry, partial(self.download_video,
+                                                                      video_id,
+                                                                      save_dir.joinpath("videos"),
+                                                                      )),
+                                       "Video",
+                                       )
+            else:
+                _save_remainder(save_dir, [])
+
+            # Save news object 
+            with span("news_json.write"):
+                news_json.write()
 
 if __name__ == "__main__":
     NHKEasyWebCrawler().download_recent_news()
@@ -6,50 +6,254 @@
 @Desc    :  Collect method which export to 
 """
 
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import (datetime,
+                      timedelta,
+                      )
+from hashlib import md5
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
 from typing import (Any,
+                    Dict,
                     Iterable,
+                    List,
                     Optional,
+                    Tuple,
                     )
+from time import (monotonic,
+                  time,
+                  time_ns,
+                  )
+from uuid import uuid4
 import json
 import os
+import queue
+import threading
 
 from dotenv import load_dotenv
-from psycopg2.extras import execute_batch
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 import psycopg2
+import psycopg2.errors
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.dataset
+except ImportError:  # pyarrow 為選用套件，只有 Export2Parquet 需要
+    pyarrow = None
 
+from config import ProjectConfigs
+from metrics import (EXPORT_BATCH_ITEMS,
+                     EXPORT_BATCH_SECONDS,
+                     )
 from objects import News, Media, HTMLContent
+from revisions import (apply_text_delta,
+                       make_text_delta,
+                       )
+from search import (make_snippet,
+                    query_grams,
+                    query_terms,
+                    )
+from spool import (DeadLetterSpool,
+                   SpoolKind,
+                   )
+from tracing import span
 
 load_dotenv()
 
+SCHEMA_VERSION_TABLE = "schema_version"
+
+# 整個 process 共用的 connection pool，第一次使用時才建立
+_pool:Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+# 已確認為最新結構的 (schema, tables) -> 是否為分區表，同一個 process 不再重複檢查
+_initialized:Dict[Tuple[str, str], bool] = {}
+
+def get_pool() -> ThreadedConnectionPool:
+    """取得共用的 connection pool（lazy 建立）"""
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(minconn=int(os.getenv("PG_POOL_MIN", "1")),
+                                           maxconn=int(os.getenv("PG_POOL_MAX", "10")),
+                                           dbname=os.getenv("PG_DBNAME"),
+                                           user=os.getenv("PG_USERNAME"),
+                                           password=os.getenv("PG_PASSWORD"),
+                                           host=os.getenv("PG_HOST") or "localhost",
+                                           port=os.getenv("PG_PORT"),
+                                           )
+        return _pool
+
+# 分區模式下 publication_time 不可為 NULL，缺少時以此固定值代替（落在 default partition）
+UNKNOWN_PUBLICATION_TIME = datetime(1970, 1, 1)
+# 只和個別資料列有關的錯誤（欄位過長、違反 constraint 等），批次寫入時會拆開找出有問題的列
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+# 各表欄位順序，與 _*_values 回傳的 tuple 一致（content_hash 之前）
+MEDIA_COLUMNS = ("id", "status", "type", "url", "filepath", "publication_time", "download_time")
+HTML_CONTENT_COLUMNS = ("id", "status", "url", "filepath", "title", "article", "publication_time", "download_time",
+                        "modified_time")
+NEWS_COLUMNS = ("id", "source", "source_id", "title", "url", "publication_time", "download_time",
+                "author", "media_id", "html_content_id")
+# 不列入 content_hash 的欄位：每次爬取都會變動，本身不代表內容改變
+HASH_EXCLUDED_COLUMNS = {"download_time"}
+
+def _content_hash(values:tuple, columns:Tuple[str, ...]) -> str:
+    """計算一列資料的內容雜湊，內容相同的 upsert 會被略過"""
+    payload = [value for column, value in zip(columns, values) if column not in HASH_EXCLUDED_COLUMNS]
+    return md5(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def _partition_time(publication_time:Optional[datetime], partitioned:bool) -> Optional[datetime]:
+    """分區表的 publication_time 不可為 NULL，缺少時以 UNKNOWN_PUBLICATION_TIME 代替"""
+    if publication_time is None and partitioned:
+        return UNKNOWN_PUBLICATION_TIME
+    return publication_time
+
+def _news_values(obj:News, partitioned:bool=False) -> tuple:
+    """News 對應 NEWS_COLUMNS 的欄位值（最後一欄為 content_hash）"""
+    values = (
+        str(obj.id),  # 將 int 轉為字串以符合 VARCHAR(50) 的定義
+        obj.source,
+        obj.source_id,
+        obj.title,
+        obj.url,
+        _partition_time(obj.publication_time, partitioned),
+        obj.download_time,
+        obj.author,
+        obj.media.id if obj.media else None,
+        obj.html_content.id if obj.html_content else None,
+    )
+    return values + (_content_hash(values, NEWS_COLUMNS),)
+
+def _media_values(obj:Media) -> tuple:
+    """Media 對應 MEDIA_COLUMNS 的欄位值（最後一欄為 content_hash）"""
+    values = (
+        obj.id,
+        int(obj.status) if obj.status is not None else None,
+        obj.type,
+        obj.url,
+        str(obj.filepath) if obj.filepath else None,
+        obj.publication_time,
+        obj.download_time,
+    )
+    return values + (_content_hash(values, MEDIA_COLUMNS),)
+
+def _html_content_values(obj:HTMLContent, partitioned:bool=False) -> tuple:
+    """HTMLContent 對應 HTML_CONTENT_COLUMNS 的欄位值（最後一欄為 content_hash）"""
+    values = (
+        obj.id,
+        int(obj.status) if obj.status is not None else None,
+        obj.url,
+        str(obj.filepath) if obj.filepath else None,
+        obj.title,
+        obj.article,
+        _partition_time(obj.publication_time, partitioned),
+        obj.download_time,
+        obj.modified_time,
+    )
+    return values + (_content_hash(values, HTML_CONTENT_COLUMNS),)
+
+@dataclass
+class ExportStats:
+    """單一 table 的匯出統計"""
+    inserted:int=0
+    updated:int=0
+    unchanged:int=0
+
+    def add(self, returned:List[tuple], total:int) -> None:
+        """依 RETURNING (xmax = 0) 的結果累計；沒有回傳的列代表內容未變動"""
+        inserted = sum(1 for row in returned if row[0])
+        self.inserted += inserted
+        self.updated += len(returned) - inserted
+        self.unchanged += total - len(returned)
+
+def _copy_line(values:tuple) -> str:
+    """將一列資料轉為 COPY text 格式（tab 分隔，\\N 表示 NULL）"""
+    fields = []
+    for value in values:
+        if value is None:
+            fields.append("\\N")
+            continue
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        fields.append(str(value).replace("\\", "\\\\")
+                                .replace("\t", "\\t")
+                                .replace("\n", "\\n")
+                                .replace("\r", "\\r"))
+    return "\t".join(fields) + "\n"
+
 class Export2PostgreSQL:
-    """控制 PostgreSQL 輸出"""
+    """控制 PostgreSQL 輸出
+
+    資料庫連線在第一次使用時才從共用的 connection pool 取得，用完以 ``close()``（或 ``with`` 區塊）歸還；
+    schema 初始化依 ``schema_version`` 表記錄的版本只執行尚未套用的部分，同一個 process 只檢查一次。
+    """
     def __init__(self, **kwargs) -> None:
-        # 建立資料庫連線
-        self.conn = psycopg2.connect(dbname=os.getenv("PG_DBNAME"),
-                                     user=os.getenv("PG_USERNAME"),
-                                     password=os.getenv("PG_PASSWORD"),
-                                     host=os.getenv("PG_HOST") or "localhost",
-                                     port=os.getenv("PG_PORT"),
-                                     )
-        self.cursor = self.conn.cursor()
+        # 連線延遲到第一次使用時才建立
+        self._conn = None
+        self._cursor = None
 
         # 設定 schema 和 table 名稱
         self.schema = kwargs.get("schema", "japanese_news")
         self.news_table = kwargs.get("news_table", "news")
         self.media_table = kwargs.get("media_table", "media")
         self.html_content_table = kwargs.get("html_content_table", "html_contents")
+        self.revision_table = kwargs.get("revision_table", "html_content_revisions")
 
         # SQL 緩存
         self.sql_cache = []
 
-        # 初始化資料庫結構
-        self._initialize()
+        # 是否以 publication_time 按月分區 news 與 html_contents（只在建立新表時生效，實際狀態於連線後確認）
+        self.partitioned:bool = kwargs.get("partitioned",
+                                           os.getenv("PG_PARTITIONED", "").lower() in ("1", "true", "yes"))
+        # 已確認存在的月份分區
+        self._partitions = set()
 
-    def _initialize(self):
-        """初始化資料庫結構，建立 schema 和 tables"""
-        # 建立 schema 的 SQL 語句
-        create_schema_sql = f"CREATE SCHEMA IF NOT EXISTS \"{self.schema}\";"
+        # 各 table 累計的新增／更新／未變動筆數
+        self.stats:Dict[str, ExportStats] = defaultdict(ExportStats)
+
+        # 寫入失敗的批次存入 dead-letter spool（spool=None 表示不保留），成功寫入後自動重送到期的批次
+        self.spool:Optional[DeadLetterSpool] = kwargs.get("spool", DeadLetterSpool())
+        self.replay_interval = kwargs.get("replay_interval", 30)
+        self._next_replay_check = 0.0
+        self._replaying = False
+
+    @property
+    def conn(self):
+        """從 connection pool 取得的連線，第一次取得時確認資料庫結構"""
+        if self._conn is None:
+            self._conn = get_pool().getconn()
+            try:
+                self._initialize()
+            except Exception:
+                self.close()
+                raise
+        return self._conn
 
+    @property
+    def cursor(self):
+        if self._cursor is None or self._cursor.closed:
+            self._cursor = self.conn.cursor()
+        return self._cursor
+
+    def close(self) -> None:
+        """將連線歸還 connection pool"""
+        if self._cursor is not None and not self._cursor.closed:
+            self._cursor.close()
+        self._cursor = None
+        if self._conn is not None:
+            get_pool().putconn(self._conn)
+            self._conn = None
+
+    def __enter__(self) -> "Export2PostgreSQL":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _migrations(self) -> List[Tuple[int, List[str]]]:
+        """依版本排列的資料庫結構變更，每個版本只會在資料庫中執行一次"""
         # 建立 media 表的 SQL 語句
         create_media_table_sql = f"""
         CREATE TABLE IF NOT EXISTS \"{self.schema}\".\"{self.media_table}\" (
@@ -63,45 +267,316 @@ class Export2PostgreSQL:
         );
         """
 
+        # 分區模式下 publication_time 為分區鍵，必須列入 primary key 且不可為 NULL；
+        # 分區表無法以 id 單獨被參照，因此 news 不設定到 html_content 的外鍵
+        if self.partitioned:
+            publication_time_sql = "publication_time TIMESTAMP NOT NULL"
+            primary_key_sql = "PRIMARY KEY (id, publication_time)"
+            partition_sql = " PARTITION BY RANGE (publication_time)"
+            html_content_foreign_key_sql = ""
+        else:
+            publication_time_sql = "publication_time TIMESTAMP"
+            primary_key_sql = "PRIMARY KEY (id)"
+            partition_sql = ""
+            html_content_foreign_key_sql = (f",\n            FOREIGN KEY (html_content_id) REFERENCES "
+                                            f"\"{self.schema}\".\"{self.html_content_table}\"(id) ON DELETE CASCADE")
+
         # 建立 html_content 表的 SQL 語句
         create_html_content_table_sql = f"""
         CREATE TABLE IF NOT EXISTS \"{self.schema}\".\"{self.html_content_table}\" (
-            id VARCHAR(127) PRIMARY KEY,
+            id VARCHAR(127),
             status INT,
             url VARCHAR(511),
             filepath VARCHAR(511),
             title VARCHAR(255),
             article TEXT,
-            publication_time TIMESTAMP,
-            download_time TIMESTAMP
-        );
+            {publication_time_sql},
+            download_time TIMESTAMP,
+            {primary_key_sql}
+        ){partition_sql};
         """
 
         # 建立 news 表的 SQL 語句，並設定外鍵關聯到 media, html_content
         create_news_table_sql = f"""
         CREATE TABLE IF NOT EXISTS \"{self.schema}\".\"{self.news_table}\" (
-            id VARCHAR(127) PRIMARY KEY,
+            id VARCHAR(127),
             source VARCHAR(255),
             source_id VARCHAR(255),
             title VARCHAR(255),
             url VARCHAR(511),
-            publication_time TIMESTAMP,
+            {publication_time_sql},
             download_time TIMESTAMP,
             author TEXT,
             media_id VARCHAR(127),
             html_content_id VARCHAR(127),
-            FOREIGN KEY (media_id) REFERENCES \"{self.schema}\".\"{self.media_table}\"(id) ON DELETE CASCADE,
-            FOREIGN KEY (html_content_id) REFERENCES \"{self.schema}\".\"{self.html_content_table}\"(id) ON DELETE CASCADE
+            {primary_key_sql},
+            FOREIGN KEY (media_id) REFERENCES \"{self.schema}\".\"{self.media_table}\"(id) ON DELETE CASCADE{html_content_foreign_key_sql}
+        ){partition_sql};
+        """
+
+        # 分區表的 default partition，收容尚未建立月份分區的資料
+        create_default_partition_sql = [f"""
+        CREATE TABLE IF NOT EXISTS \"{self.schema}\".\"{table}_default\"
+            PARTITION OF \"{self.schema}\".\"{table}\" DEFAULT;
+        """ for table in (self.html_content_table, self.news_table)] if self.partitioned else []
+
+        # 內容雜湊欄位，用來略過內容沒有變動的 upsert
+        add_content_hash_sql = [f"""
+        ALTER TABLE \"{self.schema}\".\"{table}\" ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+        """ for table in (self.media_table, self.html_content_table, self.news_table)]
+
+        # 儀表板常用的查詢條件
+        create_index_sql = [f"""
+        CREATE INDEX IF NOT EXISTS \"{self.news_table}_source_publication_time_idx\"
+            ON \"{self.schema}\".\"{self.news_table}\" (source, publication_time);
+        """, f"""
+        CREATE INDEX IF NOT EXISTS \"{self.news_table}_source_id_idx\"
+            ON \"{self.schema}\".\"{self.news_table}\" (source_id);
+        """]
+
+        # 全文檢索：html_contents 以 generated column 保存標題與內文的單字元及雙字元 n-gram，並建立 GIN 索引；
+        # 正規化方式需與 search.normalize_text / search.ngrams 一致
+        create_search_index_sql = [f"""
+        CREATE OR REPLACE FUNCTION \"{self.schema}\".search_document(title TEXT, article TEXT)
+        RETURNS TEXT LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower(normalize(coalesce(title, '') || E'\\n' || coalesce(article, ''), NFKC));
+        $$;
+        """, f"""
+        CREATE OR REPLACE FUNCTION \"{self.schema}\".search_ngrams(document TEXT)
+        RETURNS TEXT[] LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+            SELECT coalesce(array_agg(DISTINCT gram), '{{}}')
+            FROM generate_series(1, char_length(document)) AS i,
+                 LATERAL (VALUES (substr(document, i, 1)), (substr(document, i, 2))) AS grams(gram)
+            WHERE gram !~ '\\s';
+        $$;
+        """, f"""
+        ALTER TABLE \"{self.schema}\".\"{self.html_content_table}\"
+            ADD COLUMN IF NOT EXISTS search_grams TEXT[] GENERATED ALWAYS AS
+            (\"{self.schema}\".search_ngrams(\"{self.schema}\".search_document(title, article))) STORED;
+        """, f"""
+        CREATE INDEX IF NOT EXISTS \"{self.html_content_table}_search_grams_idx\"
+            ON \"{self.schema}\".\"{self.html_content_table}\" USING GIN (search_grams);
+        """]
+
+        # 文章改版時保留舊版本：delta 為由取代它的版本還原舊版內文的差異（revisions.make_delta），
+        # content_hash 為被取代版本的雜湊，重送同一批資料時只會更新 delta 而不會重複記錄
+        create_revision_sql = [f"""
+        ALTER TABLE \"{self.schema}\".\"{self.html_content_table}\"
+            ADD COLUMN IF NOT EXISTS modified_time TIMESTAMP;
+        """, f"""
+        CREATE TABLE IF NOT EXISTS \"{self.schema}\".\"{self.revision_table}\" (
+            html_content_id VARCHAR(127) NOT NULL,
+            revision INT NOT NULL,
+            title TEXT,
+            delta TEXT,
+            modified_time TIMESTAMP,
+            download_time TIMESTAMP,
+            content_hash CHAR(32) NOT NULL,
+            created_time TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (html_content_id, revision),
+            UNIQUE (html_content_id, content_hash)
+        );
+        """]
+
+        return [(1, [create_media_table_sql,
+                     create_html_content_table_sql,
+                     create_news_table_sql,
+                     *create_default_partition_sql,
+                     ]),
+                (2, add_content_hash_sql),
+                (3, create_index_sql),
+                (4, create_search_index_sql),
+                (5, create_revision_sql),
+                ]
+
+    @property
+    def _version_key(self) -> str:
+        """schema_version 表中代表這組 table 的名稱"""
+        return f"{self.news_table},{self.media_table},{self.html_content_table}"
+
+    def _current_version(self) -> int:
+        """讀取目前資料庫結構版本，尚未建立 schema_version 表時回傳 -1"""
+        try:
+            self._cursor.execute(f"""
+            SELECT version FROM "{self.schema}"."{SCHEMA_VERSION_TABLE}" WHERE name = %s;
+            """, (self._version_key,))
+        except (psycopg2.errors.UndefinedTable, psycopg2.errors.InvalidSchemaName):
+            self._conn.rollback()
+            return -1
+        row = self._cursor.fetchone()
+        return row[0] if row else 0
+
+    def _initialize(self):
+        """初始化資料庫結構，依 schema_version 只套用尚未執行的版本"""
+        key = (self.schema, self._version_key)
+        if key in _initialized:
+            self.partitioned = _initialized[key]
+            return
+        # 此時 self.conn 仍在建立中，直接使用 self._conn
+        self._cursor = self._conn.cursor()
+        migrations = self._migrations()
+        latest = migrations[-1][0]
+
+        # 多數情況下資料庫已是最新版本，只需一次查詢
+        if self._current_version() >= latest:
+            self._detect_partitioning()
+            self._conn.commit()
+            _initialized[key] = self.partitioned
+            return
+
+        # 建立 schema 和 schema_version 表，並以 advisory lock 避免多個 worker 同時套用
+        self._cursor.execute(f"CREATE SCHEMA IF NOT EXISTS \"{self.schema}\";")
+        self._cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{self.schema}"."{SCHEMA_VERSION_TABLE}" (
+            name VARCHAR(255) PRIMARY KEY,
+            version INT NOT NULL,
+            updated_time TIMESTAMP DEFAULT now()
         );
+        """)
+        self._cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));",
+                             (f"{self.schema}.{self._version_key}",))
+        current = self._current_version()
+        for version, statements in migrations:
+            if version <= current:
+                continue
+            for sql in statements:
+                self._cursor.execute(sql)
+        self._cursor.execute(f"""
+        INSERT INTO "{self.schema}"."{SCHEMA_VERSION_TABLE}" (name, version)
+        VALUES (%s, %s)
+        ON CONFLICT (name)
+        DO UPDATE SET version = EXCLUDED.version, updated_time = now();
+        """, (self._version_key, latest))
+        self._detect_partitioning()
+        self._conn.commit()
+        _initialized[key] = self.partitioned
+
+    def _detect_partitioning(self) -> None:
+        """依資料庫中 news 表的實際型態決定是否以分區模式寫入（既有的一般表不會被轉換）"""
+        self._cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table
+            WHERE partrelid = to_regclass(%s)
+        );
+        """, (f'"{self.schema}"."{self.news_table}"',))
+        partitioned = self._cursor.fetchone()[0]
+        if self.partitioned and not partitioned:
+            print(f"{self.schema}.{self.news_table} already exists as a regular table, partitioning skipped")
+        self.partitioned = partitioned
+
+    @property
+    def _conflict_target(self) -> str:
+        """news 與 html_contents 的 upsert 衝突鍵，分區表的 primary key 包含分區鍵"""
+        return "(id, publication_time)" if self.partitioned else "(id)"
+
+    def _returning(self, table:str) -> str:
+        """upsert 的 RETURNING 欄位；分區表不能回傳 xmax，改回傳主鍵再以 id 與寫入前的資料比對"""
+        if self.partitioned and table in (self.news_table, self.html_content_table):
+            return "id, publication_time"
+        return "(xmax = 0)"
+
+    def _existing_keys(self,
+                       table:str,
+                       id_filter:str,
+                       params:tuple=(),
+                       ) -> Optional[set]:
+        """分區表寫入前先查出已存在的 id，一般表不需要時回傳 None"""
+        if self._returning(table) == "(xmax = 0)":
+            return None
+        self.cursor.execute(f"""
+        SELECT id FROM "{self.schema}"."{table}" WHERE {id_filter};
+        """, params)
+        return {row[0] for row in self.cursor.fetchall()}
+
+    @staticmethod
+    def _inserted_flags(returned:List[tuple], existing:Optional[set]) -> List[tuple]:
+        """將 RETURNING 的結果統一成 ExportStats.add 需要的 (是否為新增,)"""
+        if existing is None:
+            return returned
+        return [(row[0] not in existing,) for row in returned]
+
+    def _delete_moved(self,
+                      table:str,
+                      source_sql:str,
+                      params:tuple=(),
+                      ) -> None:
+        """分區表的主鍵包含 publication_time，文章的發布時間改變時先刪除舊的列（不 commit）
+
+        否則 upsert 會以新的 (id, publication_time) 再新增一列，同一篇文章變成兩列。
+
+        Args:
+            table (str): 目標表
+            source_sql (str): 即將寫入的 (id, publication_time) 的 SELECT
+            params (tuple, optional): source_sql 的參數. Defaults to ().
         """
+        if self._returning(table) == "(xmax = 0)":
+            return
+        self.cursor.execute(f"""
+        DELETE FROM "{self.schema}"."{table}" AS t
+        USING ({source_sql}) AS s
+        WHERE t.id = s.id AND t.publication_time <> s.publication_time::timestamp;
+        """, params)
 
-        # 執行 SQL 語句以創建 schema 和 tables
-        self.cursor.execute(create_schema_sql)
-        self.cursor.execute(create_media_table_sql)
-        self.cursor.execute(create_html_content_table_sql)
-        self.cursor.execute(create_news_table_sql)
+    def ensure_partitions(self,
+                          table:str,
+                          times:Iterable[Optional[datetime]],
+                          ) -> List[str]:
+        """確保 times 所在月份的分區存在（非分區表時不做任何事）
+
+        月份以資料庫 session 的時區換算，與寫入 TIMESTAMP 欄位時的轉換一致。若 default partition
+        已有該月份的資料，分區無法建立，資料會繼續留在 default partition。
+
+        Args:
+            table (str): news 或 html_contents 的表名
+            times (Iterable[Optional[datetime]]): 即將寫入的 publication_time
+
+        Returns:
+            List[str]: 新建立的分區名稱
+        """
+        cursor = self.cursor  # 確保已初始化，self.partitioned 才會反映實際的表結構
+        times = [time for time in times if time is not None]
+        if not self.partitioned or not times:
+            return []
+        cursor.execute("""
+        SELECT DISTINCT date_trunc('month', t::timestamp)::date
+        FROM unnest(%s::timestamptz[]) AS t;
+        """, (times,))
+        months = sorted(row[0] for row in cursor.fetchall())
         self.conn.commit()
 
+        created = []
+        for month in months:
+            name = f"{table}_p{month:%Y%m}"
+            if (self.schema, name) in self._partitions:
+                continue
+            end = (month + timedelta(days=32)).replace(day=1)
+            try:
+                cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS "{self.schema}"."{name}"
+                    PARTITION OF "{self.schema}"."{table}" FOR VALUES FROM (%s) TO (%s);
+                """, (month, end))
+                self.conn.commit()
+                created.append(name)
+            except psycopg2.errors.CheckViolation as err:
+                self.conn.rollback()
+                print(f"Partition {name} not created, {table}_default already holds its rows: {err}")
+            self._partitions.add((self.schema, name))
+        return created
+
+    def _prepare_partitions(self,
+                            news:List[News],
+                            html_contents:List[HTMLContent],
+                            ) -> Optional[Exception]:
+        """寫入前建立所需的月份分區，失敗時回傳錯誤"""
+        try:
+            self.ensure_partitions(self.html_content_table, (obj.publication_time for obj in html_contents))
+            self.ensure_partitions(self.news_table, (obj.publication_time for obj in news))
+        except psycopg2.Error as err:
+            self._rollback()
+            print(f"Database error while creating partitions: {err}")
+            return err
+        return None
+
     def _insert_to_news_table(self,
                               obj:News,
                               schema:str,
@@ -111,9 +586,9 @@ class Export2PostgreSQL:
 
         sql = f"""
         INSERT INTO "{schema}"."{table}"
-        (id, source, source_id, title, url, publication_time, download_time, author, media_id, html_content_id)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (id)
+        (id, source, source_id, title, url, publication_time, download_time, author, media_id, html_content_id, content_hash)
+        VALUES %s
+        ON CONFLICT {self._conflict_target}
         DO UPDATE SET
             source = EXCLUDED.source,
             source_id = EXCLUDED.source_id,
@@ -123,23 +598,15 @@ class Export2PostgreSQL:
             download_time = EXCLUDED.download_time,
             author = EXCLUDED.author,
             media_id = EXCLUDED.media_id,
-            html_content_id = EXCLUDED.html_content_id;
+            html_content_id = EXCLUDED.html_content_id,
+            content_hash = EXCLUDED.content_hash
+        WHERE "{table}".content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING {self._returning(table)};
         """
 
-        values = (
-            str(obj.id),  # 將 int 轉為字串以符合 VARCHAR(50) 的定義
-            obj.source,
-            obj.source_id,
-            obj.title,
-            obj.url,
-            obj.publication_time,
-            obj.download_time,
-            obj.author,
-            obj.media.id if obj.media else None,
-            obj.html_content.id if obj.html_content else None,
-        )
+        values = _news_values(obj, self.partitioned)
 
-        self.sql_cache.append((sql, values))
+        self.sql_cache.append((table, sql, values))
         return sql, values
 
     def _insert_to_media_table(self,
@@ -150,8 +617,8 @@ class Export2PostgreSQL:
         """生成插入 Media 資料的 SQL 字串與對應的值"""
         sql = f"""
         INSERT INTO "{schema}"."{table}"
-        (id, status, type, url, filepath, publication_time, download_time)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        (id, status, type, url, filepath, publication_time, download_time, content_hash)
+        VALUES %s
         ON CONFLICT (id)
         DO UPDATE SET
             status = EXCLUDED.status,
@@ -159,20 +626,15 @@ class Export2PostgreSQL:
             url = EXCLUDED.url,
             filepath = EXCLUDED.filepath,
             publication_time = EXCLUDED.publication_time,
-            download_time = EXCLUDED.download_time;
+            download_time = EXCLUDED.download_time,
+            content_hash = EXCLUDED.content_hash
+        WHERE "{table}".content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING {self._returning(table)};
         """
 
-        values = (
-            obj.id,
-            int(obj.status) if obj.status is not None else None,
-            obj.type,
-            obj.url,
-            str(obj.filepath) if obj.filepath else None,
-            obj.publication_time,
-            obj.download_time,
-        )
+        values = _media_values(obj)
 
-        self.sql_cache.append((sql, values))
+        self.sql_cache.append((table, sql, values))
         return sql, values
 
     def _insert_to_html_content_table(self,
@@ -183,9 +645,9 @@ class Export2PostgreSQL:
         """生成插入 HTMLContent 資料的 SQL 字串與對應的值"""
         sql = f"""
         INSERT INTO "{schema}"."{table}"
-        (id, status, url, filepath, title, article, publication_time, download_time)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (id)
+        (id, status, url, filepath, title, article, publication_time, download_time, modified_time, content_hash)
+        VALUES %s
+        ON CONFLICT {self._conflict_target}
         DO UPDATE SET
             status = EXCLUDED.status,
             url = EXCLUDED.url,
@@ -193,82 +655,900 @@ class Export2PostgreSQL:
             title = EXCLUDED.title,
             article = EXCLUDED.article,
             publication_time = EXCLUDED.publication_time,
-            download_time = EXCLUDED.download_time;
+            download_time = EXCLUDED.download_time,
+            modified_time = EXCLUDED.modified_time,
+            content_hash = EXCLUDED.content_hash
+        WHERE "{table}".content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING {self._returning(table)};
         """
 
-        values = (
-            obj.id,
-            int(obj.status) if obj.status is not None else None,
-            obj.url,
-            str(obj.filepath) if obj.filepath else None,
-            obj.title,
-            obj.article,
-            obj.publication_time,
-            obj.download_time,
-        )
+        values = _html_content_values(obj, self.partitioned)
 
-        self.sql_cache.append((sql, values))
+        self.sql_cache.append((table, sql, values))
         return sql, values
 
-    def _run_sql(self) -> None:
+    def _execute_group(self,
+                       table:str,
+                       sql:str,
+                       values:List[tuple],
+                       ) -> Optional[Exception]:
+        """以 execute_values 執行同一條 SQL 的一組資料並統計新增／更新／未變動筆數，失敗時回傳錯誤"""
+        # 同一條 INSERT 中不能更新同一列兩次，重複的 id 以最後一筆為準
+        values = list({value[0]: value for value in values}.values())
+        try:
+            existing = self._existing_keys(table, "id = ANY(%s)", ([value[0] for value in values],))
+            if existing:
+                index = (NEWS_COLUMNS if table == self.news_table else HTML_CONTENT_COLUMNS).index("publication_time")
+                self._delete_moved(table,
+                                   "SELECT * FROM unnest(%s::text[], %s::timestamptz[]) AS v(id, publication_time)",
+                                   ([value[0] for value in values], [value[index] for value in values]),
+                                   )
+            returned = self._inserted_flags(execute_values(self.cursor, sql, values, fetch=True), existing)
+            self.conn.commit()
+        except psycopg2.Error as err:
+            # 發生資料庫錯誤時進行回滾，以撤銷當前交易的所有變更，確保資料庫的一致性
+            self._rollback()
+            print(f"""Database error during batch execution: {err}. Rolled back transaction.
+                  follwing SQL not performed: {sql}, {values}""")
+            return err
+        self.stats[table].add(returned, len(values))
+        return None
+
+    def _rollback(self) -> None:
+        """回滾目前交易；連線已中斷時直接丟棄，下次使用時再從 pool 取得新的連線"""
+        if self._conn is None:
+            return
+        try:
+            if not self._conn.closed:
+                self._conn.rollback()
+                return
+        except psycopg2.Error:
+            pass
+        get_pool().putconn(self._conn, close=True)
+        self._conn = None
+        self._cursor = None
+
+    def _dead_letter(self,
+                     kind:SpoolKind,
+                     objs:list,
+                     error:Exception,
+                     ) -> None:
+        """寫入失敗的批次存入 dead-letter spool，之後自動重送"""
+        if self.spool is not None and not self._replaying:
+            self.spool.push(kind, objs, error)
+
+    def replay_dead_letters(self, force:bool=False) -> Dict[str, int]:
+        """重送 dead-letter spool 中已到重試時間（force 時為全部）的批次"""
+        if self.spool is None or self._replaying:
+            return {}
+
+        def handler(kind:SpoolKind, objs:list) -> bool:
+            if kind == "news":
+                return self._insert_many(objs) is None
+            return self._insert_html_contents(objs) is None
+
+        self._replaying = True
+        try:
+            return self.spool.replay(handler, force=force)
+        finally:
+            self._replaying = False
+
+    def _after_success(self) -> None:
+        """寫入成功代表資料庫可用，順便重送到期的 spool（最多每 replay_interval 秒檢查一次）"""
+        if self.spool is None or monotonic() < self._next_replay_check:
+            return
+        self._next_replay_check = monotonic() + self.replay_interval
+        if self.spool.next_due() <= time():
+            print("Replaying dead letters:", self.replay_dead_letters())
+
+    def _run_sql(self) -> Optional[Exception]:
         """執行緩存中的 SQL 語句，依據 SQL 語句的相似性選擇批次執行或單次執行，並保持執行順序。
+
+        Returns:
+            Optional[Exception]: 第一個發生的資料庫錯誤，全部成功時為 None
         """
         batch_group = []
+        current_table = None
         current_sql = None
+        errors = []
 
-        for sql, value in self.sql_cache:
+        for table, sql, value in self.sql_cache:
             # 檢查是否與前一條 SQL 相同
             if sql == current_sql:
                 batch_group.append(value)
             else:
                 # 如果有累積的批次組，就執行批次操作
                 if batch_group:
-                    try:
-                        execute_batch(self.cursor, current_sql, batch_group)
-                        self.conn.commit()
-                    except psycopg2.DatabaseError as err:
-                        # 發生資料庫錯誤時進行回滾，以撤銷當前交易的所有變更，確保資料庫的一致性
-                        self.conn.rollback()
-                        print(f"""Database error during batch execution: {err}. Rolled back transaction.
-                              follwing SQL not performed: {current_sql}, {batch_group}""")
-                    finally:
-                        batch_group = []
+                    errors.append(self._execute_group(current_table, current_sql, batch_group))
 
                 # 更新當前 SQL 並加入第一個值
+                current_table = table
                 current_sql = sql
                 batch_group = [value]
 
         # 處理最後一組批次操作
         if batch_group:
-            try:
-                execute_batch(self.cursor, current_sql, batch_group)
-                self.conn.commit()
-            except psycopg2.DatabaseError as err:
-                self.conn.rollback()
-                print(f"Database error during batch execution: {err}. Rolled back transaction.")
+            errors.append(self._execute_group(current_table, current_sql, batch_group))
 
         # 清空 SQL 快取
         self.sql_cache.clear()
+        return next((err for err in errors if err is not None), None)
 
-    def insert(self, obj:News):
-        """..."""
-        if obj.media:
-            self._insert_to_media_table(obj.media,
-                                        self.schema,
-                                        self.media_table,
-                                        )
-        if obj.html_content:
-            self._insert_to_html_content_table(obj.html_content,
+    def insert(self, obj:News) -> None:
+        """寫入單筆 News（連同其 Media 與 HTMLContent）
+
+        與 insert_many 相同，修訂紀錄與三張表的 upsert 在同一個 transaction 中完成，
+        任一步失敗都會整筆回滾並存入 dead-letter spool。
+        """
+        self.insert_many([obj])
+
+    def insert_many(self, objs:Iterable[News]) -> int:
+        """以 COPY 批次匯入大量 News。
+
+        所有資料先以 COPY 串流進暫存表，再對 media、html_contents、news 各做一次 set-based upsert，
+        全部在同一個 transaction 中完成；同一批中重複的 id 以最後出現的為準。寫入失敗的批次會存入
+        dead-letter spool 稍後重送；若是個別資料列的錯誤（ROW_ERRORS），批次會對半拆開重試，
+        其餘的列照常寫入，只有有問題的列各自存入 spool。
+
+        Args:
+            objs (Iterable[News]): 要匯入的 News
+
+        Returns:
+            int: 匯入的 News 筆數（失敗回滾的不計）
+        """
+        objs = list(objs)
+        EXPORT_BATCH_ITEMS.labels(exporter="postgresql", operation="insert_many").observe(len(objs))
+        with EXPORT_BATCH_SECONDS.labels(exporter="postgresql", operation="insert_many").time(), \
+             span("postgresql.insert_many"):
+            count, failures = self._insert_bisect(objs)
+        for failed, error in failures:
+            self._dead_letter("news", failed, error)
+        if count:
+            self._after_success()
+        return count
+
+    def _insert_bisect(self, objs:List[News]) -> Tuple[int, List[Tuple[List[News], Exception]]]:
+        """寫入 objs，遇到 ROW_ERRORS 時對半拆開重試直到找出有問題的單筆
+
+        Returns:
+            Tuple[int, List[Tuple[List[News], Exception]]]: 寫入的筆數，以及無法寫入的各組資料與其錯誤
+                （資料列錯誤為單筆一組，連線中斷等其他錯誤則整組）
+        """
+        error = self._insert_many(objs)
+        if error is None:
+            return len(objs), []
+        if len(objs) <= 1 or not isinstance(error, ROW_ERRORS):
+            return 0, [(objs, error)]
+        middle = len(objs) // 2
+        with span("bisect"):
+            left_count, left_failures = self._insert_bisect(objs[:middle])
+            right_count, right_failures = self._insert_bisect(objs[middle:])
+        return left_count + right_count, left_failures + right_failures
+
+    def _insert_many(self, objs:List[News]) -> Optional[Exception]:
+        """insert_many 的實際寫入，失敗時回傳錯誤"""
+        error = self._prepare_partitions(objs, [obj.html_content for obj in objs if obj.html_content])
+        if error is not None:
+            return error
+        tables = [(self.media_table, MEDIA_COLUMNS),
+                  (self.html_content_table, HTML_CONTENT_COLUMNS),
+                  (self.news_table, NEWS_COLUMNS),
+                  ]
+        # 超過 max_size 的資料會自動落地成暫存檔，不會整批留在記憶體
+        buffers = {table: SpooledTemporaryFile(max_size=32 << 20, mode="w+", encoding="utf-8")
+                   for table, _ in tables}
+        ids = {table: set() for table, _ in tables}
+        count = 0
+        for obj in objs:
+            if obj.media:
+                buffers[self.media_table].write(_copy_line(_media_values(obj.media)))
+                ids[self.media_table].add(obj.media.id)
+            if obj.html_content:
+                buffers[self.html_content_table].write(_copy_line(_html_content_values(obj.html_content,
+                                                                                       self.partitioned)))
+                ids[self.html_content_table].add(obj.html_content.id)
+            buffers[self.news_table].write(_copy_line(_news_values(obj, self.partitioned)))
+            ids[self.news_table].add(obj.id)
+            count += 1
+
+        try:
+            with span("revisions"):
+                self._record_revisions([obj.html_content for obj in objs if obj.html_content])
+            # 有 Foreign Key 的 Table 要最後合併
+            returned = {}
+            for table, columns in tables:
+                buffers[table].seek(0)
+                with span(f"merge.{table}"):
+                    returned[table] = self._merge_from_copy(table, columns, buffers[table])
+            with span("commit"):
+                self.conn.commit()
+        except psycopg2.Error as err:
+            self._rollback()
+            print(f"Database error during bulk insert: {err}. Rolled back transaction, {count} news not inserted.")
+            return err
+        finally:
+            for buffer in buffers.values():
+                buffer.close()
+        for table, _ in tables:
+            self.stats[table].add(returned[table], len(ids[table]))
+        return None
+
+    def _merge_from_copy(self,
+                         table:str,
+                         columns:Tuple[str, ...],
+                         buffer,
+                         ) -> List[tuple]:
+        """將 buffer 以 COPY 載入暫存表，再 upsert 進目標表（不 commit），回傳有寫入的列"""
+        stage = f"_stage_{table}"
+        column_list = ", ".join(columns + ("content_hash",))
+        time_columns = "".join(f"ALTER COLUMN {column} TYPE TIMESTAMPTZ, "
+                               for column in columns if column.endswith("_time"))
+        self.cursor.execute(f"""
+        CREATE TEMP TABLE "{stage}" (LIKE "{self.schema}"."{table}" INCLUDING DEFAULTS) ON COMMIT DROP;
+        ALTER TABLE "{stage}" {time_columns}ADD COLUMN _seq BIGSERIAL;
+        """)  # 時間欄位先以 TIMESTAMPTZ 接收，轉換結果才會與逐筆 INSERT 一致
+        self.cursor.copy_expert(f'COPY "{stage}" ({column_list}) FROM STDIN', buffer)
+
+        existing = self._existing_keys(table, f'id IN (SELECT id FROM "{stage}")')
+        if existing:
+            self._delete_moved(table, f'SELECT DISTINCT ON (id) id, publication_time FROM "{stage}" ORDER BY id, _seq DESC')
+        update_list = ",\n            ".join(f"{column} = EXCLUDED.{column}"
+                                              for column in columns + ("content_hash",) if column != "id")
+        self.cursor.execute(f"""
+        INSERT INTO "{self.schema}"."{table}" ({column_list})
+        SELECT DISTINCT ON (id) {column_list}
+        FROM "{stage}"
+        ORDER BY id, _seq DESC
+        ON CONFLICT {"(id)" if table == self.media_table else self._conflict_target}
+        DO UPDATE SET
+            {update_list}
+        WHERE "{table}".content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING {self._returning(table)};
+        """)
+        return self._inserted_flags(self.cursor.fetchall(), existing)
+
+    def insert_html_contents(self, objs:Iterable[HTMLContent]) -> None:
+        """只更新 HTMLContent（例如重新解析既有的 html 後），不動 news 與 media"""
+        objs = list(objs)
+        EXPORT_BATCH_ITEMS.labels(exporter="postgresql", operation="insert_html_contents").observe(len(objs))
+        with EXPORT_BATCH_SECONDS.labels(exporter="postgresql", operation="insert_html_contents").time(), \
+             span("postgresql.insert_html_contents"):
+            error = self._insert_html_contents(objs)
+        if error is not None:
+            self._dead_letter("html_contents", objs, error)
+        else:
+            self._after_success()
+
+    def _insert_html_contents(self, objs:List[HTMLContent]) -> Optional[Exception]:
+        error = self._prepare_partitions([], objs)
+        if error is not None:
+            return error
+        for obj in objs:
+            self._insert_to_html_content_table(obj,
                                                self.schema,
                                                self.html_content_table,
                                                )
-        
-        # 有 Foreign Key 的 Table 要最後插入
-        self._insert_to_news_table(obj,
-                                   self.schema,
-                                   self.news_table,
-                                   )
-        self._run_sql()
+        return self._run_sql()
+
+    def fetch_html_contents(self,
+                            ids:Iterable[str],
+                            chunk_size:int=1000,
+                            ) -> Dict[str, HTMLContent]:
+        """依 id 讀回已存在資料庫中的 HTMLContent（不含原始 html）"""
+        sql = f"""
+        SELECT id, status, url, filepath, title, article, publication_time, download_time, modified_time
+        FROM "{self.schema}"."{self.html_content_table}"
+        WHERE id = ANY(%s);
+        """
+        ids = list(ids)
+        contents = {}
+        for start in range(0, len(ids), chunk_size):
+            self.cursor.execute(sql, (ids[start:start + chunk_size],))
+            for row in self.cursor.fetchall():
+                contents[row[0]] = HTMLContent(status=row[1],
+                                               id=row[0],
+                                               url=row[2],
+                                               filepath=Path(row[3]) if row[3] else None,
+                                               title=row[4],
+                                               article=row[5],
+                                               publication_time=row[6],
+                                               download_time=row[7],
+                                               modified_time=row[8],
+                                               )
+        self.conn.commit()
+        return contents
+
+    def fetch_modified_times(self,
+                             ids:Iterable[str],
+                             chunk_size:int=1000,
+                             ) -> Dict[str, datetime]:
+        """依 id 查詢已存在的 HTMLContent 最後修改時間（沒有 modified_time 時以 publication_time 代替）
+
+        回傳帶時區的時間，可直接與 feed 的 pubDate、JSON-LD 的 dateModified 比較；
+        供 NHKWebCrawler.iter_recent_news 的 stored_times 使用。
+
+        Args:
+            ids (Iterable[str]): HTMLContent 的 id
+            chunk_size (int, optional): 每次查詢的 id 數，預設 1000
+
+        Returns:
+            Dict[str, datetime]: id -> 最後修改時間，不存在或沒有任何時間的 id 不會出現
+        """
+        sql = f"""
+        SELECT id, max(coalesce(modified_time, publication_time)::timestamptz)
+        FROM "{self.schema}"."{self.html_content_table}"
+        WHERE id = ANY(%s)
+        GROUP BY id;
+        """
+        ids = list(ids)
+        times = {}
+        for start in range(0, len(ids), chunk_size):
+            self.cursor.execute(sql, (ids[start:start + chunk_size],))
+            times.update((row[0], row[1]) for row in self.cursor.fetchall() if row[1] is not None)
+        self.conn.commit()
+        return times
+
+    def _record_revisions(self, objs:List[HTMLContent]) -> int:
+        """標題或內文有變動時，在同一個 transaction 中先把目前的版本存成 revision（不 commit）
+
+        只保存標題與由新版內文還原舊版內文的 delta，內容未變的部分不會重複儲存。
+
+        Returns:
+            int: 新增的 revision 筆數
+        """
+        objs = {obj.id: obj for obj in objs}  # 同一批中重複的 id 以最後一筆為準
+        if not objs:
+            return 0
+        self.cursor.execute(f"""
+        SELECT id, title, article, modified_time, download_time, content_hash
+        FROM "{self.schema}"."{self.html_content_table}"
+        WHERE id = ANY(%s) AND content_hash IS NOT NULL;
+        """, (list(objs),))
+        count = 0
+        for html_content_id, title, article, modified_time, download_time, content_hash in self.cursor.fetchall():
+            obj = objs[html_content_id]
+            if (obj.title, obj.article) == (title, article):
+                continue
+            self.cursor.execute(f"""
+            INSERT INTO "{self.schema}"."{self.revision_table}"
+            (html_content_id, revision, title, delta, modified_time, download_time, content_hash)
+            SELECT %(id)s, coalesce(max(revision), 0) + 1, %(title)s, %(delta)s,
+                   %(modified_time)s, %(download_time)s, %(content_hash)s
+            FROM "{self.schema}"."{self.revision_table}"
+            WHERE html_content_id = %(id)s
+            ON CONFLICT (html_content_id, content_hash)
+            DO UPDATE SET delta = EXCLUDED.delta;
+            """, {"id": html_content_id,
+                  "title": title,
+                  "delta": make_text_delta(obj.article, article),
+                  "modified_time": modified_time,
+                  "download_time": download_time,
+                  "content_hash": content_hash,
+                  })
+            count += self.cursor.rowcount
+        return count
+
+    def get_revisions(self, html_content_id:str) -> List[Dict[str, Any]]:
+        """讀回一篇文章的所有版本，由目前的內文依序套用 delta 還原舊版內文
+
+        Args:
+            html_content_id (str): HTMLContent 的 id
+
+        Returns:
+            List[Dict[str, Any]]: 由新到舊的版本，含 revision、title、article、modified_time、download_time；
+                第一筆為目前的版本，文章不存在時為空 list
+        """
+        self.cursor.execute(f"""
+        SELECT title, article, modified_time, download_time
+        FROM "{self.schema}"."{self.html_content_table}"
+        WHERE id = %s
+        ORDER BY download_time DESC NULLS LAST
+        LIMIT 1;
+        """, (html_content_id,))
+        current = self.cursor.fetchone()
+        self.cursor.execute(f"""
+        SELECT revision, title, delta, modified_time, download_time
+        FROM "{self.schema}"."{self.revision_table}"
+        WHERE html_content_id = %s
+        ORDER BY revision DESC;
+        """, (html_content_id,))
+        rows = self.cursor.fetchall()
+        self.conn.commit()
+        if current is None:
+            return []
+
+        title, article, modified_time, download_time = current
+        revisions = [{"revision": (rows[0][0] if rows else 0) + 1,
+                      "title": title,
+                      "article": article,
+                      "modified_time": modified_time,
+                      "download_time": download_time,
+                      }]
+        for revision, title, delta, modified_time, download_time in rows:
+            article = apply_text_delta(article, delta)
+            revisions.append({"revision": revision,
+                              "title": title,
+                              "article": article,
+                              "modified_time": modified_time,
+                              "download_time": download_time,
+                              })
+        return revisions
+
+    def search(self,
+               query:str,
+               start_time:Optional[datetime]=None,
+               end_time:Optional[datetime]=None,
+               source:Optional[str]=None,
+               limit:int=20,
+               ) -> List[Dict[str, Any]]:
+        """以 n-gram 索引全文檢索 html_contents 的標題與內文
+
+        以空白分隔的每個詞都必須出現（不分全形半形與大小寫）。先以 GIN 索引找出包含所有 n-gram 的候選，
+        再以子字串比對確認；排序依詞出現次數（標題中出現的權重為 10 倍），同分時較新的在前。
+
+        Args:
+            query (str): 檢索字串
+            start_time (Optional[datetime], optional): publication_time 下限（含）
+            end_time (Optional[datetime], optional): publication_time 上限（不含）
+            source (Optional[str], optional): 只找指定來源的新聞，例如 "NHK Easy Web"
+            limit (int, optional): 最多回傳筆數，預設 20
+
+        Returns:
+            List[Dict[str, Any]]: 依分數排序的結果，含 news_id、source、html_content_id、title、url、
+                publication_time、score 與內文摘要 snippet
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        params = {"grams": query_grams(terms), "limit": limit}
+        filters = ["search_grams @> %(grams)s::text[]"]
+        if start_time is not None:
+            filters.append("publication_time >= %(start_time)s")
+            params["start_time"] = start_time
+        if end_time is not None:
+            filters.append("publication_time < %(end_time)s")
+            params["end_time"] = end_time
+
+        matches, scores = [], []
+        for index, term in enumerate(terms):
+            params[f"term{index}"] = term
+            matches.append(f"strpos(c.document, %(term{index})s) > 0")
+            for text, weight in (("c.title_text", 10), ("c.document", 1)):
+                scores.append(f"{weight} * (char_length({text}) - char_length(replace({text}, %(term{index})s, '')))"
+                              f" / char_length(%(term{index})s)")
+        if source is not None:
+            matches.append("n.source = %(source)s")
+            params["source"] = source
+
+        self.cursor.execute(f"""
+        WITH candidates AS (
+            SELECT id, title, url, article, publication_time,
+                   \"{self.schema}\".search_document(title, NULL) AS title_text,
+                   \"{self.schema}\".search_document(title, article) AS document
+            FROM \"{self.schema}\".\"{self.html_content_table}\"
+            WHERE {" AND ".join(filters)}
+        )
+        SELECT n.id, n.source, c.id, c.title, c.url, c.publication_time, c.article, {" + ".join(scores)} AS score
+        FROM candidates c
+        {"JOIN" if source is not None else "LEFT JOIN"} \"{self.schema}\".\"{self.news_table}\" n
+            ON n.html_content_id = c.id
+        WHERE {" AND ".join(matches)}
+        ORDER BY score DESC, c.publication_time DESC NULLS LAST
+        LIMIT %(limit)s;
+        """, params)
+        rows = self.cursor.fetchall()
+        self.conn.commit()
+        return [{"news_id": row[0],
+                 "source": row[1],
+                 "html_content_id": row[2],
+                 "title": row[3],
+                 "url": row[4],
+                 "publication_time": row[5],
+                 "score": row[7],
+                 "snippet": make_snippet(row[6], terms),
+                 } for row in rows]
+
+    def list_news(self,
+                  source:Optional[str]=None,
+                  start_time:Optional[datetime]=None,
+                  end_time:Optional[datetime]=None,
+                  after:Optional[Tuple[Optional[datetime], str]]=None,
+                  limit:int=50,
+                  ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Optional[datetime], str]]]:
+        """依 publication_time 由新到舊列出 news，以 keyset（publication_time, id）分頁
+
+        與 OFFSET 分頁不同，每一頁都只需從索引上一次的位置往後讀，翻到很後面的頁數也一樣快，
+        期間有新資料寫入也不會造成重複或遺漏。publication_time 為 NULL 的排在最後。
+
+        Args:
+            source (Optional[str], optional): 只列出指定來源，例如 "NHK Easy Web"
+            start_time (Optional[datetime], optional): publication_time 下限（含）
+            end_time (Optional[datetime], optional): publication_time 上限（不含）
+            after (Optional[Tuple[Optional[datetime], str]], optional): 上一頁回傳的 next key
+            limit (int, optional): 每頁筆數，預設 50
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[Tuple[Optional[datetime], str]]]: 這一頁的 news 與
+                下一頁的 key（沒有下一頁時為 None）
+        """
+        filters, params = [], []
+        if source is not None:
+            filters.append("source = %s")
+            params.append(source)
+        if start_time is not None:
+            filters.append("publication_time >= %s")
+            params.append(start_time)
+        if end_time is not None:
+            filters.append("publication_time < %s")
+            params.append(end_time)
+        if after is not None:
+            after_time, after_id = after
+            if after_time is None:
+                filters.append("(publication_time IS NULL AND id < %s)")
+                params.append(after_id)
+            else:
+                filters.append("(publication_time < %s OR (publication_time = %s AND id < %s) "
+                               "OR publication_time IS NULL)")
+                params += [after_time, after_time, after_id]
+
+        columns = ", ".join(NEWS_COLUMNS)
+        self.cursor.execute(f"""
+        SELECT {columns}
+        FROM "{self.schema}"."{self.news_table}"
+        {"WHERE " + " AND ".join(filters) if filters else ""}
+        ORDER BY publication_time DESC NULLS LAST, id DESC
+        LIMIT %s;
+        """, params + [limit + 1])
+        rows = [dict(zip(NEWS_COLUMNS, row)) for row in self.cursor.fetchall()]
+        self.conn.commit()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]["publication_time"], rows[-1]["id"])
+
+    def get_news(self, news_id:str) -> Optional[Dict[str, Any]]:
+        """讀回單筆 news，連同 media 與 html_content（含內文，不含原始 html）
+
+        Args:
+            news_id (str): news 的 id
 
+        Returns:
+            Optional[Dict[str, Any]]: 與 News.to_json_dict 相同結構的資料，不存在時為 None
+        """
+        def select(table, columns, key):
+            self.cursor.execute(f"""
+            SELECT {", ".join(columns)} FROM "{self.schema}"."{table}" WHERE id = %s LIMIT 1;
+            """, (key,))
+            row = self.cursor.fetchone()
+            return dict(zip(columns, row)) if row else None
+
+        news = select(self.news_table, NEWS_COLUMNS, str(news_id))
+        if news is not None:
+            media_id, html_content_id = news.pop("media_id"), news.pop("html_content_id")
+            news["media"] = select(self.media_table, MEDIA_COLUMNS, media_id) if media_id else None
+            news["html_content"] = (select(self.html_content_table, HTML_CONTENT_COLUMNS, html_content_id)
+                                    if html_content_id else None)
+        self.conn.commit()
+        return news
+
+class AsyncExporter:
+    """在背景 thread 中批次寫入資料庫，讓資料庫 I/O 與爬蟲同時進行
+
+    ``put`` 只把 News 放進有上限的 queue（queue 滿時會等待，避免記憶體無限增長），背景 thread 累積到
+    ``batch_size`` 筆或距離第一筆超過 ``flush_interval`` 秒就以 ``insert_many`` 寫入；``close()``
+    （或離開 ``with`` 區塊）時會寫完剩下的資料。
+
+    Example:
+        with Export2PostgreSQL() as exporter, AsyncExporter(exporter) as writer:
+            for news in crawler.iter_recent_news():
+                writer.put(news)
+    """
+    _STOP = object()
+
+    def __init__(self,
+                 exporter:Optional[Export2PostgreSQL]=None,
+                 batch_size:int=200,
+                 flush_interval:float=2.0,
+                 max_queue:int=1000,
+                 ) -> None:
+        # 自行建立的 exporter 在 close() 時一併歸還連線
+        self._owns_exporter = exporter is None
+        self.exporter = exporter or Export2PostgreSQL()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.errors:List[Exception] = []
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker,
+                                        name="export-writer",
+                                        daemon=True,
+                                        )
+        self._thread.start()
+
+    def put(self, obj:News) -> None:
+        """加入一筆待寫入的 News"""
+        if self._closed:
+            raise RuntimeError("AsyncExporter is closed")
+        self._queue.put(obj)
+
+    def _flush(self, batch:List[News]) -> None:
+        try:
+            self.exporter.insert_many(batch)
+        except Exception as err:  # pylint: disable=broad-except
+            # 背景 thread 不可因單一批次失敗而中止，錯誤留給呼叫端檢查，資料存入 dead-letter spool
+            self.errors.append(err)
+            if isinstance(self.exporter, Export2PostgreSQL):
+                self.exporter._dead_letter("news", list(batch), err)  # pylint: disable=protected-access
+        batch.clear()
+
+    def _worker(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if not batch else max(0.0, deadline - monotonic())
+            try:
+                obj = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush(batch)
+                continue
+            if obj is self._STOP:
+                break
+            if not batch:
+                deadline = monotonic() + self.flush_interval
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+        if batch:
+            self._flush(batch)
+
+    def close(self) -> None:
+        """寫完 queue 中剩下的資料並結束背景 thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        if self._owns_exporter:
+            self.exporter.close()
+
+    def __enter__(self) -> "AsyncExporter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# 欄式輸出各欄位的型別，時間一律存為不含時區的 TIMESTAMP（與 PostgreSQL 一致）
+_ARROW_TYPES = {"status": "int32",
+                "publication_time": "timestamp",
+                "download_time": "timestamp",
+                "modified_time": "timestamp",
+                "export_time": "timestamp",
+                "year": "int16",
+                "month": "int8",
+                }
+# 欄式 dataset 的分區欄位，由 publication_time（缺少時用 download_time）推得
+PARTITION_COLUMNS = ("year", "month")
+
+def _to_naive(value:Optional[datetime]) -> Optional[datetime]:
+    """帶時區的時間轉為本地時間後去掉時區，與寫入 PostgreSQL TIMESTAMP 欄位的結果一致"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+class Export2Parquet:
+    """將 News、HTMLContent、Media 附加寫入欄式 dataset（Parquet 或 Arrow IPC），供分析工作直接掃描
+
+    ``root`` 下每種資料各一個 dataset（``news``、``html_contents``、``media``），依發布時間以
+    ``year=YYYY/month=M`` 的 hive 目錄分區。每次 ``insert_many`` 只新增一個檔案（每個分區一個），
+    不會改寫既有檔案；同一 id 重複匯出時以 ``export_time`` 最新的為準，``read`` 預設只回傳最新版本，
+    ``compact`` 可把分區內的小檔合併成一個檔案。
+
+    介面與 Export2PostgreSQL 相同（``insert``、``insert_many``、``insert_html_contents``），
+    也可交給 AsyncExporter 在背景寫入。
+
+    Example:
+        with Export2Parquet() as exporter:
+            exporter.insert_many(news_list)
+            table = exporter.read("news", columns=["id", "title"],
+                                  start_time=datetime(2024, 1, 1))
+    """
+    FORMATS = {"parquet": "parquet", "ipc": "arrow"}
+
+    def __init__(self,
+                 root:Optional[Path]=None,
+                 file_format:str="parquet",
+                 ) -> None:
+        if pyarrow is None:
+            raise ImportError("Export2Parquet requires the `pyarrow` package")
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown format {file_format!r}, expected one of {list(self.FORMATS)}")
+        self.root = Path(root) if root else ProjectConfigs.PROCESSED_DIR.joinpath("columnar")
+        self.file_format = file_format
+
+        self.news_table = "news"
+        self.media_table = "media"
+        self.html_content_table = "html_contents"
+        self.columns = {self.news_table: NEWS_COLUMNS,
+                        self.media_table: MEDIA_COLUMNS,
+                        self.html_content_table: HTML_CONTENT_COLUMNS,
+                        }
+        # 各 dataset 累計寫入的列數
+        self.stats = defaultdict(int)
 
-Export2PostgreSQL()
\ No newline at end of file
+    def close(self) -> None:
+        """沒有需要釋放的資源，保留與 Export2PostgreSQL 相同的介面"""
+
+    def __enter__(self) -> "Export2Parquet":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def schema(self, table:str) -> "pyarrow.Schema":
+        """dataset 的欄位結構（不含分區欄位）"""
+        fields = []
+        for column in self.columns[table] + ("content_hash", "export_time"):
+            arrow_type = _ARROW_TYPES.get(column, "string")
+            fields.append((column, pyarrow.timestamp("us") if arrow_type == "timestamp" else arrow_type))
+        return pyarrow.schema(fields)
+
+    def _dataset_schema(self, table:str) -> "pyarrow.Schema":
+        """dataset 的完整欄位結構（含分區欄位）"""
+        schema = self.schema(table)
+        for column in PARTITION_COLUMNS:
+            schema = schema.append(pyarrow.field(column, _ARROW_TYPES[column]))
+        return schema
+
+    def _partitioning(self) -> "pyarrow.dataset.Partitioning":
+        return pyarrow.dataset.partitioning(pyarrow.schema([(column, _ARROW_TYPES[column])
+                                                            for column in PARTITION_COLUMNS]),
+                                            flavor="hive",
+                                            )
+
+    def _write(self, table:str, rows:List[tuple]) -> int:
+        """將一批資料附加寫入 dataset，同一批中重複的 id 以最後出現的為準"""
+        rows = list({row[0]: row for row in rows}.values())
+        if not rows:
+            return 0
+        columns = self.columns[table] + ("content_hash",)
+        data = {column: [row[index] for row in rows] for index, column in enumerate(columns)}
+        for column in columns:
+            if _ARROW_TYPES.get(column) == "timestamp":
+                data[column] = [_to_naive(value) for value in data[column]]
+        data["export_time"] = [datetime.now()] * len(rows)
+        partition_times = [publication_time or download_time
+                           for publication_time, download_time in zip(data["publication_time"],
+                                                                      data["download_time"])]
+        data["year"] = [time.year if time else None for time in partition_times]
+        data["month"] = [time.month if time else None for time in partition_times]
+
+        pyarrow.dataset.write_dataset(pyarrow.Table.from_pydict(data, schema=self._dataset_schema(table)),
+                                      self.root.joinpath(table),
+                                      format=self.file_format,
+                                      partitioning=self._partitioning(),
+                                      basename_template=(f"part-{time_ns()}-{uuid4().hex[:8]}-{{i}}."
+                                                         f"{self.FORMATS[self.file_format]}"),
+                                      existing_data_behavior="overwrite_or_ignore",
+                                      )
+        self.stats[table] += len(rows)
+        return len(rows)
+
+    def insert(self, obj:News) -> None:
+        """寫入單筆 News（連同其 Media 與 HTMLContent）"""
+        self.insert_many([obj])
+
+    def insert_many(self, objs:Iterable[News]) -> int:
+        """批次寫入 News（連同其 Media 與 HTMLContent）
+
+        Args:
+            objs (Iterable[News]): 要匯出的 News
+
+        Returns:
+            int: 寫入的 News 筆數
+        """
+        objs = list(objs)
+        EXPORT_BATCH_ITEMS.labels(exporter="columnar", operation="insert_many").observe(len(objs))
+        with EXPORT_BATCH_SECONDS.labels(exporter="columnar", operation="insert_many").time(), \
+             span("columnar.insert_many"):
+            self._write(self.media_table, [_media_values(obj.media) for obj in objs if obj.media])
+            self._write(self.html_content_table, [_html_content_values(obj.html_content)
+                                                  for obj in objs if obj.html_content])
+            return self._write(self.news_table, [_news_values(obj) for obj in objs])
+
+    def insert_html_contents(self, objs:Iterable[HTMLContent]) -> None:
+        """只寫入 HTMLContent（例如重新解析既有的 html 後）"""
+        self._write(self.html_content_table, [_html_content_values(obj) for obj in objs])
+
+    def dataset(self, table:str) -> "pyarrow.dataset.Dataset":
+        """以 pyarrow.dataset 開啟 dataset，可自行組合更複雜的查詢"""
+        path = self.root.joinpath(table)
+        if not path.is_dir():
+            return pyarrow.dataset.dataset(self._dataset_schema(table).empty_table())
+        return pyarrow.dataset.dataset(path,
+                                       schema=self._dataset_schema(table),
+                                       format=self.file_format,
+                                       partitioning=self._partitioning(),
+                                       )
+
+    def read(self,
+             table:str,
+             columns:Optional[List[str]]=None,
+             filter:Optional["pyarrow.dataset.Expression"]=None,  # pylint: disable=redefined-builtin
+             start_time:Optional[datetime]=None,
+             end_time:Optional[datetime]=None,
+             latest:bool=True,
+             ) -> "pyarrow.Table":
+        """讀取 dataset，條件會下推到分區目錄與檔案的統計資訊，只讀需要的欄位與資料
+
+        Args:
+            table (str): "news"、"html_contents" 或 "media"
+            columns (Optional[List[str]], optional): 要讀取的欄位，預設全部
+            filter (Optional[pyarrow.dataset.Expression], optional): 額外的篩選條件，
+                例如 ``pyarrow.dataset.field("source") == "NHK News"``
+            start_time (Optional[datetime], optional): publication_time 下限（含）
+            end_time (Optional[datetime], optional): publication_time 上限（不含）
+            latest (bool, optional): 同一 id 只保留最新匯出的版本，預設 True。
+                去重複在篩選之後進行，舊版本符合條件而新版本不符合時仍會回傳舊版本
+
+        Returns:
+            pyarrow.Table: 查詢結果
+        """
+        field = pyarrow.dataset.field
+        conditions = [] if filter is None else [filter]
+        if start_time is not None:
+            start_time = _to_naive(start_time)
+            conditions += [field("year") >= start_time.year, field("publication_time") >= start_time]
+        if end_time is not None:
+            end_time = _to_naive(end_time)
+            conditions += [field("year") <= end_time.year, field("publication_time") < end_time]
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        selected = columns
+        if columns is not None and latest:
+            selected = list(dict.fromkeys(list(columns) + ["id", "export_time"]))
+        result = self.dataset(table).to_table(columns=selected, filter=expression)
+        if latest:
+            result = self._latest(result)
+        return result if columns is None else result.select(list(columns))
+
+    @staticmethod
+    def _latest(table:"pyarrow.Table") -> "pyarrow.Table":
+        """同一 id 只保留 export_time 最新的一列"""
+        if table.num_rows == 0:
+            return table
+        table = table.sort_by([("export_time", "descending")])
+        ids = table["id"]
+        return table.take(pyarrow.compute.index_in(pyarrow.compute.unique(ids), value_set=ids))
+
+    def compact(self, table:str) -> int:
+        """把每個分區中的多個檔案合併成一個只含最新版本的檔案
+
+        Args:
+            table (str): "news"、"html_contents" 或 "media"
+
+        Returns:
+            int: 被合併掉的舊檔案數
+        """
+        removed = 0
+        suffix = f".{self.FORMATS[self.file_format]}"
+        for directory in sorted({path.parent for path in self.root.joinpath(table).rglob(f"*{suffix}")}):
+            files = sorted(directory.glob(f"*{suffix}"))
+            if len(files) < 2:
+                continue
+            merged = self._latest(pyarrow.dataset.dataset([str(file) for file in files],
+                                                          schema=self.schema(table),
+                                                          format=self.file_format,
+                                                          ).to_table())
+            pyarrow.dataset.write_dataset(merged,
+                                          directory,
+                                          format=self.file_format,
+                                          basename_template=f"part-{time_ns()}-{uuid4().hex[:8]}-{{i}}{suffix}",
+                                          existing_data_behavior="overwrite_or_ignore",
+                                          )
+            for file in files:
+                file.unlink()
+            removed += len(files)
+        return removed
@@ -0,0 +1,149 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  jobs.py
+@Time    :  2026/10/19 18:02:15
+@Author  :  Kevin Wang
+@Desc    :  Background job manager for long running crawls started through the API
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import (dataclass,
+                         field,
+                         )
+from datetime import datetime
+from typing import (Any,
+                    Callable,
+                    Dict,
+                    Optional,
+                    Tuple,
+                    )
+from uuid import uuid4
+import threading
+
+# runner(params, progress) -> result，progress(count) 回報已完成的項目數
+JobRunner = Callable[[Dict[str, Any], Callable[[int], None]], Any]
+
+@dataclass
+class Job:
+    """State of one submitted job."""
+    id:str
+    kind:str
+    params:Dict[str, Any]
+    status:str="queued"  # queued -> running -> succeeded / failed
+    progress:int=0
+    result:Any=None
+    error:Optional[str]=None
+    created_time:datetime=field(default_factory=datetime.now)
+    started_time:Optional[datetime]=None
+    finished_time:Optional[datetime]=None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_json_dict(self, include_result:bool=True) -> dict:
+        data = {"id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "progress": self.progress,
+                "error": self.error,
+                "created_time": self.created_time.isoformat(),
+                "started_time": self.started_time.isoformat() if self.started_time else None,
+                "finished_time": self.finished_time.isoformat() if self.finished_time else None,
+                }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+class JobManager:
+    def __init__(self,
+                 runners:Dict[str, JobRunner],
+                 max_workers:int=2,
+                 max_finished:int=100,
+                 ) -> None:
+        """Run jobs on a thread pool and keep their state for polling.
+
+        Submitting a job identical (same kind and parameters) to one that is still queued or
+        running returns the in-flight job instead of starting the work twice. Finished jobs are
+        kept for polling, only the newest ``max_finished`` of them.
+
+        Args:
+            runners (Dict[str, JobRunner]): Job kind -> function doing the work. It receives the
+                job parameters and a progress callback, its return value becomes the job result.
+            max_workers (int, optional): Jobs running at the same time. Defaults to 2.
+            max_finished (int, optional): Finished jobs kept in memory. Defaults to 100.
+        """
+        self.runners = runners
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs:"OrderedDict[str, Job]" = OrderedDict()
+        self._in_flight:Dict[Tuple, str] = {}
+
+    @staticmethod
+    def _key(kind:str, params:Dict[str, Any]) -> Tuple:
+        return (kind,) + tuple(sorted(params.items()))
+
+    def submit(self,
+               kind:str,
+               params:Optional[Dict[str, Any]]=None,
+               ) -> Tuple[Job, bool]:
+        """Queue a job unless an identical one is already in flight.
+
+        Args:
+            kind (str): One of the registered runner names.
+            params (Optional[Dict[str, Any]], optional): Keyword arguments for the runner.
+
+        Raises:
+            ValueError: Unknown job kind.
+
+        Returns:
+            Tuple[Job, bool]: The job and whether it was newly created.
+        """
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind {kind!r}, expected one of {list(self.runners)}")
+        params = dict(params or {})
+        key = self._key(kind, params)
+        with self._lock:
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                return self._jobs[job_id], False
+            job = Job(id=uuid4().hex, kind=kind, params=params)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+        self._executor.submit(self._run, job, key)
+        return job, True
+
+    def _run(self, job:Job, key:Tuple) -> None:
+        job.status = "running"
+        job.started_time = datetime.now()
+
+        def progress(count:int) -> None:
+            job.progress = count
+
+        try:
+            job.result = self.runners[job.kind](job.params, progress)
+            job.status = "succeeded"
+        except Exception as err:  # pylint: disable=broad-except
+            job.error = f"{type(err).__name__}: {err}"
+            job.status = "failed"
+        job.finished_time = datetime.now()
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._evict()
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id:str) -> Optional[Job]:
+        """The job with this id, None if unknown or already evicted."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait:bool=True) -> None:
+        """Stop accepting jobs, optionally waiting for the running ones."""
+        self._executor.shutdown(wait=wait)
@@ -6,14 +6,81 @@
 @Desc    :  None
 """
 
-from datetime import datetime
-from typing import List, Optional
+from contextlib import ExitStack
+from datetime import (datetime,
+                      timedelta,
+                      )
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import argparse
+import base64
+import json
+import signal
+import threading
 
+from config import ProjectConfigs
 from crawler import NHKEasyWebCrawler, NHKWebCrawler
-from export import Export2PostgreSQL
+from export import (AsyncExporter,
+                    Export2Parquet,
+                    Export2PostgreSQL,
+                    )
+from metrics import (CRAWL_RUN_ITEMS,
+                     CRAWLED_NEWS,
+                     )
+from media_queue import MediaDownloadQueue
+from objects import News
+from orchestrator import CrawlOrchestrator
+from reparse import reparse_archive
+from scheduler import (PollingScheduler,
+                       StoredTimes,
+                       )
+from storage import migrate_raw_tree
+from tracing import profile_run
+
+def iter_nhk_easy_crawler(start_date:Optional[str]=None,
+                          end_date:Optional[str]=None,
+                          time_budget:Optional[float]=None,
+                          ) -> Iterator[News]:
+    """
+    Run the NHK Easy News crawler lazily, exporting and yielding each news as soon as it is crawled.
+
+    Args:
+        start_date (Optional[str]): Start date in 'YYYY-MM-DD' format. Defaults to None.
+        end_date (Optional[str]): End date in 'YYYY-MM-DD' format. Defaults to None.
+        time_budget (Optional[float]): Seconds the crawl may take, the newest news first; the rest is left for the
+            next run. Defaults to ``ProjectConfigs.CRAWL_TIME_BUDGET`` (0: no limit).
+
+    Yields:
+        News: The crawled news.
+    """
+    yield from _iter_crawl_and_export(NHKEasyWebCrawler(), _parse_date(start_date), _parse_date(end_date),
+                                      time_budget=time_budget)
+
+def iter_nhk_crawler(start_date:Optional[str]=None,
+                     end_date:Optional[str]=None,
+                     refresh:bool=False,
+                     time_budget:Optional[float]=None,
+                     ) -> Iterator[News]:
+    """
+    Run the NHK News crawler lazily, exporting and yielding each news as soon as it is crawled.
+
+    Args:
+        start_date (Optional[str]): Start date in 'YYYY-MM-DD' format. Defaults to None.
+        end_date (Optional[str]): End date in 'YYYY-MM-DD' format. Defaults to None.
+        refresh (bool): Only download new articles and stored ones modified since. Defaults to False.
+        time_budget (Optional[float]): Seconds the crawl may take, the newest news first; the rest is left for the
+            next run. Defaults to ``ProjectConfigs.CRAWL_TIME_BUDGET`` (0: no limit).
+
+    Yields:
+        News: The crawled news.
+    """
+    yield from _iter_crawl_and_export(NHKWebCrawler(), _parse_date(start_date), _parse_date(end_date), refresh,
+                                      time_budget=time_budget)
 
 def run_nhk_easy_crawler(start_date:Optional[str]=None,
                          end_date:Optional[str]=None,
+                         on_news:Optional[Callable[[News], None]]=None,
+                         time_budget:Optional[float]=None,
                          ) -> List[dict]:
     """
     Run the NHK Easy News crawler and insert news into the database.
@@ -21,23 +88,20 @@ def run_nhk_easy_crawler(start_date:Optional[str]=None,
     Args:
         start_date (Optional[str]): Start date in 'YYYY-MM-DD' format. Defaults to None.
         end_date (Optional[str]): End date in 'YYYY-MM-DD' format. Defaults to None.
+        on_news (Optional[Callable[[News], None]]): Called with every crawled news. Defaults to None.
+        time_budget (Optional[float]): Seconds the crawl may take, the newest news first; the rest is left for the
+            next run. Defaults to ``ProjectConfigs.CRAWL_TIME_BUDGET`` (0: no limit).
 
     Returns:
         int: Number of news items inserted.
     """
-    if start_date:
-        start_date = datetime.strptime(start_date, "%Y-%m-%d")
-    if end_date:
-        end_date = datetime.strptime(end_date, "%Y-%m-%d")
-    crawler = NHKEasyWebCrawler()
-    exporter = Export2PostgreSQL()
-    news_list = crawler.download_recent_news(start_date=start_date, end_date=end_date)
-    for news in news_list:
-        exporter.insert(news)
-    return [news.to_json_dict() for news in news_list]
+    return _collect(iter_nhk_easy_crawler(start_date, end_date, time_budget), on_news)
 
 def run_nhk_crawler(start_date:Optional[str]=None,
                     end_date:Optional[str]=None,
+                    on_news:Optional[Callable[[News], None]]=None,
+                    refresh:bool=False,
+                    time_budget:Optional[float]=None,
                     ) -> List[dict]:
     """
     Run the NHK News crawler and insert news into the database.
@@ -45,21 +109,425 @@ def run_nhk_crawler(start_date:Optional[str]=None,
     Args:
         start_date (Optional[str]): Start date in 'YYYY-MM-DD' format. Defaults to None.
         end_date (Optional[str]): End date in 'YYYY-MM-DD' format. Defaults to None.
+        on_news (Optional[Callable[[News], None]]): Called with every crawled news. Defaults to None.
+        refresh (bool): Only download new articles and stored ones modified since. Defaults to False.
+        time_budget (Optional[float]): Seconds the crawl may take, the newest news first; the rest is left for the
+            next run. Defaults to ``ProjectConfigs.CRAWL_TIME_BUDGET`` (0: no limit).
 
     Returns:
         int: Number of news items inserted.
     """
-    if start_date:
-        start_date = datetime.strptime(start_date, "%Y-%m-%d")
-    if end_date:
-        end_date = datetime.strptime(end_date, "%Y-%m-%d")
-    crawler = NHKWebCrawler()
-    exporter = Export2PostgreSQL()
-    news_list = crawler.download_recent_news(start_date=start_date, end_date=end_date)
-    for news in news_list:
-        exporter.insert(news)
-    return [news.to_json_dict() for news in news_list]
+    return _collect(iter_nhk_crawler(start_date, end_date, refresh, time_budget), on_news)
+
+def run_all_crawlers(start_date:Optional[str]=None,
+                     end_date:Optional[str]=None,
+                     on_news:Optional[Callable[[News], None]]=None,
+                     defer_media:Optional[bool]=None,
+                     time_budget:Optional[float]=None,
+                     ) -> Dict[str, List[dict]]:
+    """
+    Run every crawler concurrently and insert their news into the database through one exporter.
+
+    The crawlers share the connection pool, per-host rate limit and media download slots of
+    ``budget``, so the run takes about as long as the slowest crawler instead of the sum of all.
+
+    Args:
+        start_date (Optional[str]): Start date in 'YYYY-MM-DD' format. Defaults to None.
+        end_date (Optional[str]): End date in 'YYYY-MM-DD' format. Defaults to None.
+        on_news (Optional[Callable[[News], None]]): Called with every crawled news, one at a time. Defaults to None.
+        defer_media (Optional[bool]): Export the articles first and download the media of all crawlers in one
+            prioritized background queue; the returned news then have no media. Defaults to ``ProjectConfigs.DEFER_MEDIA``.
+        time_budget (Optional[float]): Seconds the crawl may take, the newest news first; the rest is left for the
+            next run. Defaults to ``ProjectConfigs.CRAWL_TIME_BUDGET`` (0: no limit).
+
+    Returns:
+        Dict[str, List[dict]]: Crawled news per crawler name, e.g. ``"NHKWebCrawler"``.
+
+    Raises:
+        RuntimeError: A crawler failed; the news of every crawler are still exported first.
+    """
+    orchestrator = CrawlOrchestrator()
+    data:Dict[str, List[dict]] = {name: [] for name in orchestrator.crawls}
+    lock = threading.Lock()
+    with ExitStack() as stack:
+        stack.enter_context(profile_run(type(orchestrator).__name__))
+        exporter = stack.enter_context(Export2PostgreSQL())
+        writers = _open_writers(stack, exporter)
+        media_queue = _open_media_queue(stack, writers, defer_media)
+        options = {"media_queue": media_queue} if media_queue is not None else {}
+        options["deadline"] = _deadline(time_budget)
+
+        def sink(name:str, news:News) -> None:
+            for writer in writers:
+                writer.put(news)
+            CRAWLED_NEWS.labels(crawler=name).inc()
+            with lock:
+                data[name].append(news.to_json_dict())
+                if on_news is not None:
+                    on_news(news)
+
+        counts = orchestrator.run(sink, _parse_date(start_date), _parse_date(end_date), **options)
+        for name, count in counts.items():
+            CRAWL_RUN_ITEMS.labels(crawler=name).observe(count)
+        if media_queue is not None:
+            media_queue.close()
+        for writer in writers:
+            writer.close()
+        print("Export:", dict(exporter.stats))
+    if orchestrator.errors:
+        err = next(iter(orchestrator.errors.values()))
+        raise RuntimeError(f"Crawl failed: {', '.join(orchestrator.errors)}") from err
+    return data
+
+def _parse_date(date:Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(date, "%Y-%m-%d") if date else None
+
+def _deadline(time_budget:Optional[float]) -> Optional[datetime]:
+    """time_budget 秒之後的時間，未指定時使用 CRAWL_TIME_BUDGET，0 表示不限時間"""
+    time_budget = ProjectConfigs.CRAWL_TIME_BUDGET if time_budget is None else time_budget
+    return datetime.now() + timedelta(seconds=time_budget) if time_budget > 0 else None
+
+def _collect(news_iter:Iterator[News],
+             on_news:Optional[Callable[[News], None]]=None,
+             ) -> List[dict]:
+    data = []
+    for news in news_iter:
+        data.append(news.to_json_dict())
+        if on_news is not None:
+            on_news(news)
+    return data
+
+def _iter_crawl_and_export(crawler:Union[NHKEasyWebCrawler, NHKWebCrawler],
+                           start_date:Optional[datetime],
+                           end_date:Optional[datetime],
+                           refresh:bool=False,
+                           stored_times:Optional[StoredTimes]=None,
+                           defer_media:Optional[bool]=None,
+                           time_budget:Optional[float]=None,
+                           ) -> Iterator[News]:
+    """爬取新聞並交給背景 thread 寫入資料庫（設定 COLUMNAR_FORMAT 時同時寫入欄式 dataset）
+
+    提早結束迭代（例如 streaming 的 client 斷線）時，已爬到的資料仍會寫完才關閉 exporter。
+    設定 TRACE_DIR 時，結束後輸出本次執行各階段耗時的 profile。
+    refresh 時只下載新文章與資料庫中的版本之後又修改過的文章；stored_times 可改用自訂的查詢（例如排程的記憶體快取）。
+    defer_media（預設為 DEFER_MEDIA）時先寫入文章，影音由背景佇列下載後再更新，yield 出的 News 不含影音。
+    time_budget（預設為 CRAWL_TIME_BUDGET）秒數到期時不再開始新的下載，剩下的留給下一次執行。
+    """
+    with ExitStack() as stack:
+        stack.enter_context(profile_run(type(crawler).__name__))
+        exporter = stack.enter_context(Export2PostgreSQL())
+        options = {"deadline": _deadline(time_budget)}
+        if refresh and stored_times is None:
+            # 背景 thread 會使用 exporter 的 cursor，查詢另外使用一條連線
+            stored_times = stack.enter_context(Export2PostgreSQL()).fetch_modified_times
+        if stored_times is not None:
+            options["stored_times"] = stored_times
+        writers = _open_writers(stack, exporter)
+        media_queue = _open_media_queue(stack, writers, defer_media)
+        if media_queue is not None:
+            options["media_queue"] = media_queue
+        crawled = CRAWLED_NEWS.labels(crawler=type(crawler).__name__)
+        count = 0
+        # 爬到一筆就交給背景 thread 寫入，資料庫延遲與爬蟲時間重疊
+        for news in crawler.iter_recent_news(start_date=start_date, end_date=end_date, **options):
+            for writer in writers:
+                writer.put(news)
+            crawled.inc()
+            count += 1
+            yield news
+        CRAWL_RUN_ITEMS.labels(crawler=type(crawler).__name__).observe(count)
+        # 影音全部下載完、補上的版本都交給 writer 之後才關閉 writer
+        if media_queue is not None:
+            media_queue.close()
+        for writer in writers:
+            writer.close()
+        print("Export:", dict(exporter.stats))
+
+def _open_writers(stack:ExitStack, exporter:Export2PostgreSQL) -> List[AsyncExporter]:
+    """背景寫入 exporter 的 AsyncExporter，設定 COLUMNAR_FORMAT 時再加上欄式 dataset 的"""
+    writers = [stack.enter_context(AsyncExporter(exporter))]
+    if ProjectConfigs.COLUMNAR_FORMAT:
+        columnar = stack.enter_context(Export2Parquet(file_format=ProjectConfigs.COLUMNAR_FORMAT))
+        writers.append(stack.enter_context(AsyncExporter(columnar)))
+    return writers
+
+def _open_media_queue(stack:ExitStack,
+                      writers:List[AsyncExporter],
+                      defer_media:Optional[bool]=None,
+                      ) -> Optional[MediaDownloadQueue]:
+    """defer_media 時建立下載完成後交給所有 writer 的影音佇列，要在 writers 之後進入 stack 才會先關閉"""
+    if not (ProjectConfigs.DEFER_MEDIA if defer_media is None else defer_media):
+        return None
+
+    def on_done(news:News) -> None:
+        for writer in writers:
+            writer.put(news)
+
+    return stack.enter_context(MediaDownloadQueue(on_done))
+
+# search 的 source 簡寫對應到 News.source
+SOURCE_NAMES = {"easy": "NHK Easy Web",
+                "news": "NHK News",
+                }
+
+def search_news(query:str,
+                start_date:Optional[str]=None,
+                end_date:Optional[str]=None,
+                source:Optional[str]=None,
+                limit:int=20,
+                ) -> List[Dict[str, Any]]:
+    """
+    Full-text search the exported articles.
+
+    Args:
+        query (str): Search terms separated by whitespace, all of them must match.
+        start_date (Optional[str]): Earliest publication date in 'YYYY-MM-DD' format. Defaults to None.
+        end_date (Optional[str]): Latest publication date (inclusive) in 'YYYY-MM-DD' format. Defaults to None.
+        source (Optional[str]): "easy", "news" or a full source name. Defaults to None (all sources).
+        limit (int): Maximum number of results. Defaults to 20.
+
+    Returns:
+        List[Dict[str, Any]]: Ranked matches with an ISO formatted publication_time.
+    """
+    start_time = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+    end_time = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else None
+    with Export2PostgreSQL() as exporter:
+        results = exporter.search(query,
+                                  start_time=start_time,
+                                  end_time=end_time,
+                                  source=SOURCE_NAMES.get(source, source),
+                                  limit=limit,
+                                  )
+    for result in results:
+        if result["publication_time"]:
+            result["publication_time"] = result["publication_time"].isoformat()
+    return results
+
+def encode_cursor(key:Tuple[Optional[datetime], str]) -> str:
+    """將 list_news 的 next key 編碼成不透明的分頁 cursor"""
+    publication_time, news_id = key
+    payload = [publication_time.isoformat() if publication_time else None, news_id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor:str) -> Tuple[Optional[datetime], str]:
+    """encode_cursor 的反向轉換，格式不正確時拋出 ValueError"""
+    try:
+        publication_time, news_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (datetime.fromisoformat(publication_time) if publication_time else None), str(news_id)
+    except (TypeError, ValueError, UnicodeError) as err:  # json / base64 錯誤皆為 ValueError 子類別
+        raise ValueError(f"Invalid cursor {cursor!r}") from err
+
+def _jsonable(data:Any) -> Any:
+    """將資料庫讀回的 datetime 轉為 ISO 格式字串"""
+    if isinstance(data, dict):
+        return {key: _jsonable(value) for key, value in data.items()}
+    if isinstance(data, datetime):
+        return data.isoformat()
+    return data
+
+def list_news(source:Optional[str]=None,
+              start_date:Optional[str]=None,
+              end_date:Optional[str]=None,
+              cursor:Optional[str]=None,
+              limit:int=50,
+              ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    List exported news from the newest, without crawling.
+
+    Args:
+        source (Optional[str]): "easy", "news" or a full source name. Defaults to None (all sources).
+        start_date (Optional[str]): Earliest publication date in 'YYYY-MM-DD' format. Defaults to None.
+        end_date (Optional[str]): Latest publication date (inclusive) in 'YYYY-MM-DD' format. Defaults to None.
+        cursor (Optional[str]): ``next_cursor`` of the previous page. Defaults to None (first page).
+        limit (int): Page size. Defaults to 50.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: The page and the cursor of the next page
+            (None on the last page).
+    """
+    end_date = _parse_date(end_date)
+    with Export2PostgreSQL() as exporter:
+        rows, next_key = exporter.list_news(source=SOURCE_NAMES.get(source, source),
+                                            start_time=_parse_date(start_date),
+                                            end_time=end_date + timedelta(days=1) if end_date else None,
+                                            after=decode_cursor(cursor) if cursor else None,
+                                            limit=limit,
+                                            )
+    return [_jsonable(row) for row in rows], encode_cursor(next_key) if next_key else None
+
+def get_news(news_id:str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch one exported news with its media and article, without crawling.
+
+    Args:
+        news_id (str): Stored news id.
+
+    Returns:
+        Optional[Dict[str, Any]]: The news, None if it does not exist.
+    """
+    with Export2PostgreSQL() as exporter:
+        news = exporter.get_news(news_id)
+    return _jsonable(news) if news else None
+
+# 常駐排程的來源 -> 爬蟲類別
+SCHEDULE_CRAWLERS = {"easy": NHKEasyWebCrawler,
+                     "news": NHKWebCrawler,
+                     }
+
+def run_scheduler(sources:Optional[List[str]]=None,
+                  min_interval:float=ProjectConfigs.SCHEDULER_MIN_INTERVAL,
+                  max_interval:float=ProjectConfigs.SCHEDULER_MAX_INTERVAL,
+                  ) -> None:
+    """
+    Keep polling the NHK feeds and crawl only new (or revised) articles, until SIGINT / SIGTERM.
+
+    Args:
+        sources (Optional[List[str]]): "easy" and / or "news". Defaults to None (both).
+        min_interval (float): Shortest wait between two polls of a source in seconds.
+        max_interval (float): Longest wait between two polls of a source in seconds.
+    """
+    def incremental_crawl(crawler_cls):
+        return lambda stored_times: _iter_crawl_and_export(crawler_cls(), None, None, stored_times=stored_times)
+
+    # 輪詢的列表請求要有 HTTP 快取才能以條件請求得到 304，未設定時使用排程專用的快取目錄
+    if not ProjectConfigs.HTTP_CACHE_DIR:
+        ProjectConfigs.HTTP_CACHE_DIR = ProjectConfigs.SCHEDULER_HTTP_CACHE_DIR
+        print(f"HTTP_CACHE_DIR not set, caching feed responses in {ProjectConfigs.HTTP_CACHE_DIR}")
+
+    with Export2PostgreSQL() as lookup:
+        scheduler = PollingScheduler({source: incremental_crawl(SCHEDULE_CRAWLERS[source])
+                                      for source in sources or list(SCHEDULE_CRAWLERS)},
+                                     lookup=lookup.fetch_modified_times,
+                                     min_interval=min_interval,
+                                     max_interval=max_interval,
+                                     )
+        # 收到停止訊號時等目前的輪詢寫完才結束
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: scheduler.stop())
+        scheduler.run()
+
+def main(argv:Optional[List[str]]=None) -> None:
+    """指令列進入點，未指定子指令時同時執行所有爬蟲"""
+    parser = argparse.ArgumentParser(description="NHK news crawler")
+    subparsers = parser.add_subparsers(dest="command")
+
+    crawl_parser = subparsers.add_parser("crawl", help="crawl NHK Easy News and NHK News concurrently (default)")
+    crawl_parser.add_argument("--defer-media", action="store_true", default=None,
+                              help="export the articles first and download the media in a background queue "
+                                   "(default: DEFER_MEDIA)")
+    crawl_parser.add_argument("--time-budget", type=float, default=None,
+                              help="seconds the crawl may take, newest news first, the rest is left for the next run "
+                                   "(default: CRAWL_TIME_BUDGET)")
+
+    subparsers.add_parser("refresh",
+                          help="crawl NHK News again, only new articles and stored ones modified since",
+                          )
+
+    schedule_parser = subparsers.add_parser("schedule",
+                                            help="keep polling the feeds and crawl new articles as they appear",
+                                            )
+    schedule_parser.add_argument("--source", choices=list(SCHEDULE_CRAWLERS), action="append",
+                                 help="source to poll, may be repeated (default: both)")
+    schedule_parser.add_argument("--min-interval", type=float, default=ProjectConfigs.SCHEDULER_MIN_INTERVAL,
+                                 help="shortest wait between two polls in seconds")
+    schedule_parser.add_argument("--max-interval", type=float, default=ProjectConfigs.SCHEDULER_MAX_INTERVAL,
+                                 help="longest wait between two polls in seconds")
+
+    reparse_parser = subparsers.add_parser("reparse",
+                                           help="re-parse the stored raw HTML and re-export changed records",
+                                           )
+    reparse_parser.add_argument("--source", choices=["easy", "news"], action="append",
+                                help="source to re-parse, may be repeated (default: both)")
+    reparse_parser.add_argument("--content-dir", type=Path, default=None,
+                                help="raw HTML directory (only with a single --source)")
+    reparse_parser.add_argument("--workers", type=int, default=None,
+                                help="number of parser processes (default: CPU count)")
+    reparse_parser.add_argument("--dry-run", action="store_true",
+                                help="only report the changes, do not export")
+
+    migrate_parser = subparsers.add_parser("migrate-raw",
+                                           help="convert the raw archive to the sharded/compressed layout",
+                                           )
+    migrate_parser.add_argument("--raw-dir", type=Path, default=ProjectConfigs.RAW_DIR,
+                                help="root of the raw archive (default: ProjectConfigs.RAW_DIR)")
+    migrate_parser.add_argument("--dry-run", action="store_true",
+                                help="only report the files to move")
+    migrate_parser.add_argument("--shard-depth", type=int, default=ProjectConfigs.RAW_SHARD_DEPTH,
+                                help="target directory levels (default: RAW_SHARD_DEPTH)")
+    migrate_parser.add_argument("--compression", choices=["gzip", "zstd", "none"],
+                                default=ProjectConfigs.RAW_COMPRESSION or "none",
+                                help="target html compression (default: RAW_COMPRESSION)")
+
+    drain_parser = subparsers.add_parser("drain-spool",
+                                         help="replay export batches left in the dead-letter spool",
+                                         )
+    drain_parser.add_argument("--due-only", action="store_true",
+                              help="only replay entries whose backoff has expired")
+
+    columnar_parser = subparsers.add_parser("export-columnar",
+                                            help="append the crawled news.json files to the columnar datasets",
+                                            )
+    columnar_parser.add_argument("paths", type=Path, nargs="*",
+                                 help="news.json files (default: every news.json under RAW_DIR)")
+    columnar_parser.add_argument("--format", choices=list(Export2Parquet.FORMATS), default="parquet",
+                                 help="file format (default: parquet)")
+    columnar_parser.add_argument("--compact", action="store_true",
+                                 help="merge the files of each partition afterwards")
+
+    args = parser.parse_args(argv)
+    if args.command == "schedule":
+        run_scheduler(args.source, args.min_interval, args.max_interval)
+        return
+    if args.command == "refresh":
+        print("NHK:", run_nhk_crawler(refresh=True))
+        return
+    if args.command == "drain-spool":
+        with Export2PostgreSQL() as exporter:
+            print("Dead letters:", exporter.replay_dead_letters(force=not args.due_only))
+            print("Export:", dict(exporter.stats))
+        return
+    if args.command == "export-columnar":
+        paths = args.paths or sorted(ProjectConfigs.RAW_DIR.glob("*/news.json"))
+        with Export2Parquet(file_format=args.format) as exporter:
+            for path in paths:
+                with open(path, "r", encoding="utf-8") as file:
+                    count = exporter.insert_many(News.from_json_dict(data) for data in json.load(file))
+                print(f"{path}: {count} news")
+            if args.compact:
+                for table in exporter.columns:
+                    print(f"{table}: {exporter.compact(table)} files merged")
+        return
+    if args.command == "migrate-raw":
+        compression = None if args.compression == "none" else args.compression
+        for root, moves in migrate_raw_tree(args.raw_dir,
+                                            dry_run=args.dry_run,
+                                            shard_depth=args.shard_depth,
+                                            compression=compression,
+                                            ).items():
+            print(f"{root}: {len(moves)} files {'to move' if args.dry_run else 'moved'}")
+        # 資料庫中的 filepath 由 reparse 一併更新
+        print("Run `reparse` to refresh the filepath recorded in the database.")
+        if (args.shard_depth, compression) != (ProjectConfigs.RAW_SHARD_DEPTH, ProjectConfigs.RAW_COMPRESSION):
+            print(f"Set RAW_SHARD_DEPTH={args.shard_depth} and RAW_COMPRESSION={compression or ''} "
+                  "so that new files are written in the same layout.")
+        return
+    if args.command == "reparse":
+        sources = args.source or ["easy", "news"]
+        if args.content_dir and len(sources) > 1:
+            parser.error("--content-dir requires exactly one --source")
+        for source in sources:
+            stats = reparse_archive(source,
+                                    content_dir=args.content_dir,
+                                    max_workers=args.workers,
+                                    dry_run=args.dry_run,
+                                    )
+            print(f"{source}:", stats)
+        return
+
+    for name, data in run_all_crawlers(defer_media=getattr(args, "defer_media", None),
+                                       time_budget=getattr(args, "time_budget", None),
+                                       ).items():
+        print(f"{name}:", data)
 
 if __name__ == "__main__":
-    print("NHK Easy:", run_nhk_easy_crawler())
-    print("NHK:", run_nhk_crawler())
+    main()
@@ -0,0 +1,133 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  media_queue.py
+@Time    :  2026/10/20 00:48:33
+@Author  :  Kevin Wang
+@Desc    :  Prioritized background queue downloading media after the article has been exported
+"""
+
+from dataclasses import replace
+from itertools import count
+from time import monotonic
+from typing import (Callable,
+                    List,
+                    Optional,
+                    Tuple,
+                    )
+import queue
+import threading
+
+from config import ProjectConfigs
+from metrics import (MEDIA_QUEUE_RESULTS,
+                     MEDIA_QUEUE_WAIT_SECONDS,
+                     )
+from objects import (Media,
+                     News,
+                     )
+from tracing import span
+
+# 小檔（音檔）優先，同類型中較新的新聞優先
+MEDIA_TYPE_PRIORITY = {"Audio": 0,
+                       "Video": 1,
+                       }
+
+class MediaDownloadQueue:
+    def __init__(self,
+                 on_done:Callable[[News], None],
+                 workers:int=ProjectConfigs.MEDIA_WORKERS,
+                 ) -> None:
+        """Download media in background threads so crawlers can hand out articles right away.
+
+        A crawler given this queue yields each ``News`` without its media and ``submit``s the
+        download instead. Downloads run by priority, audio before video and newer news first,
+        so a long video never holds back the text or the small files queued after it. When a
+        download completes, a copy of the news with the media filled in goes to ``on_done``;
+        putting it into the same ``AsyncExporter`` as the text-only version updates the stored
+        row. The bandwidth cap (``MEDIA_BANDWIDTH_LIMIT``) and download slots
+        (``DOWNLOAD_CONCURRENCY``) of ``budget`` still apply.
+
+        Example:
+            with AsyncExporter(exporter) as writer, MediaDownloadQueue(writer.put) as media_queue:
+                for news in crawler.iter_recent_news(media_queue=media_queue):
+                    writer.put(news)
+
+        Args:
+            on_done (Callable[[News], None]): Called from a worker thread with the completed news.
+            workers (int, optional): Download threads. Defaults to ``ProjectConfigs.MEDIA_WORKERS``.
+        """
+        self._on_done = on_done
+        self.errors:List[Exception] = []
+        self._queue = queue.PriorityQueue()
+        self._sequence = count()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._worker,
+                                          name=f"media-download-{index}",
+                                          daemon=True,
+                                          )
+                         for index in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    @staticmethod
+    def priority(news:News, media_type:str) -> Tuple[float, float]:
+        """Sort key of a download, smaller runs first."""
+        published = news.publication_time.timestamp() if news.publication_time else 0.0
+        return (MEDIA_TYPE_PRIORITY.get(media_type, len(MEDIA_TYPE_PRIORITY)), -published)
+
+    def submit(self,
+               news:News,
+               download:Callable[[], Media],
+               media_type:str,
+               ) -> None:
+        """Queue the media download of a news that was handed out without it.
+
+        Args:
+            news (News): The news as already exported.
+            download (Callable[[], Media]): Downloads the media, e.g. a bound ``download_video``.
+            media_type (str): "Audio" or "Video", used for the priority and metrics.
+        """
+        if self._closed:
+            raise RuntimeError("MediaDownloadQueue is closed")
+        self._queue.put((self.priority(news, media_type), next(self._sequence), (news, download, media_type, monotonic())))
+
+    @property
+    def pending(self) -> int:
+        """Downloads not started yet."""
+        return self._queue.qsize()
+
+    def _worker(self) -> None:
+        while True:
+            _, _, task = self._queue.get()
+            if task is None:
+                return
+            news, download, media_type, submitted = task
+            MEDIA_QUEUE_WAIT_SECONDS.labels(type=media_type).observe(monotonic() - submitted)
+            try:
+                with span("media_queue.download"):
+                    media = download()
+            except Exception as err:  # pylint: disable=broad-except
+                # 影音下載失敗不影響已寫入的文章，錯誤留給呼叫端檢查
+                self.errors.append(err)
+                MEDIA_QUEUE_RESULTS.labels(type=media_type, result="failed").inc()
+                print(f"Media download of {news.source_id} failed: {type(err).__name__}: {err}")
+                continue
+            MEDIA_QUEUE_RESULTS.labels(type=media_type, result="done").inc()
+            # 交出新的物件，不改動已交給 exporter 的那一份
+            self._on_done(replace(news, media=media))
+
+    def close(self, timeout:Optional[float]=None) -> None:
+        """Finish every queued download, then stop the workers."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            # 排在所有下載之後
+            self._queue.put(((float("inf"), 0.0), next(self._sequence), None))
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def __enter__(self) -> "MediaDownloadQueue":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
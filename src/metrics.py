@@ -0,0 +1,304 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  metrics.py
+@Time    :  2026/10/19 19:20:36
+@Author  :  Kevin Wang
+@Desc    :  Minimal in-process counters, gauges and histograms rendered in the Prometheus text format
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import (Dict,
+                    Iterator,
+                    List,
+                    Sequence,
+                    Tuple,
+                    )
+import threading
+
+# 秒數用的預設 histogram 區間
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value:str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels:Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value:float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Registry:
+    """Collection of metrics rendered together by ``/metrics``."""
+    def __init__(self) -> None:
+        self._metrics:List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric:"_Metric") -> None:
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines += metric.samples()
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self,
+                 name:str,
+                 documentation:str,
+                 labelnames:Sequence[str]=(),
+                 registry:Registry=REGISTRY,
+                 ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children:Dict[Tuple[str, ...], object] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, **labels:str):
+        """The child metric of one label combination, created on first use."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _items(self) -> List[Tuple[List[Tuple[str, str]], object]]:
+        with self._lock:
+            return [(list(zip(self.labelnames, key)), child) for key, child in sorted(self._children.items())]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount:float=1) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or bytes."""
+    type = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount:float=1) -> None:
+        """Increase the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"
+                for labels, child in self._items()]
+
+class _GaugeChild:
+    def __init__(self) -> None:
+        self._value = 0.0
+
+    def set(self, value:float) -> None:
+        self._value = float(value)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+class Gauge(_Metric):
+    """Current value that can go up and down, e.g. a concurrency limit."""
+    type = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value:float) -> None:
+        """Set the unlabelled gauge."""
+        self.labels().set(value)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"
+                for labels, child in self._items()]
+
+class _HistogramChild:
+    def __init__(self, buckets:Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value:float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the ``with`` block in seconds, also when it raises."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, e.g. latencies or sizes."""
+    type = "histogram"
+
+    def __init__(self,
+                 name:str,
+                 documentation:str,
+                 labelnames:Sequence[str]=(),
+                 buckets:Sequence[float]=DEFAULT_BUCKETS,
+                 registry:Registry=REGISTRY,
+                 ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value:float) -> None:
+        """Observe a value of the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Time a block with the unlabelled histogram."""
+        return self.labels().time()
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = labels + [("le", _format_value(bound))]
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+# 爬蟲、下載、解析與匯出的指標
+HTTP_REQUEST_SECONDS = Histogram("nhk_http_request_duration_seconds",
+                                 "Latency of HTTP requests sent by MyRequests.",
+                                 ("host", "method", "status"),
+                                 )
+HTTP_RETRIES = Counter("nhk_http_retries_total",
+                       "HTTP requests retried after a timeout or connection error.",
+                       ("host", "reason"),
+                       )
+HTTP_RATE_LIMIT_SECONDS = Counter("nhk_http_rate_limit_seconds_total",
+                                  "Seconds requests waited for the per-host rate limit.",
+                                  ("host",),
+                                  )
+HOST_CONCURRENCY_LIMIT = Gauge("nhk_host_concurrency_limit",
+                               "Concurrent requests currently allowed per host by the adaptive controller.",
+                               ("host",),
+                               )
+HOST_CONCURRENCY_ADJUSTMENTS = Counter("nhk_host_concurrency_adjustments_total",
+                                       "Changes of the per-host concurrency limit (increase, decrease).",
+                                       ("host", "direction"),
+                                       )
+HTTP_CACHE_RESULTS = Counter("nhk_http_cache_total",
+                             "GET requests by disk cache result (hit, revalidated, miss).",
+                             ("host", "result"),
+                             )
+DOWNLOADED_BYTES = Counter("nhk_downloaded_bytes_total",
+                           "Response body bytes downloaded.",
+                           ("host",),
+                           )
+HLS_SEGMENTS = Counter("nhk_hls_segments_total",
+                       "HLS segments downloaded, rate() gives segments per second.",
+                       )
+HLS_DOWNLOAD_SECONDS = Histogram("nhk_hls_download_duration_seconds",
+                                 "Time to download and merge one HLS media.",
+                                 buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+                                 )
+MEDIA_QUEUE_RESULTS = Counter("nhk_media_queue_total",
+                              "Deferred media downloads by media type and result (done, failed).",
+                              ("type", "result"),
+                              )
+MEDIA_QUEUE_WAIT_SECONDS = Histogram("nhk_media_queue_wait_seconds",
+                                     "Time a deferred media download waited in the queue.",
+                                     ("type",),
+                                     buckets=(0.1, 1, 5, 10, 30, 60, 300, 900, 1800),
+                                     )
+BANDWIDTH_WAIT_SECONDS = Counter("nhk_bandwidth_wait_seconds_total",
+                                 "Seconds media downloads waited for the bandwidth cap.",
+                                 )
+PARSE_SECONDS = Histogram("nhk_parse_duration_seconds",
+                          "Time to parse one article page.",
+                          ("source",),
+                          )
+EXPORT_BATCH_SECONDS = Histogram("nhk_export_batch_duration_seconds",
+                                 "Time to write one export batch.",
+                                 ("exporter", "operation"),
+                                 )
+EXPORT_BATCH_ITEMS = Histogram("nhk_export_batch_items",
+                               "Objects per export batch.",
+                               ("exporter", "operation"),
+                               buckets=(1, 10, 50, 100, 200, 500, 1000, 5000),
+                               )
+CRAWLED_NEWS = Counter("nhk_crawled_news_total",
+                       "News crawled.",
+                       ("crawler",),
+                       )
+CRAWL_RUN_ITEMS = Histogram("nhk_crawl_run_items",
+                            "News crawled per run.",
+                            ("crawler",),
+                            buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000),
+                            )
+REFRESH_RESULTS = Counter("nhk_refresh_total",
+                          "Articles checked against the stored ones in refresh mode.",
+                          ("source", "result"),
+                          )
+DEADLINE_REMAINDER = Counter("nhk_crawl_remainder_total",
+                             "Feed items left for the next run when a crawl reached its deadline.",
+                             ("source",),
+                             )
+SCHEDULER_POLLS = Counter("nhk_scheduler_polls_total",
+                          "Scheduler polls.",
+                          ("source", "result"),
+                          )
+SCHEDULER_INTERVAL_SECONDS = Histogram("nhk_scheduler_interval_seconds",
+                                       "Wait chosen before the next poll of a source.",
+                                       ("source",),
+                                       buckets=(30, 60, 120, 300, 600, 900, 1800, 3600),
+                                       )
@@ -12,9 +12,18 @@
 
 from dataclasses import dataclass, asdict
 from datetime import datetime
+from hashlib import sha1
 from pathlib import Path
 from typing import Optional, Literal
 
+from storage import read_raw
+
+def _to_datetime(value:Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+def _to_path(value:Optional[str]) -> Optional[Path]:
+    return Path(value) if value is not None else None
+
 @dataclass
 class Media:
     status:str
@@ -38,6 +47,18 @@ class Media:
             data['filepath'] = self.filepath.__str__()
         return data
 
+    @classmethod
+    def from_json_dict(cls, data:dict) -> "Media":
+        """to_json_dict 的反向轉換"""
+        return cls(status=data['status'],
+                   id=data['id'],
+                   type=data['type'],
+                   url=data['url'],
+                   filepath=_to_path(data['filepath']),
+                   publication_time=_to_datetime(data['publication_time']),
+                   download_time=_to_datetime(data['download_time']),
+                   )
+
 @dataclass
 class HTMLContent:
     status:str
@@ -48,6 +69,7 @@ class HTMLContent:
     article:Optional[str]=None
     publication_time:Optional[datetime]=None
     download_time:Optional[datetime]=None
+    modified_time:Optional[datetime]=None
     html:Optional[str]=None
 
     def to_json_dict(self):
@@ -57,6 +79,8 @@ class HTMLContent:
             data['publication_time'] = data['publication_time'].isoformat()
         if data['download_time'] is not None:
             data['download_time'] = data['download_time'].isoformat()
+        if data['modified_time'] is not None:
+            data['modified_time'] = data['modified_time'].isoformat()
         if data['filepath'] is not None:
             data['filepath'] = self.filepath.__str__()
 
@@ -64,6 +88,26 @@ class HTMLContent:
         data.pop("html")
         return data
 
+    @classmethod
+    def from_json_dict(cls, data:dict) -> "HTMLContent":
+        """to_json_dict 的反向轉換（原始 html 不在 json 中）"""
+        return cls(status=data['status'],
+                   id=data['id'],
+                   url=data['url'],
+                   filepath=_to_path(data['filepath']),
+                   title=data['title'],
+                   article=data['article'],
+                   publication_time=_to_datetime(data['publication_time']),
+                   download_time=_to_datetime(data['download_time']),
+                   modified_time=_to_datetime(data.get('modified_time')),  # 舊的 news.json 沒有此欄位
+                   )
+
+    def read_html(self) -> bytes:
+        """讀回存檔的原始 html，自動處理壓縮與分層目錄"""
+        if self.html is not None:
+            return self.html.encode("utf-8")
+        return read_raw(self.filepath)
+
 @dataclass
 class News:
     source:str
@@ -78,8 +122,10 @@ class News:
 
     @property
     def id(self) -> int:
+        # hash() 每個 process 的 salt 不同，改取 sha1 的前 31 bits，跨 process 與重新啟動都相同
         # In binary, 0x7FFFFFFF becomes 01111111 11111111 11111111 11111111
-        return hash((self.source, self.source_id)) & 0x7FFFFFFF
+        digest = sha1(f"{self.source}:{self.source_id}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF
     
     def to_json_dict(self) -> dict:
         data = {}
@@ -96,3 +142,18 @@ class News:
             data['html_content'] = self.html_content.to_json_dict()
 
         return data
+
+    @classmethod
+    def from_json_dict(cls, data:dict) -> "News":
+        """to_json_dict 的反向轉換"""
+        return cls(source=data['source'],
+                   source_id=data['source_id'],
+                   title=data['title'],
+                   url=data['url'],
+                   publication_time=_to_datetime(data['publication_time']),
+                   download_time=_to_datetime(data['download_time']),
+                   author=data['author'],
+                   media=Media.from_json_dict(data['media']) if data['media'] else None,
+                   html_content=(HTMLContent.from_json_dict(data['html_content'])
+                                 if data['html_content'] else None),
+                   )
@@ -0,0 +1,111 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  orchestrator.py
+@Time    :  2026/10/20 00:06:51
+@Author  :  Kevin Wang
+@Desc    :  Run every NHK crawler concurrently against shared HTTP resources and one exporter
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import (Any,
+                    Callable,
+                    Dict,
+                    Iterator,
+                    Optional,
+                    )
+
+from objects import News
+from tracing import (propagate,
+                     span,
+                     )
+import crawler as crawler_module
+
+# 爬蟲的 iter_recent_news(start_date, end_date, **options)，例如 NHKWebCrawler().iter_recent_news
+Crawl = Callable[..., Iterator[News]]
+# 收到一筆 News 的回呼：(爬蟲名稱, news)，會在各爬蟲的 thread 中被呼叫
+NewsSink = Callable[[str, News], None]
+
+def discover_crawlers() -> Dict[str, type]:
+    """Every ``*WebCrawler`` class of the crawler module, in definition order.
+
+    A new source only needs a class following the naming and ``iter_recent_news`` interface of
+    the existing ones to be picked up by the orchestrator.
+    """
+    return {name: value for name, value in vars(crawler_module).items()
+            if isinstance(value, type) and name.endswith("WebCrawler") and value.__module__ == crawler_module.__name__}
+
+class CrawlOrchestrator:
+    def __init__(self, crawls:Optional[Dict[str, Crawl]]=None) -> None:
+        """Crawl all sources at the same time, so a run takes as long as the slowest source.
+
+        Each source runs in its own thread. They share what ``MyRequests`` and
+        ``HLSMediaDownloader`` take from ``budget``: one connection pool, the per-host rate
+        limit and the media download slots, so adding sources does not multiply the load on
+        NHK. Crawled news go to a single sink, typically the ``put`` of one ``AsyncExporter``.
+        A failing source is recorded in ``errors`` and does not stop the others.
+
+        Example:
+            with Export2PostgreSQL() as exporter, AsyncExporter(exporter) as writer:
+                counts = CrawlOrchestrator().run(lambda name, news: writer.put(news))
+
+        Args:
+            crawls (Optional[Dict[str, Crawl]], optional): Source name -> crawl. Defaults to
+                ``iter_recent_news`` of a new instance of every ``discover_crawlers()`` class.
+        """
+        if crawls is None:
+            crawls = {name: self._lazy_crawl(cls) for name, cls in discover_crawlers().items()}
+        self.crawls = crawls
+        self.errors:Dict[str, Exception] = {}
+
+    @staticmethod
+    def _lazy_crawl(cls:type) -> Crawl:
+        # 爬蟲在各自的 thread 中才建立
+        return lambda start_date, end_date, **options: cls().iter_recent_news(start_date=start_date,
+                                                                              end_date=end_date,
+                                                                              **options)
+
+    def _run_one(self,
+                 name:str,
+                 sink:NewsSink,
+                 start_date:Optional[datetime],
+                 end_date:Optional[datetime],
+                 options:Dict[str, Any],
+                 ) -> int:
+        count = 0
+        try:
+            with span(name):
+                for news in self.crawls[name](start_date, end_date, **options):
+                    sink(name, news)
+                    count += 1
+        except Exception as err:  # pylint: disable=broad-except
+            # 單一來源失敗不影響其他來源，已爬到的資料照常寫入
+            self.errors[name] = err
+            print(f"Crawl of {name} failed: {type(err).__name__}: {err}")
+        return count
+
+    def run(self,
+            sink:NewsSink,
+            start_date:Optional[datetime]=None,
+            end_date:Optional[datetime]=None,
+            **options:Any,
+            ) -> Dict[str, int]:
+        """Run every crawl to completion.
+
+        Args:
+            sink (NewsSink): Called with the source name and every crawled news, from the source's
+                thread, so it must be thread-safe (``AsyncExporter.put`` is).
+            start_date (Optional[datetime], optional): Passed to every crawl. Defaults to None.
+            end_date (Optional[datetime], optional): Passed to every crawl. Defaults to None.
+            **options: Passed to every crawl, e.g. a shared ``media_queue``.
+
+        Returns:
+            Dict[str, int]: Number of news crawled per source, also for sources that failed halfway.
+        """
+        self.errors = {}
+        if not self.crawls:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(self.crawls), thread_name_prefix="crawl") as executor:
+            futures = {name: executor.submit(propagate(self._run_one), name, sink, start_date, end_date, options)
+                       for name in self.crawls}
+        return {name: future.result() for name, future in futures.items()}
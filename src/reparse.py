@@ -0,0 +1,177 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  reparse.py
+@Time    :  2026/10/19 10:12:41
+@Author  :  Kevin Wang
+@Desc    :  Re-run the parsers over the raw HTML archive without crawling again
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import (Dict,
+                    Iterable,
+                    Iterator,
+                    List,
+                    Optional,
+                    Tuple,
+                    )
+
+from config import ProjectConfigs
+from crawler import (NHKEasyWebCrawler,
+                     NHKWebCrawler,
+                     )
+from export import Export2PostgreSQL
+from objects import HTMLContent
+from storage import (RawStorage,
+                     key_of,
+                     read_raw,
+                     )
+
+# source 名稱 -> (解析用的 crawler 類別, 預設的 html 存檔位置)
+SOURCES = {"easy": (NHKEasyWebCrawler, ProjectConfigs.RAW_DIR.joinpath("nhk_easy_web/contents")),
+           "news": (NHKWebCrawler, ProjectConfigs.RAW_DIR.joinpath("nhk_news/contents")),
+           }
+
+def _parse_file(args:Tuple[str, Path]) -> Tuple[Path, Optional[HTMLContent], Optional[str]]:
+    """Worker for the process pool, must stay at module level to be picklable."""
+    source, path = args
+    crawler_cls, _ = SOURCES[source]
+    try:
+        title, article, publication_time = crawler_cls.parse_html(read_raw(path))
+    except Exception as err:  # pylint: disable=broad-except
+        return path, None, f"{type(err).__name__}: {err}"
+    return path, HTMLContent(status=None,
+                             id=key_of(path, ".html"),
+                             url=None,
+                             filepath=path,
+                             title=title,
+                             article=article,
+                             publication_time=publication_time,
+                             ), None
+
+def iter_archive(content_dir:Path) -> Iterator[Path]:
+    """Yield every stored raw HTML page under ``content_dir``, flat or sharded, compressed or not.
+
+    Args:
+        content_dir (Path): Directory the crawler saved the pages to.
+
+    Yields:
+        Path: Path of a stored page.
+    """
+    yield from RawStorage(content_dir, compression=None).iter_files(".html")
+
+def iter_parsed(source:str,
+                paths:Iterable[Path],
+                max_workers:Optional[int]=None,
+                chunksize:int=16,
+                ) -> Iterator[Tuple[Path, Optional[HTMLContent], Optional[str]]]:
+    """Parse stored pages in parallel with the parser of the given source.
+
+    Args:
+        source (str): Either ``"easy"`` or ``"news"``.
+        paths (Iterable[Path]): Raw HTML files to parse.
+        max_workers (Optional[int], optional): Number of worker processes. Defaults to the CPU count.
+        chunksize (int, optional): Files handed to a worker at a time. Defaults to 16.
+
+    Yields:
+        Tuple[Path, Optional[HTMLContent], Optional[str]]: The file, the parsed content
+            (None on failure) and the error message (None on success).
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source {source!r}, expected one of {list(SOURCES)}")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(_parse_file,
+                                ((source, path) for path in paths),
+                                chunksize=chunksize,
+                                )
+
+def diff_parsed(parsed:HTMLContent,
+                stored:HTMLContent,
+                ) -> Optional[HTMLContent]:
+    """Merge freshly parsed fields into the stored record if anything changed.
+
+    ``publication_time`` is only filled in when the stored one is missing, the TIMESTAMP
+    column drops the UTC offset so the two values cannot be compared reliably. ``filepath``
+    follows the file if the archive has been migrated to another layout.
+
+    Args:
+        parsed (HTMLContent): Result of re-parsing the raw page.
+        stored (HTMLContent): Record currently in the database.
+
+    Returns:
+        Optional[HTMLContent]: The updated record, or None if nothing changed.
+    """
+    changes = {}
+    if parsed.title != stored.title:
+        changes["title"] = parsed.title
+    if parsed.article != stored.article:
+        changes["article"] = parsed.article
+    if stored.publication_time is None and parsed.publication_time is not None:
+        changes["publication_time"] = parsed.publication_time
+    # 存檔搬移（例如 migrate-raw）後一併更新 filepath
+    if parsed.filepath and str(parsed.filepath) != str(stored.filepath):
+        changes["filepath"] = parsed.filepath
+    if not changes:
+        return None
+    return replace(stored, **changes)
+
+def reparse_archive(source:str,
+                    content_dir:Optional[Path]=None,
+                    exporter:Optional[Export2PostgreSQL]=None,
+                    max_workers:Optional[int]=None,
+                    batch_size:int=500,
+                    dry_run:bool=False,
+                    ) -> Dict[str, int]:
+    """Re-parse the stored HTML archive of a source and re-export the records that changed.
+
+    Args:
+        source (str): Either ``"easy"`` or ``"news"``.
+        content_dir (Optional[Path], optional): Archive directory. Defaults to the crawler's
+            default content directory of the source.
+        exporter (Optional[Export2PostgreSQL], optional): Exporter to compare against and write to.
+            Defaults to a new ``Export2PostgreSQL``.
+        max_workers (Optional[int], optional): Number of parser processes. Defaults to the CPU count.
+        batch_size (int, optional): Records compared and exported per database round trip.
+            Defaults to 500.
+        dry_run (bool, optional): Only count the changes without writing. Defaults to False.
+
+    Returns:
+        Dict[str, int]: Counts of ``parsed``, ``failed``, ``missing`` (not in the database)
+            and ``changed`` records.
+    """
+    if exporter is None:
+        with Export2PostgreSQL() as exporter:
+            return reparse_archive(source, content_dir, exporter, max_workers, batch_size, dry_run)
+    content_dir = Path(content_dir) if content_dir else SOURCES[source][1]
+
+    stats = {"parsed": 0, "failed": 0, "missing": 0, "changed": 0}
+    batch:List[HTMLContent] = []
+
+    def flush():
+        stored = exporter.fetch_html_contents(obj.id for obj in batch)
+        changed = []
+        for obj in batch:
+            if obj.id not in stored:
+                stats["missing"] += 1
+                continue
+            updated = diff_parsed(obj, stored[obj.id])
+            if updated is not None:
+                changed.append(updated)
+        stats["changed"] += len(changed)
+        if changed and not dry_run:
+            exporter.insert_html_contents(changed)
+        batch.clear()
+
+    for path, obj, error in iter_parsed(source, iter_archive(content_dir), max_workers):
+        if error:
+            stats["failed"] += 1
+            print(f"Failed to parse {path}: {error}")
+            continue
+        stats["parsed"] += 1
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
@@ -0,0 +1,226 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  scheduler.py
+@Time    :  2026/10/19 23:26:40
+@Author  :  Kevin Wang
+@Desc    :  Long-running scheduler polling the NHK feeds at an interval learned from publications
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from statistics import median
+from time import monotonic
+from typing import (Callable,
+                    Dict,
+                    Iterable,
+                    Iterator,
+                    List,
+                    Optional,
+                    )
+import threading
+
+from config import ProjectConfigs
+from metrics import (SCHEDULER_INTERVAL_SECONDS,
+                     SCHEDULER_POLLS,
+                     )
+from objects import News
+
+# ids -> 已儲存文章的最後修改時間，與 crawler 的 stored_times 參數相同
+StoredTimes = Callable[[List[str]], Dict[str, datetime]]
+# stored_times -> 只下載新文章（與改版文章）的增量爬取，例如 main._iter_crawl_and_export
+IncrementalCrawl = Callable[[StoredTimes], Iterator[News]]
+
+class AdaptiveInterval:
+    def __init__(self,
+                 min_interval:float=ProjectConfigs.SCHEDULER_MIN_INTERVAL,
+                 max_interval:float=ProjectConfigs.SCHEDULER_MAX_INTERVAL,
+                 factor:float=0.5,
+                 backoff:float=1.5,
+                 window:int=20,
+                 ) -> None:
+        """Polling interval learned from the publication times a source has shown recently.
+
+        The base interval is ``factor`` times the median gap between the newest ``window``
+        publications, so a feed publishing every ten minutes is polled about every five. Each
+        poll that finds nothing new stretches the interval by ``backoff``, but never past the
+        median gap itself, and a poll with new items resets it. Everything is clamped to
+        ``[min_interval, max_interval]``; until two publications are known the minimum is used.
+
+        Args:
+            min_interval (float, optional): Shortest wait in seconds. Defaults to
+                ``ProjectConfigs.SCHEDULER_MIN_INTERVAL``.
+            max_interval (float, optional): Longest wait in seconds. Defaults to
+                ``ProjectConfigs.SCHEDULER_MAX_INTERVAL``.
+            factor (float, optional): Fraction of the median gap to wait. Defaults to 0.5.
+            backoff (float, optional): Growth per idle poll. Defaults to 1.5.
+            window (int, optional): Publications the gap is learned from. Defaults to 20.
+        """
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError(f"Invalid interval bounds [{min_interval}, {max_interval}]")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.backoff = backoff
+        self.window = window
+        self.idle_polls = 0
+        self._times:List[float] = []
+
+    def observe(self, times:Iterable[Optional[datetime]]) -> None:
+        """Remember publication times, naive ones are taken as local time."""
+        merged = set(self._times)
+        merged.update(time.timestamp() for time in times if time is not None)
+        self._times = sorted(merged)[-self.window:]
+
+    @property
+    def median_gap(self) -> Optional[float]:
+        """Median seconds between the remembered publications, None with fewer than two."""
+        if len(self._times) < 2:
+            return None
+        return median(later - earlier for earlier, later in zip(self._times, self._times[1:]))
+
+    def next_interval(self, found_new:bool) -> float:
+        """Seconds to wait before the next poll, given whether this poll found new items."""
+        self.idle_polls = 0 if found_new else self.idle_polls + 1
+        gap = self.median_gap
+        if gap is None:
+            return self.min_interval
+        interval = min(gap * self.factor * self.backoff ** self.idle_polls, gap)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+class KnownArticles:
+    def __init__(self,
+                 lookup:StoredTimes,
+                 max_size:int=ProjectConfigs.SCHEDULER_KNOWN_ARTICLES,
+                 ) -> None:
+        """Stored article times kept in memory, so a poll with nothing new needs no database query.
+
+        Only the ``max_size`` ids most recently seen in a feed are kept: articles that dropped out
+        of the feeds are never asked for again, so a scheduler running for months stays bounded.
+        An evicted id that does come back is simply looked up again.
+
+        Args:
+            lookup (StoredTimes): Source of truth for ids not seen yet, e.g.
+                ``Export2PostgreSQL.fetch_modified_times``.
+            max_size (int, optional): Ids kept in memory. Defaults to
+                ``ProjectConfigs.SCHEDULER_KNOWN_ARTICLES``.
+        """
+        self._lookup = lookup
+        self.max_size = max_size
+        self._times:OrderedDict[str, datetime] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def __call__(self, ids:List[str]) -> Dict[str, datetime]:
+        missing = [news_id for news_id in ids if news_id not in self._times]
+        times = dict(self._lookup(missing)) if missing else {}
+        for news_id in ids:
+            if news_id in self._times:
+                times.setdefault(news_id, self._times[news_id])
+        self._remember(times)
+        return {news_id: times[news_id] for news_id in ids if news_id in times}
+
+    def add(self, news:News) -> None:
+        """Record a freshly crawled article."""
+        content = news.html_content
+        if content is not None:
+            self._remember({content.id: content.modified_time or content.publication_time or news.publication_time})
+
+    def _remember(self, times:Dict[str, datetime]) -> None:
+        # 最近出現的移到最後，超過上限時從最前面（最久未出現）淘汰
+        for news_id, time in times.items():
+            self._times[news_id] = time
+            self._times.move_to_end(news_id)
+        while len(self._times) > self.max_size:
+            self._times.popitem(last=False)
+
+@dataclass
+class _Source:
+    name:str
+    crawl:IncrementalCrawl
+    known:KnownArticles
+    interval:AdaptiveInterval
+    due:float=0.0  # monotonic() 時間，0 表示立即輪詢
+
+class PollingScheduler:
+    def __init__(self,
+                 crawls:Dict[str, IncrementalCrawl],
+                 lookup:StoredTimes,
+                 min_interval:float=ProjectConfigs.SCHEDULER_MIN_INTERVAL,
+                 max_interval:float=ProjectConfigs.SCHEDULER_MAX_INTERVAL,
+                 ) -> None:
+        """Poll each source forever, running an incremental crawl whenever it is due.
+
+        A poll is the incremental crawl itself: it fetches the feed (a 304 when the HTTP disk cache
+        is on and nothing changed), asks ``KnownArticles`` which ids are already stored and only
+        downloads the rest. The publication times seen in the feed then tune the source's
+        ``AdaptiveInterval``. Sources are polled one at a time, the one due first goes next.
+
+        Example:
+            scheduler = PollingScheduler({"news": lambda stored_times: crawl_news(stored_times)},
+                                         lookup=exporter.fetch_modified_times)
+            scheduler.run()  # until scheduler.stop()
+
+        Args:
+            crawls (Dict[str, IncrementalCrawl]): Source name -> incremental crawl, called with the
+                ``stored_times`` lookup to hand to the crawler.
+            lookup (StoredTimes): Stored times of article ids, shared by all sources.
+            min_interval (float, optional): Shortest wait between two polls of a source in seconds.
+                Defaults to ``ProjectConfigs.SCHEDULER_MIN_INTERVAL``.
+            max_interval (float, optional): Longest wait in seconds. Defaults to
+                ``ProjectConfigs.SCHEDULER_MAX_INTERVAL``.
+        """
+        self.sources = {name: _Source(name=name,
+                                      crawl=crawl,
+                                      known=KnownArticles(lookup),
+                                      interval=AdaptiveInterval(min_interval, max_interval),
+                                      )
+                        for name, crawl in crawls.items()}
+        self._stop = threading.Event()
+
+    def poll(self, name:str) -> int:
+        """Run one incremental crawl of a source and schedule its next poll.
+
+        Returns:
+            int: Number of news crawled, -1 when the poll failed.
+        """
+        source = self.sources[name]
+        seen:List[Optional[datetime]] = []
+
+        def stored_times(ids:List[str]) -> Dict[str, datetime]:
+            times = source.known(ids)
+            seen.extend(times.values())
+            return times
+
+        count = 0
+        try:
+            for news in source.crawl(stored_times):
+                source.known.add(news)
+                seen.append(news.publication_time)
+                count += 1
+        except Exception as err:  # pylint: disable=broad-except
+            # 單次輪詢失敗不可中止常駐程式，等下一次輪詢再試
+            print(f"Poll of {name} failed: {type(err).__name__}: {err}")
+            count = -1
+        source.interval.observe(seen)
+        interval = source.interval.next_interval(found_new=count > 0)
+        source.due = monotonic() + interval
+        SCHEDULER_POLLS.labels(source=name, result="failed" if count < 0 else "new" if count else "unchanged").inc()
+        SCHEDULER_INTERVAL_SECONDS.labels(source=name).observe(interval)
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {name}: {max(count, 0)} new, next poll in {interval:.0f}s")
+        return count
+
+    def run(self, max_polls:Optional[int]=None) -> None:
+        """Poll the sources until ``stop()`` is called (or ``max_polls`` polls have run)."""
+        polls = 0
+        while not self._stop.is_set() and (max_polls is None or polls < max_polls):
+            source = min(self.sources.values(), key=lambda source: source.due)
+            if self._stop.wait(max(0.0, source.due - monotonic())):
+                break
+            self.poll(source.name)
+            polls += 1
+
+    def stop(self) -> None:
+        """Ask ``run`` to return, waking it up if it is waiting for the next poll."""
+        self._stop.set()
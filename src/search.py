@@ -0,0 +1,121 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  search.py
+@Time    :  2026/10/19 17:05:22
+@Author  :  Kevin Wang
+@Desc    :  N-gram helpers shared by the full-text search index and its queries
+"""
+
+from typing import (List,
+                    Optional,
+                    Set,
+                    Tuple,
+                    )
+import re
+import unicodedata
+
+def normalize_text(text:Optional[str]) -> str:
+    """Normalize text the same way the database does before indexing.
+
+    Mirrors ``lower(normalize(text, NFKC))`` in PostgreSQL, so full-width letters and
+    digits, half-width katakana and upper case all match their usual forms.
+
+    Args:
+        text (Optional[str]): Raw text, None is treated as empty.
+
+    Returns:
+        str: Normalized text.
+    """
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+def _normalize_with_offsets(text:str) -> Tuple[str, List[int]]:
+    """Normalize text like ``normalize_text`` and map each normalized character to its source index.
+
+    Characters are normalized one at a time, except that a character normalizing to a combining
+    mark (e.g. the half-width voiced mark ``ﾞ``) is normalized together with the one before it,
+    so that ``ｶﾞ`` still becomes ``ガ``.
+    """
+    segments:List[Tuple[int, str]] = []
+    for i, char in enumerate(text):
+        normalized = normalize_text(char)
+        if segments and normalized and unicodedata.combining(normalized[0]):
+            start, source = segments[-1]
+            segments[-1] = (start, source + char)
+        else:
+            segments.append((i, char))
+    normalized, offsets = [], []
+    for start, source in segments:
+        piece = normalize_text(source)
+        normalized.append(piece)
+        offsets.extend([start] * len(piece))
+    return "".join(normalized), offsets
+
+def ngrams(text:str) -> Set[str]:
+    """Character unigrams and bigrams of already normalized text, skipping whitespace.
+
+    Japanese has no word boundaries, so the index stores every single character and every
+    pair of adjacent characters. A query term is then looked up by its bigrams (or the
+    character itself for one-character terms) and confirmed by a substring match.
+
+    Args:
+        text (str): Normalized text.
+
+    Returns:
+        Set[str]: The distinct grams.
+    """
+    grams = set()
+    for i, char in enumerate(text):
+        if not char.isspace():
+            grams.add(char)
+        gram = text[i:i + 2]
+        if len(gram) == 2 and not re.search(r"\s", gram):
+            grams.add(gram)
+    return grams
+
+def query_terms(query:str) -> List[str]:
+    """Split a search query into normalized terms, all of which must match.
+
+    Args:
+        query (str): Search query, terms separated by whitespace.
+
+    Returns:
+        List[str]: Distinct normalized terms in their original order.
+    """
+    return list(dict.fromkeys(normalize_text(query).split()))
+
+def query_grams(terms:List[str]) -> List[str]:
+    """Grams an indexed document must contain to possibly match every term.
+
+    Args:
+        terms (List[str]): Normalized query terms.
+
+    Returns:
+        List[str]: Sorted grams for an array containment (``@>``) lookup.
+    """
+    grams = set()
+    for term in terms:
+        grams.update(gram for gram in ngrams(term) if len(gram) == 2 or len(term) == 1)
+    return sorted(grams)
+
+def make_snippet(text:Optional[str],
+                 terms:List[str],
+                 width:int=80,
+                 ) -> str:
+    """Cut a short excerpt of ``text`` around the first matching term.
+
+    Args:
+        text (Optional[str]): Article text.
+        terms (List[str]): Normalized query terms.
+        width (int, optional): Length of the excerpt. Defaults to 80.
+
+    Returns:
+        str: The excerpt, starting from the beginning if no term is found.
+    """
+    text = re.sub(r"\s+", " ", text or "").strip()
+    # 在 NFKC 正規化後的文字中找詞，再換算回原文的位置（全形的 ＮＨＫ、２０２４ 也找得到）
+    normalized, offsets = _normalize_with_offsets(text)
+    positions = [normalized.find(term) for term in terms]
+    position = min((offsets[pos] for pos in positions if pos >= 0), default=0)
+    start = max(0, position - width // 4)
+    snippet = text[start:start + width]
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
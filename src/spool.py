@@ -0,0 +1,234 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  spool.py
+@Time    :  2026/10/19 16:31:08
+@Author  :  Kevin Wang
+@Desc    :  Local dead-letter spool for export batches that failed to reach the database
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import (Callable,
+                    Dict,
+                    Iterator,
+                    List,
+                    Literal,
+                    Optional,
+                    Tuple,
+                    Union,
+                    )
+from uuid import uuid4
+import json
+import os
+import tempfile
+
+from config import ProjectConfigs
+from objects import (HTMLContent,
+                     News,
+                     )
+
+SpoolKind = Literal["news", "html_contents"]
+
+# 重送中的 entry 改名加上此後綴，其他 process 的 replay 就不會再取得同一個 entry
+CLAIM_SUFFIX = ".claimed"
+# 超過 max_attempts 的 entry 移到此子目錄，不再自動重送
+DEAD_DIR = "dead"
+
+# 各種 spool 內容的還原方式
+_LOADERS = {"news": News.from_json_dict,
+            "html_contents": HTMLContent.from_json_dict,
+            }
+
+class DeadLetterSpool:
+    def __init__(self,
+                 directory:Union[str,Path]=ProjectConfigs.INTERIM_DIR.joinpath("export_spool"),
+                 base_delay:float=30,
+                 max_delay:float=3600,
+                 max_attempts:int=10,
+                 claim_timeout:float=3600,
+                 ) -> None:
+        """Durable spool of export batches that could not be written to the database.
+
+        Every failed batch is stored as one JSON file holding the serialized objects, the
+        error and its retry schedule. Entries are replayed with exponential backoff
+        (``base_delay * 2 ** attempts``, capped at ``max_delay`` seconds) and deleted once
+        the export succeeds, so a short database outage never loses crawled articles.
+        An entry that still fails after ``max_attempts`` retries is moved to ``dead/`` for
+        manual inspection instead of being retried forever.
+
+        Several processes may replay the same spool: an entry is claimed by renaming it
+        before the retry, so each entry is handled by one of them only. A claim left behind
+        by a crashed process is released after ``claim_timeout`` seconds.
+
+        Args:
+            directory (Union[str, Path], optional): Spool directory.
+                Defaults to ``ProjectConfigs.INTERIM_DIR / "export_spool"``.
+            base_delay (float, optional): Delay before the first retry in seconds. Defaults to 30.
+            max_delay (float, optional): Upper bound of the retry delay in seconds. Defaults to 3600.
+            max_attempts (int, optional): Failed retries before an entry is moved to ``dead/``.
+                Defaults to 10.
+            claim_timeout (float, optional): Age in seconds after which a claim is considered
+                abandoned. Defaults to 3600.
+        """
+        self.directory = Path(directory)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._entries())
+
+    @property
+    def dead_directory(self) -> Path:
+        return self.directory.joinpath(DEAD_DIR)
+
+    def _entries(self) -> Iterator[Path]:
+        if not self.directory.is_dir():
+            return iter(())
+        return iter(sorted(self.directory.glob("*.json")))
+
+    @staticmethod
+    def _write(path:Path, entry:dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(entry, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _read(path:Path) -> Optional[dict]:
+        """讀取 entry，已被其他 process 取走或刪除時回傳 None"""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _claim(self, path:Path) -> Optional[Path]:
+        """以 rename 取得 entry 的處理權，已被其他 process 取得時回傳 None"""
+        claimed = path.with_name(path.name + CLAIM_SUFFIX)
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return None
+        os.utime(claimed)  # 以 mtime 記錄取得的時間
+        return claimed
+
+    def _release_stale_claims(self) -> None:
+        """把處理中 process 已中止而遺留的 claim 放回 spool"""
+        now = datetime.now().timestamp()
+        for claimed in self.directory.glob(f"*.json{CLAIM_SUFFIX}"):
+            try:
+                if now - claimed.stat().st_mtime > self.claim_timeout:
+                    os.rename(claimed, claimed.with_name(claimed.name[:-len(CLAIM_SUFFIX)]))
+            except FileNotFoundError:
+                continue
+
+    def push(self,
+             kind:SpoolKind,
+             objs:List[Union[News, HTMLContent]],
+             error:Union[str, Exception],
+             ) -> Path:
+        """Persist a failed batch.
+
+        Args:
+            kind (SpoolKind): ``"news"`` for ``insert``/``insert_many`` batches,
+                ``"html_contents"`` for ``insert_html_contents`` batches.
+            objs (List[Union[News, HTMLContent]]): Objects of the failed batch.
+            error (Union[str, Exception]): Why the export failed.
+
+        Returns:
+            Path: The spool file.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = datetime.now()
+        path = self.directory.joinpath(f"{now:%Y%m%d%H%M%S%f}-{uuid4().hex[:8]}.json")
+        self._write(path, {"kind": kind,
+                           "created_time": now.isoformat(),
+                           "attempts": 0,
+                           "next_attempt": now.timestamp() + self.base_delay,
+                           "error": str(error),
+                           "items": [obj.to_json_dict() for obj in objs],
+                           })
+        print(f"Spooled {len(objs)} {kind} to {path}")
+        return path
+
+    def next_due(self) -> float:
+        """Unix time of the earliest scheduled retry, ``inf`` if the spool is empty."""
+        due = float("inf")
+        for path in self._entries():
+            entry = self._read(path)
+            if entry is not None:
+                due = min(due, entry["next_attempt"])
+        return due
+
+    def replay(self,
+               handler:Callable[[SpoolKind, list], bool],
+               force:bool=False,
+               ) -> Dict[str, int]:
+        """Retry the due entries, oldest first.
+
+        Args:
+            handler (Callable[[SpoolKind, list], bool]): Exports the restored objects of one
+                entry and returns whether it succeeded.
+            force (bool, optional): Ignore the backoff schedule and retry every entry.
+                Defaults to False.
+
+        Returns:
+            Dict[str, int]: Counts of ``replayed`` (deleted), ``failed`` (rescheduled),
+                ``dead`` (moved to ``dead/`` after ``max_attempts``) and ``pending``
+                (not yet due) entries.
+        """
+        stats = {"replayed": 0, "failed": 0, "dead": 0, "pending": 0}
+        if not self.directory.is_dir():
+            return stats
+        self._release_stale_claims()
+        for path in self._entries():
+            entry = self._read(path)
+            if entry is None:
+                continue
+            now = datetime.now().timestamp()
+            if not force and entry["next_attempt"] > now:
+                stats["pending"] += 1
+                continue
+
+            claimed = self._claim(path)
+            if claimed is None:
+                continue  # 其他 process 正在重送
+            entry = self._read(claimed)
+            if entry is None:
+                continue
+            kind, objs = self.load(entry)
+            try:
+                succeeded = handler(kind, objs)
+            except Exception as err:  # pylint: disable=broad-except
+                entry["error"] = str(err)
+                succeeded = False
+            if succeeded:
+                claimed.unlink(missing_ok=True)
+                stats["replayed"] += 1
+                continue
+
+            entry["attempts"] += 1
+            if entry["attempts"] >= self.max_attempts:
+                self._write(self.dead_directory.joinpath(path.name), entry)
+                claimed.unlink(missing_ok=True)
+                print(f"Spool entry {path.name} failed {entry['attempts']} times, moved to {self.dead_directory}")
+                stats["dead"] += 1
+                continue
+            entry["next_attempt"] = now + min(self.max_delay, self.base_delay * 2 ** entry["attempts"])
+            self._write(path, entry)
+            claimed.unlink(missing_ok=True)
+            stats["failed"] += 1
+        return stats
+
+    @staticmethod
+    def load(entry:dict) -> Tuple[SpoolKind, list]:
+        """Restore the objects of a spool entry."""
+        loader = _LOADERS[entry["kind"]]
+        return entry["kind"], [loader(item) for item in entry["items"]]
@@ -0,0 +1,401 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  storage.py
+@Time    :  2026/10/19 11:05:27
+@Author  :  Kevin Wang
+@Desc    :  Sharded, optionally compressed layout for the raw HTML / media archive
+"""
+
+from dataclasses import dataclass
+from hashlib import (sha1,
+                     sha256,
+                     )
+from pathlib import Path
+from typing import (Dict,
+                    Iterator,
+                    Optional,
+                    Union,
+                    )
+import gzip
+import json
+import os
+import tempfile
+
+try:
+    import zstandard
+except ImportError:  # zstd 為選用套件，未安裝時只能使用 gzip 或不壓縮
+    zstandard = None
+
+from config import ProjectConfigs
+
+# 讀取時會嘗試的最大分層深度（migrate-raw 轉換後、設定尚未更新時也找得到檔案）
+MAX_SHARD_DEPTH = 4
+
+# 壓縮方式 -> 副檔名
+COMPRESSION_SUFFIXES = {None: "",
+                        "gzip": ".gz",
+                        "zstd": ".zst",
+                        }
+
+def _check_compression(compression:Optional[str]) -> None:
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression {compression!r}, expected one of {list(COMPRESSION_SUFFIXES)}")
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("zstd compression requires the `zstandard` package")
+
+def compress(data:bytes, compression:Optional[str]) -> bytes:
+    """Compress ``data`` with the given method (None leaves it untouched)."""
+    _check_compression(compression)
+    if compression == "gzip":
+        return gzip.compress(data)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+def decompress(data:bytes, path:Union[str,Path]) -> bytes:
+    """Decompress ``data`` according to the extension of ``path``."""
+    name = str(path)
+    if name.endswith(".gz"):
+        return gzip.decompress(data)
+    if name.endswith(".zst"):
+        _check_compression("zstd")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+def split_name(path:Union[str,Path]) -> str:
+    """Strip the compression extension from a file name, e.g. ``k1.html.gz`` -> ``k1.html``."""
+    name = Path(path).name
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if suffix and name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def key_of(path:Union[str,Path], suffix:str) -> str:
+    """Return the storage key of a stored file, e.g. ``ab/cd/k1.html.gz`` -> ``k1``."""
+    name = split_name(path)
+    return name[:-len(suffix)] if suffix and name.endswith(suffix) else name
+
+def write_atomic(path:Path, data:bytes) -> None:
+    """Write through a temporary file so a crash never leaves a truncated file behind."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 暫存檔名由 tempfile 產生，不同 thread / process 同時寫入同一個檔案也不會互相覆蓋
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False) as file:
+        tmp_path = file.name
+        try:
+            file.write(data)
+        except BaseException:
+            file.close()
+            os.unlink(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+class RawStorage:
+    def __init__(self,
+                 root:Union[str,Path],
+                 shard_depth:int=ProjectConfigs.RAW_SHARD_DEPTH,
+                 compression:Optional[str]=ProjectConfigs.RAW_COMPRESSION,
+                 ) -> None:
+        """Storage backend for the raw archive with hash-prefix sharded directories.
+
+        A file with key ``k10014659321000`` and suffix ``.html`` is stored as
+        ``root/3f/a2/k10014659321000.html.gz``, where ``3f/a2`` are the first bytes of
+        the SHA-1 of the key. This keeps every directory small no matter how many years
+        of news are archived.
+
+        Args:
+            root (Union[str, Path]): Root directory, e.g. ``RAW_DIR/nhk_easy_web/contents``.
+            shard_depth (int, optional): Number of two-hex-digit directory levels, 0 gives the
+                old flat layout. Defaults to ``ProjectConfigs.RAW_SHARD_DEPTH``.
+            compression (Optional[str], optional): None, "gzip" or "zstd".
+                Defaults to ``ProjectConfigs.RAW_COMPRESSION``.
+        """
+        _check_compression(compression)
+        self.root = Path(root)
+        self.shard_depth = shard_depth
+        self.compression = compression
+
+    def shard_dir(self, key:str, shard_depth:Optional[int]=None) -> Path:
+        """Directory a key belongs to."""
+        shard_depth = self.shard_depth if shard_depth is None else shard_depth
+        digest = sha1(key.encode("utf-8")).hexdigest()
+        return self.root.joinpath(*(digest[2*level:2*level + 2] for level in range(shard_depth)))
+
+    def path_for(self, key:str, suffix:str) -> Path:
+        """Path a key is written to."""
+        return self.shard_dir(key).joinpath(f"{key}{suffix}{COMPRESSION_SUFFIXES[self.compression]}")
+
+    def write(self,
+              key:str,
+              data:bytes,
+              suffix:str,
+              ) -> Path:
+        """Store ``data`` under ``key`` and remove stale copies in other formats.
+
+        Args:
+            key (str): File identifier, e.g. the news id.
+            data (bytes): Uncompressed content.
+            suffix (str): File extension such as ``.html``.
+
+        Returns:
+            Path: Where the data was written.
+        """
+        path = self.path_for(key, suffix)
+        write_atomic(path, compress(data, self.compression))
+        for other in self._candidates(key, suffix):
+            if other != path and other.exists():
+                other.unlink()
+        return path
+
+    def _candidates(self,
+                    key:str,
+                    suffix:str,
+                    all_depths:bool=False,
+                    ) -> Iterator[Path]:
+        """Every place a key may live: current layout first, then flat (pre-sharding) layout.
+
+        With ``all_depths`` the other depths up to ``MAX_SHARD_DEPTH`` follow, for archives
+        migrated to a layout the configuration does not use (yet).
+        """
+        depths = (self.shard_depth, 0) + (tuple(range(1, MAX_SHARD_DEPTH + 1)) if all_depths else ())
+        for shard_depth in dict.fromkeys(depths):
+            directory = self.shard_dir(key, shard_depth)
+            for ext in COMPRESSION_SUFFIXES.values():
+                yield directory.joinpath(f"{key}{suffix}{ext}")
+
+    def locate(self, key:str, suffix:str) -> Optional[Path]:
+        """Find the stored file of a key in any layout or compression, None if absent."""
+        for path in self._candidates(key, suffix, all_depths=True):
+            if path.exists():
+                return path
+        return None
+
+    def read(self, key:str, suffix:str) -> bytes:
+        """Read the decompressed content stored under ``key``.
+
+        Raises:
+            FileNotFoundError: If the key is not stored.
+        """
+        path = self.locate(key, suffix)
+        if path is None:
+            raise FileNotFoundError(f"{key}{suffix} not found under {self.root}")
+        return read_raw(path)
+
+    def iter_files(self, suffix:str) -> Iterator[Path]:
+        """Yield every stored file with the given suffix, flat or sharded."""
+        for path in sorted(self.root.rglob(f"*{suffix}*")):
+            if path.is_file() and split_name(path).endswith(suffix) and not path.name.startswith("."):
+                yield path
+
+    def migrate(self,
+                suffix:str,
+                dry_run:bool=False,
+                ) -> Dict[Path, Path]:
+        """Move every file that is not yet in the current layout/compression into it.
+
+        Args:
+            suffix (str): File extension such as ``.html``.
+            dry_run (bool, optional): Only compute the moves. Defaults to False.
+
+        Returns:
+            Dict[Path, Path]: Old path -> new path of every moved file.
+        """
+        moves = {}
+        for path in list(self.iter_files(suffix)):
+            target = self.path_for(key_of(path, suffix), suffix)
+            if path == target:
+                continue
+            moves[path] = target
+            if dry_run:
+                continue
+            if self.compression is None and split_name(path) == path.name:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, target)
+            else:
+                write_atomic(target, compress(read_raw(path), self.compression))
+                path.unlink()
+        return moves
+
+@dataclass
+class MediaBlob:
+    """A media file in the content-addressed store."""
+    digest:str
+    size:int
+    path:Path
+
+class MediaStore:
+    def __init__(self,
+                 root:Union[str,Path],
+                 shard_depth:int=ProjectConfigs.RAW_SHARD_DEPTH,
+                 ) -> None:
+        """Content-addressed store for voice / video files.
+
+        Each file is stored once under its SHA-256 digest (``root/blobs/ab/cd/{digest}.mp3``),
+        and every media id maps to a blob through a small JSON record
+        (``root/refs/ef/01/{id}.json``) holding the digest and size. A clip that is
+        downloaded again or reused across articles therefore shares one blob, and
+        an already complete download can be checked without fetching it again.
+
+        Args:
+            root (Union[str, Path]): Root directory, e.g. ``RAW_DIR/nhk_easy_web/voices``.
+            shard_depth (int, optional): Directory levels for blobs and refs.
+                Defaults to ``ProjectConfigs.RAW_SHARD_DEPTH``.
+        """
+        self.root = Path(root)
+        # 媒體檔本身已壓縮，不再另外壓縮
+        self._blobs = RawStorage(self.root.joinpath("blobs"), shard_depth, compression=None)
+        self._refs = RawStorage(self.root.joinpath("refs"), shard_depth, compression=None)
+
+    @staticmethod
+    def digest_of(path:Union[str,Path], chunk_size:int=1 << 20) -> str:
+        """SHA-256 of a file, read in chunks."""
+        hasher = sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def put(self,
+            media_id:str,
+            data:bytes,
+            suffix:str,
+            ) -> MediaBlob:
+        """Store ``data`` and point ``media_id`` at it, reusing an existing identical blob.
+
+        Args:
+            media_id (str): Voice / video id.
+            data (bytes): Media content.
+            suffix (str): File extension such as ``.mp3``.
+
+        Returns:
+            MediaBlob: The stored blob.
+        """
+        digest = sha256(data).hexdigest()
+        path = self._blobs.path_for(digest, suffix)
+        if not (path.exists() and path.stat().st_size == len(data)):
+            write_atomic(path, data)
+        ref = {"id": media_id,
+               "algorithm": "sha256",
+               "digest": digest,
+               "size": len(data),
+               "suffix": suffix,
+               }
+        write_atomic(self._refs.path_for(media_id, ".json"),
+                      json.dumps(ref, ensure_ascii=False).encode("utf-8"),
+                      )
+        return MediaBlob(digest=digest, size=len(data), path=path)
+
+    def get(self,
+            media_id:str,
+            verify:bool=False,
+            ) -> Optional[MediaBlob]:
+        """Return the blob of ``media_id`` if it is stored and complete.
+
+        Args:
+            media_id (str): Voice / video id.
+            verify (bool, optional): Re-hash the blob instead of only checking its size.
+                Defaults to False.
+
+        Returns:
+            Optional[MediaBlob]: The blob, or None if missing, truncated or corrupted.
+        """
+        ref_path = self._refs.locate(media_id, ".json")
+        if ref_path is None:
+            return None
+        with open(ref_path, "r", encoding="utf-8") as file:
+            ref = json.load(file)
+        path = self._blobs.path_for(ref["digest"], ref["suffix"])
+        if not path.exists() or path.stat().st_size != ref["size"]:
+            return None
+        if verify and self.digest_of(path) != ref["digest"]:
+            return None
+        return MediaBlob(digest=ref["digest"], size=ref["size"], path=path)
+
+    def migrate(self,
+                suffix:str,
+                dry_run:bool=False,
+                ) -> Dict[Path, Path]:
+        """Move media files saved by id (flat or sharded) into the store.
+
+        Args:
+            suffix (str): File extension such as ``.mp3``.
+            dry_run (bool, optional): Only list the files. Defaults to False.
+
+        Returns:
+            Dict[Path, Path]: Old path -> blob path (old path -> old path on dry runs).
+        """
+        moves = {}
+        for path in list(RawStorage(self.root, compression=None).iter_files(suffix)):
+            if self._blobs.root in path.parents:
+                continue
+            if dry_run:
+                moves[path] = path
+                continue
+            with open(path, "rb") as file:
+                blob = self.put(key_of(path, suffix), file.read(), suffix)
+            path.unlink()
+            moves[path] = blob.path
+        return moves
+
+# raw 存檔中的 (子目錄, 副檔名, 類型)：html 依設定壓縮，媒體檔放入 MediaStore
+RAW_LAYOUT = [("nhk_easy_web/contents", ".html", "html"),
+              ("nhk_easy_web/voices", ".mp3", "media"),
+              ("nhk_news/contents", ".html", "html"),
+              ("nhk_news/videos", ".mp4", "media"),
+              ]
+
+def migrate_raw_tree(raw_dir:Union[str,Path]=ProjectConfigs.RAW_DIR,
+                     dry_run:bool=False,
+                     shard_depth:int=ProjectConfigs.RAW_SHARD_DEPTH,
+                     compression:Optional[str]=ProjectConfigs.RAW_COMPRESSION,
+                     ) -> Dict[Path, Dict[Path, Path]]:
+    """Convert the whole raw archive (flat or partially migrated) to the given layout.
+
+    Set ``RAW_SHARD_DEPTH`` / ``RAW_COMPRESSION`` to the same layout afterwards, so the
+    crawlers keep writing in it.
+
+    Args:
+        raw_dir (Union[str, Path], optional): Root of the raw archive. Defaults to ``ProjectConfigs.RAW_DIR``.
+        dry_run (bool, optional): Only compute the moves. Defaults to False.
+        shard_depth (int, optional): Target directory levels.
+            Defaults to ``ProjectConfigs.RAW_SHARD_DEPTH``.
+        compression (Optional[str], optional): Target html compression, None, "gzip" or "zstd".
+            Defaults to ``ProjectConfigs.RAW_COMPRESSION``.
+
+    Returns:
+        Dict[Path, Dict[Path, Path]]: Directory -> (old path -> new path) of every moved file.
+    """
+    results = {}
+    for subdir, suffix, kind in RAW_LAYOUT:
+        root = Path(raw_dir).joinpath(subdir)
+        if not root.is_dir():
+            continue
+        storage = RawStorage(root, shard_depth, compression) if kind == "html" else MediaStore(root, shard_depth)
+        results[root] = storage.migrate(suffix, dry_run=dry_run)
+    return results
+
+def read_raw(path:Union[str,Path]) -> bytes:
+    """Read a stored raw file, transparently handling compression and the sharded layout.
+
+    ``path`` may point to the old flat location (as still recorded in the database); the
+    file is then looked up in its compressed variants and the sharded directories below
+    the same root.
+
+    Args:
+        path (Union[str, Path]): Recorded path of the file.
+
+    Returns:
+        bytes: Decompressed content.
+
+    Raises:
+        FileNotFoundError: If the file cannot be found in any layout.
+    """
+    path = Path(path)
+    if not path.exists():
+        name = split_name(path)
+        suffix = "".join(Path(name).suffixes[-1:])
+        located = RawStorage(path.parent, compression=None).locate(key_of(name, suffix), suffix)
+        if located is None:
+            raise FileNotFoundError(path)
+        path = located
+    with open(path, "rb") as file:
+        return decompress(file.read(), path)
@@ -0,0 +1,250 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  tracing.py
+@Time    :  2026/10/19 21:34:02
+@Author  :  Kevin Wang
+@Desc    :  Lightweight nested tracing spans aggregated into a per-run profile
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import (Callable,
+                    Dict,
+                    Iterator,
+                    List,
+                    Optional,
+                    Tuple,
+                    TypeVar,
+                    Union,
+                    )
+import json
+import re
+import threading
+
+from config import ProjectConfigs
+
+@dataclass
+class SpanStats:
+    """Aggregate of every span with the same path."""
+    count:int=0
+    total:float=0.0
+    self_time:float=0.0
+    max:float=0.0
+    bytes:int=0
+
+class Span:
+    """One running span, handed to the ``with`` block to attach byte counts."""
+    __slots__ = ("name", "path", "bytes", "child_time")
+
+    def __init__(self, name:str, path:Tuple[str, ...]) -> None:
+        self.name = name
+        self.path = path
+        self.bytes = 0
+        self.child_time = 0.0
+
+    def add_bytes(self, amount:int) -> None:
+        self.bytes += amount
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def add_bytes(self, amount:int) -> None:
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Profile:
+    def __init__(self, name:str) -> None:
+        """Spans recorded while a run is active, aggregated by their path.
+
+        Only the aggregate per path (``NHKEasyWebCrawler;easy.download_html;parse``) is kept, so memory
+        stays constant no matter how long the crawl runs.
+
+        Args:
+            name (str): Run name, used in the file names.
+        """
+        self.name = name
+        self.started_time = datetime.now()
+        self._start = perf_counter()
+        self.wall_seconds:Optional[float] = None
+        self._lock = threading.Lock()
+        self._stats:Dict[Tuple[str, ...], SpanStats] = {}
+
+    def record(self,
+               path:Tuple[str, ...],
+               duration:float,
+               self_time:float,
+               nbytes:int,
+               ) -> None:
+        with self._lock:
+            stats = self._stats.get(path)
+            if stats is None:
+                stats = self._stats[path] = SpanStats()
+            stats.count += 1
+            stats.total += duration
+            stats.self_time += self_time
+            stats.max = max(stats.max, duration)
+            stats.bytes += nbytes
+
+    def finish(self) -> None:
+        self.wall_seconds = perf_counter() - self._start
+
+    def stats(self) -> Dict[Tuple[str, ...], SpanStats]:
+        with self._lock:
+            return dict(self._stats)
+
+    def to_json_dict(self) -> dict:
+        """The profile with one entry per span path, slowest first."""
+        spans = [{"path": ";".join(path),
+                  "name": path[-1],
+                  "depth": len(path) - 1,
+                  "count": stats.count,
+                  "total_seconds": stats.total,
+                  "self_seconds": stats.self_time,
+                  "max_seconds": stats.max,
+                  "bytes": stats.bytes,
+                  }
+                 for path, stats in self.stats().items()]
+        spans.sort(key=lambda span: span["total_seconds"], reverse=True)
+        return {"name": self.name,
+                "started_time": self.started_time.isoformat(),
+                "wall_seconds": self.wall_seconds,
+                "spans": spans,
+                }
+
+    def collapsed(self) -> str:
+        """Self time per stack in microseconds, the folded format of flamegraph.pl and speedscope."""
+        return "".join(f"{';'.join(path)} {round(stats.self_time * 1e6)}\n"
+                       for path, stats in sorted(self.stats().items())
+                       if round(stats.self_time * 1e6) > 0)
+
+    def write(self, directory:Union[str, Path]) -> Tuple[Path, Path]:
+        """Write ``<name>-<time>.json`` and ``<name>-<time>.folded`` into ``directory``.
+
+        Returns:
+            Tuple[Path, Path]: The JSON profile and the collapsed stacks.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        safe_name = re.sub(r"[^\w.-]+", "_", self.name)
+        stem = f"{safe_name}-{self.started_time:%Y%m%d-%H%M%S-%f}"
+        json_path = directory.joinpath(f"{stem}.json")
+        json_path.write_text(json.dumps(self.to_json_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        folded_path = directory.joinpath(f"{stem}.folded")
+        folded_path.write_text(self.collapsed(), encoding="utf-8")
+        return json_path, folded_path
+
+# 進行中的 profile；沒有時 span() 幾乎零成本。同時進行多個 run 時，每個 profile 都會收到所有 span
+_profiles:Tuple[Profile, ...] = ()
+_profiles_lock = threading.Lock()
+_local = threading.local()
+
+def _stack() -> List[Span]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+@contextmanager
+def span(name:str) -> Iterator[Union[Span, _NoopSpan]]:
+    """Time a stage, nested under the span already open in this thread.
+
+    Example:
+        with span("hls.segment") as traced:
+            content = download()
+            traced.add_bytes(len(content))
+
+    Args:
+        name (str): Stage name, keep it low-cardinality (no ids or URLs).
+
+    Yields:
+        Union[Span, _NoopSpan]: The span, or a no-op stand-in while no profile is active.
+    """
+    profiles = _profiles
+    if not profiles:
+        yield NOOP_SPAN
+        return
+    stack = _stack()
+    current = Span(name, (stack[-1].path if stack else ()) + (name,))
+    stack.append(current)
+    start = perf_counter()
+    try:
+        yield current
+    finally:
+        duration = perf_counter() - start
+        # generator 內的 span 可能在其他 span 之後才結束，不一定在堆疊頂端
+        if stack and stack[-1] is current:
+            stack.pop()
+        elif current in stack:
+            stack.remove(current)
+        if stack:
+            stack[-1].child_time += duration
+        for profile in profiles:
+            profile.record(current.path, duration, max(0.0, duration - current.child_time), current.bytes)
+
+T = TypeVar("T")
+
+def propagate(func:Callable[..., T]) -> Callable[..., T]:
+    """Wrap ``func`` so the spans it opens in another thread nest under the span open here.
+
+    Example:
+        with span("hls.download"), ThreadPoolExecutor() as executor:
+            contents = list(executor.map(propagate(fetch), segments))  # hls.download;hls.segment
+
+    Args:
+        func (Callable[..., T]): Function to run in a worker thread.
+
+    Returns:
+        Callable[..., T]: The wrapped function.
+    """
+    stack = _stack()
+    path = stack[-1].path if stack else ()
+    if not path:
+        return func
+
+    def run(*args, **kwargs) -> T:
+        # 不記錄的替身 span，只提供路徑；子 span 的時間不會從原本 span 的 self time 扣除
+        parent = Span(path[-1], path)
+        worker_stack = _stack()
+        worker_stack.append(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if parent in worker_stack:
+                worker_stack.remove(parent)
+    return run
+
+@contextmanager
+def profile_run(name:str,
+                directory:Optional[Union[str, Path]]=None,
+                ) -> Iterator[Optional[Profile]]:
+    """Collect the spans of one run under a root span and write the profile at the end.
+
+    Args:
+        name (str): Run name, also the root span, e.g. ``NHKEasyWebCrawler``.
+        directory (Optional[Union[str, Path]], optional): Output directory. Defaults to
+            ``ProjectConfigs.TRACE_DIR``; when that is unset too, tracing stays off.
+
+    Yields:
+        Optional[Profile]: The profile being collected, None when tracing is off.
+    """
+    global _profiles  # pylint: disable=global-statement
+    directory = directory or ProjectConfigs.TRACE_DIR
+    if not directory:
+        yield None
+        return
+    profile = Profile(name)
+    with _profiles_lock:
+        _profiles = _profiles + (profile,)
+    try:
+        with span(name):
+            yield profile
+    finally:
+        with _profiles_lock:
+            _profiles = tuple(other for other in _profiles if other is not profile)
+        profile.finish()
+        json_path, folded_path = profile.write(directory)
+        print(f"Profile written to {json_path} and {folded_path}")
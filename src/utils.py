@@ -6,24 +6,53 @@
 @Desc    :  None
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
-from time import (sleep,
+from time import (perf_counter,
+                  sleep,
                   time,
                   )
 from typing import (List,
+                    Optional,
                     Union,
                     )
-from urllib.parse import urljoin
+from urllib.parse import (urljoin,
+                          urlsplit,
+                          )
 import json
 
 from Crypto.Cipher import AES
 import m3u8
 import requests
 
+from budget import (download_slot,
+                    get_bandwidth_limiter,
+                    get_host_concurrency,
+                    get_host_limiter,
+                    get_session,
+                    )
+from cache import get_http_cache
+from config import ProjectConfigs
+from metrics import (DOWNLOADED_BYTES,
+                     HLS_DOWNLOAD_SECONDS,
+                     HLS_SEGMENTS,
+                     HTTP_CACHE_RESULTS,
+                     HTTP_REQUEST_SECONDS,
+                     HTTP_RETRIES,
+                     )
+from storage import MediaStore
+from tracing import (propagate,
+                     span,
+                     )
+
+def _pause(seconds:float) -> None:
+    """Sleep between requests, traced so throttling shows up in the profile."""
+    with span("http.lapse"):
+        sleep(seconds)
 
 class MyRequests:
-    def __init__(self) -> None:
+    def __init__(self, use_cache:bool=True, session:Optional[requests.Session]=None) -> None:
         """
         A custom requests wrapper to handle HTTP requests with enhanced retry and session management.
 
@@ -31,16 +60,30 @@ class MyRequests:
         retry mechanisms, session tracking, and customizable headers. It helps manage 
         connection issues and provides detailed tracking of request information.
 
+        Args:
+            use_cache (bool, optional): Serve GET requests through the disk cache configured by
+                ``HTTP_CACHE_DIR`` (no effect when it is unset). Defaults to True.
+            session (Optional[requests.Session], optional): Session to send requests with.
+                Defaults to the process-wide session of ``budget.get_session``, whose connection
+                pool is shared by every crawler.
+
         Attributes:
             _session (requests.Session): A persistent session for making HTTP requests.
+            _limiter (HostRateLimiter): Per-host rate limit shared by every crawler.
+            _concurrency (HostConcurrency): Adaptive per-host concurrency shared by every crawler.
             _headers (dict): Default headers used in requests.
             _html_parser (str): Default HTML parser used for parsing responses.
             _last_url (str): URL of the most recent request.
             _last_header (dict): Headers used in the most recent request.
             _last_params (dict): Parameters used in the most recent request.
             _last_response (requests.Response): Response of the most recent request.
+            _cache (Optional[HTTPDiskCache]): Disk cache for GET requests, None when disabled.
         """
-        self._session = requests.Session()
+        # 共用的 session 已掛上連線池（CASSETTE_MODE 開啟時為錄製／回放的 adapter）
+        self._session = get_session() if session is None else session
+        self._limiter = get_host_limiter()
+        self._concurrency = get_host_concurrency()
+        self._cache = get_http_cache() if use_cache else None
         self._headers = {'Content-Type': 'application/x-www-form-urlencoded',
                         'Accept-Encoding': 'gzip, deflate, br',
                         'User-Agent': 'PostmanRuntime/7.28.4'}
@@ -89,9 +132,10 @@ class MyRequests:
     def request(self,
                 method,
                 url,
-                lapse=0.1,
+                lapse=None,
                 max_retry=100,
                 timeout=90,
+                verbose=True,
                 **kwargs
                 ) -> requests.Response:
         """
@@ -103,9 +147,11 @@ class MyRequests:
         Args:
             method (str): HTTP method (GET, POST, etc.).
             url (str): The URL to send the request to.
-            lapse (float, optional): Time to wait between retries. Defaults to 0.1 seconds.
+            lapse (float, optional): Time to wait after a request and between retries.
+                Defaults to ``ProjectConfigs.REQUEST_LAPSE`` (0.1 seconds).
             max_retry (int, optional): Maximum number of retry attempts. Defaults to 100.
             timeout (int, optional): Request timeout in seconds. Defaults to 90 seconds.
+            verbose (bool, optional): Print the URL of every answered request. Defaults to True.
             **kwargs: Additional arguments to pass to requests.Session.request.
 
         Returns:
@@ -113,34 +159,101 @@ class MyRequests:
 
         Raises:
             TimeoutError: If no response is received after maximum retries.
-        """
+
+        Note:
+            With the disk cache enabled, a GET request is answered from the cache while the
+            stored response is fresh, and otherwise revalidated with a conditional request; a
+            304 answer returns the stored 200 response.
+        """
+        lapse = ProjectConfigs.REQUEST_LAPSE if lapse is None else lapse
+        cache = self._cache if method.upper() == "GET" else None
+        if cache is None:
+            return self._send(method, url, self.headers, lapse, max_retry, timeout, verbose, **kwargs)
+
+        host = urlsplit(url).netloc
+        full_url = requests.Request(method, url, params=kwargs.get("params")).prepare().url
+        entry = cache.lookup(full_url)
+        if entry is not None and cache.is_fresh(entry):
+            cached = cache.response(entry, full_url)
+            if cached is not None:
+                HTTP_CACHE_RESULTS.labels(host=host, result="hit").inc()
+                if verbose:
+                    print(f"{full_url} (cached)")
+                self._last_url = url
+                self._last_params = kwargs.get("params")
+                self._last_response = cached
+                return self._last_response
+            # 其他執行緒在查詢後淘汰了這筆快取
+            entry = None
+
+        headers = dict(self.headers, **cache.conditional_headers(entry)) if entry is not None else self.headers
+        response = self._send(method, url, headers, lapse, max_retry, timeout, verbose, **kwargs)
+        if entry is not None and response.status_code == 304:
+            cached = cache.revalidated(entry, response, full_url)
+            if cached is not None:
+                HTTP_CACHE_RESULTS.labels(host=host, result="revalidated").inc()
+                self._last_response = cached
+                return cached
+            # 304 回來時本體已被淘汰，改送不帶驗證資訊的請求
+            response = self._send(method, url, self.headers, lapse, max_retry, timeout, verbose, **kwargs)
+        HTTP_CACHE_RESULTS.labels(host=host, result="miss").inc()
+        cache.store(full_url, response)
+        return response
+
+    def _send(self,
+              method,
+              url,
+              headers,
+              lapse,
+              max_retry,
+              timeout,
+              verbose,
+              **kwargs
+              ) -> requests.Response:
+        """Send the request over the network, retrying timeouts and connection errors."""
         retry = 0
+        host = urlsplit(url).netloc
         while True:
+            self._limiter.wait(host)
+            start = perf_counter()
             try:
                 self._last_url = url
                 self._last_params = kwargs.get("params")
-                response = self._session.request(method,
-                                                 url,
-                                                 headers=self.headers,
-                                                 timeout=timeout,
-                                                 **kwargs
-                                                 )
+                # 每個 host 的同時請求數依延遲與錯誤自動調整，逾時與連線錯誤也會回報給控制器
+                with self._concurrency.slot(host) as outcome, span("http.request") as traced:
+                    start = perf_counter()
+                    response = self._session.request(method,
+                                                     url,
+                                                     headers=headers,
+                                                     timeout=timeout,
+                                                     **kwargs
+                                                     )
+                    outcome.failed = response.status_code == 429 or response.status_code >= 500
+                    traced.add_bytes(len(response.content))
                 self._last_response = response
-                print(response.url)
-                sleep(lapse)
+                HTTP_REQUEST_SECONDS.labels(host=host, method=method, status=response.status_code)\
+                                    .observe(perf_counter() - start)
+                DOWNLOADED_BYTES.labels(host=host).inc(len(response.content))
+                if verbose:
+                    print(response.url)
+                _pause(lapse)
                 break
             except requests.exceptions.ReadTimeout:
+                HTTP_REQUEST_SECONDS.labels(host=host, method=method, status="timeout").observe(perf_counter() - start)
+                HTTP_RETRIES.labels(host=host, reason="timeout").inc()
                 print('Read timed out. retry...')
                 retry = retry + 1
-                sleep(lapse)
+                _pause(lapse)
             except requests.exceptions.ConnectionError:
+                HTTP_REQUEST_SECONDS.labels(host=host, method=method, status="error").observe(perf_counter() - start)
+                HTTP_RETRIES.labels(host=host, reason="connection").inc()
                 print('Read timed out. retry...')
                 retry = retry + 1
-                sleep(lapse)
+                _pause(lapse)
             # except Exception as err:
             #     print(f'Unknown error {err}')
             #     retry = retry + 1
-            #     sleep(lapse)
+            #     _pause(lapse)
             if retry >= max_retry:
                 raise TimeoutError('No response, check your internet.')
         return response
@@ -153,7 +266,8 @@ class HLSMediaDownloader:
             HLS 將視頻內容 分割成數個較小的段落，每個段落都通過 HTTP 協議以 TS (運輸流格式) 文件形式傳輸，利用 M3U8 播放列表來管理這些
             TS 文件的索引。本類別的目的是從指定的 M3U8 播放列表 URL 中抓取所有 TS 文件連結，下載這些文件，並最終合併成一個單一的多媒體文件。
         """
-        self._requestor = MyRequests()
+        # 媒體檔已存於 content-addressed 的 MediaStore，不再經過 HTTP 快取
+        self._requestor = MyRequests(use_cache=False)
 
     def fetch_playlist(self,
                        m3u8_url:str,
@@ -174,16 +288,20 @@ class HLSMediaDownloader:
               until only non-variant playlists remain.
         """
 
+        def load(url:str) -> m3u8.M3U8:
+            # 經由 MyRequests 取得，才會有重試與指標
+            return m3u8.loads(self._requestor.request("GET", url).text, uri=url)
+
         def get_m3u8s(obj:m3u8.M3U8):
             playlists = []
             if obj.is_variant:
                 for playlist in obj.playlists:
-                    sub_playlist = m3u8.load(playlist.base_uri + playlist.uri)
+                    sub_playlist = load(playlist.base_uri + playlist.uri)
                     playlists += get_m3u8s(sub_playlist)
                 return playlists
             return [obj]
 
-        playlist = m3u8.load(m3u8_url)
+        playlist = load(m3u8_url)
         playlists = get_m3u8s(playlist)
         return playlists
 
@@ -210,7 +328,8 @@ class HLSMediaDownloader:
         if len(playlist.keys) > 0:
             key:m3u8.Key = playlist.keys[0]
             key_url = urljoin(key.base_uri, key.uri)
-            key_response = self._requestor.request("GET", key_url)
+            with span("hls.key"):
+                key_response = self._requestor.request("GET", key_url)
             aes_key = key_response.content
 
             # If IV is explicitly given, parse it as a hex string.
@@ -222,11 +341,24 @@ class HLSMediaDownloader:
         # `#EXT-X-MEDIA-SEQUENCE` sets the sequence number of the first segment.
         # If not present, default to 0.
         sequence_number = playlist.media_sequence or 0
-        for idx, segment in enumerate(playlist.segments):
-            ts_url = urljoin(segment.base_uri, segment.uri)
-            response = self._requestor.request("GET", ts_url)
-            segment_content = response.content
 
+        def fetch(segment:m3u8.Segment) -> bytes:
+            ts_url = urljoin(segment.base_uri, segment.uri)
+            with span("hls.segment") as traced:
+                # 片段數量多，不逐一印出網址
+                response = self._requestor.request("GET", ts_url, verbose=False)
+                traced.add_bytes(len(response.content))
+            HLS_SEGMENTS.inc()
+            # 所有影音下載合計的頻寬上限（MEDIA_BANDWIDTH_LIMIT）
+            get_bandwidth_limiter().consume(len(response.content))
+            return response.content
+
+        # 片段平行下載，實際的同時請求數由 MyRequests 依 host 的延遲與錯誤調整；map 依原順序交回
+        workers = max(1, min(ProjectConfigs.HLS_SEGMENT_WORKERS, len(playlist.segments)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hls-segment") as executor:
+            segments = list(executor.map(propagate(fetch), playlist.segments))
+
+        for idx, segment_content in enumerate(segments):
             if aes_key:
                 # Derive IV if not explicitly set
                 if iv_explicit is not None:
@@ -239,7 +371,9 @@ class HLSMediaDownloader:
                     iv_int = sequence_number + idx
                     iv = iv_int.to_bytes(16, byteorder='big')
 
-                segment_content = self.decrypt_segment(segment_content, aes_key, iv=iv)
+                with span("hls.decrypt") as traced:
+                    traced.add_bytes(len(segment_content))
+                    segment_content = self.decrypt_segment(segment_content, aes_key, iv=iv)
 
             combined_segments += segment_content
         return combined_segments
@@ -262,30 +396,55 @@ class HLSMediaDownloader:
     def save(self,
              m3u8_url:str,
              filename:Union[str,Path],
-             ) -> None:
+             store:Optional[MediaStore]=None,
+             ) -> Path:
         """Download and save media from an M3U8 playlist.
 
-        Fetches playlist, downloads segments, and saves to file.
+        Fetches playlist, downloads segments, and saves to file. With a ``store``, the media
+        is written into the content-addressed store instead, and the download is skipped
+        entirely if the store already holds a complete copy of the id.
 
         Args:
             m3u8_url (str): URL of the M3U8 playlist
-            filename (Union[str, Path]): Output file path
+            filename (Union[str, Path]): Output file path, or the file name (id + extension,
+                e.g. ``k10014405081000.mp3``) inside ``store``
+            store (Optional[MediaStore], optional): Content-addressed store to save into.
+                Defaults to None.
+
+        Returns:
+            Path: Where the media is stored
 
         Raises:
             ValueError: If no playlists are found
         """
-        playlists = self.fetch_playlist(m3u8_url)
-        if len(playlists) == 0:
-            raise ValueError("No audio download")
-
-        combined_segments = b""
-        for playlist in playlists:
-            combined_segments += self.download_m3u8(playlist)
-
-        Path(filename).parent.mkdir(parents=True, exist_ok=True)
-        with open(filename, "wb") as file:
-            file.write(combined_segments)
+        if store is not None:
+            media_id, suffix = Path(filename).stem, Path(filename).suffix
+            blob = store.get(media_id)
+            if blob is not None:
+                print(f"{media_id} already stored at {blob.path}, skipped")
+                return blob.path
+
+        # 所有爬蟲共用同時下載的上限，避免兩個來源同時下載影音時占滿頻寬
+        with download_slot(), HLS_DOWNLOAD_SECONDS.time(), span("hls.download"):
+            with span("hls.playlist"):
+                playlists = self.fetch_playlist(m3u8_url)
+            if len(playlists) == 0:
+                raise ValueError("No audio download")
+
+            combined_segments = b""
+            for playlist in playlists:
+                combined_segments += self.download_m3u8(playlist)
+
+        with span("hls.write") as traced:
+            traced.add_bytes(len(combined_segments))
+            if store is not None:
+                filename = store.put(media_id, combined_segments, suffix).path
+            else:
+                Path(filename).parent.mkdir(parents=True, exist_ok=True)
+                with open(filename, "wb") as file:
+                    file.write(combined_segments)
         print(f"All TS files have been merged into {filename}")
+        return Path(filename)
 
 class NHKEasyNewsClient:
     def __init__(self):
@@ -355,14 +514,15 @@ class NHKEasyNewsClient:
         Returns:
             requests.Response: A response containing the news list in JSON format.
         """
-        url = "https://www3.nhk.or.jp/news/easy/news-list.json"
+        url = f"{ProjectConfigs.NHK_WEB_BASE_URL}/news/easy/news-list.json"
         params = {"_": int(time()*1000),  # Unix time up to milliseconds (這像參數貌似不影響回傳結果)
                   }
-        response = self.crawler.request(method="GET",
-                                        url=url,
-                                        params=params,
-                                        )  # response 回傳長度為 1 的 List
-        return json.loads(response.text)[0]
+        with span("easy.news_list"):
+            response = self.crawler.request(method="GET",
+                                            url=url,
+                                            params=params,
+                                            )  # response 回傳長度為 1 的 List
+            return json.loads(response.text)[0]
 
     def get_content(self,
                     id:str,
@@ -376,7 +536,7 @@ class NHKEasyNewsClient:
         Returns:
             requests.Response: A response containing the HTML content of the article.
         """
-        url = f"https://www3.nhk.or.jp/news/easy/{id}/{id}.html"
+        url = f"{ProjectConfigs.NHK_WEB_BASE_URL}/news/easy/{id}/{id}.html"
         response = self.crawler.request(method="GET",
                                         url=url,
                                         )
@@ -397,8 +557,8 @@ class NHKEasyNewsClient:
         Raises:
             ValueError: If an invalid audio format is specified.
         """
-        candidate_urls = [f"https://vod-stream.nhk.jp/news/easy_audio/{uri}/index.m3u8",  # m4a type
-                          f"https://vod-stream.nhk.jp/news/easy/{uri}/index.m3u8",  # mp4 type
+        candidate_urls = [f"{ProjectConfigs.NHK_VOD_BASE_URL}/news/easy_audio/{uri}/index.m3u8",  # m4a type
+                          f"{ProjectConfigs.NHK_VOD_BASE_URL}/news/easy/{uri}/index.m3u8",  # mp4 type
                           ]
 
         for url in candidate_urls:
@@ -480,15 +640,15 @@ class NHKNewsClient:
         """
         data = {}
         for sheet in range(1, 1000):
-            url = f"https://www3.nhk.or.jp/news/json16/cat{news_type.value:02d}_{sheet:03d}.json"
+            url = f"{ProjectConfigs.NHK_WEB_BASE_URL}/news/json16/cat{news_type.value:02d}_{sheet:03d}.json"
             params = {"_": int(time()),  # Unix time (這像參數貌似不影響回傳結果)
                       }
-            response = self.crawler.request(method="GET",
-                                            url=url,
-                                            params=params,
-                                            )
-
-            current_data = json.loads(response.text)
+            with span("news.summary_sheet"):
+                response = self.crawler.request(method="GET",
+                                                url=url,
+                                                params=params,
+                                                )
+                current_data = json.loads(response.text)
             if not data:
                 data = current_data
             elif (("channel" in current_data)
@@ -515,7 +675,7 @@ class NHKNewsClient:
         Returns:
             requests.Response: A response containing the HTML content of the article.
         """
-        url = f"https://www3.nhk.or.jp/news/html/{date}/{id}.html"
+        url = f"{ProjectConfigs.NHK_WEB_BASE_URL}/news/html/{date}/{id}.html"
         response = self.crawler.request(method="GET",
                                         url=url,
                                         )
@@ -533,7 +693,7 @@ class NHKNewsClient:
         Returns:
             requests.Response: A response containing the MP4 voice recording's M3U8 playlist.
         """
-        url = f"https://vod-stream.nhk.jp/news/{uri}/index.m3u8"
+        url = f"{ProjectConfigs.NHK_VOD_BASE_URL}/news/{uri}/index.m3u8"
         response = self.crawler.request(method="GET",
                                         url=url,
                                         )
@@ -0,0 +1,134 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_cache.py
+@Time    :  2026/10/19 19:02:11
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+import time
+
+import pytest
+import requests
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.cache import (HTTPDiskCache,
+                       TTLCache,
+                       )
+from src.utils import (MyRequests,
+                       ProjectConfigs,
+                       )
+
+class TestTTLCache:
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
+
+    def test_expire(self):
+        cache = TTLCache(ttl=0.05)
+        assert cache.get_or_set("a", lambda: 1) == 1
+        assert cache.get_or_set("a", lambda: 2) == 1
+        time.sleep(0.06)
+        assert cache.get_or_set("a", lambda: 2) == 2
+
+    def test_disabled(self):
+        cache = TTLCache(ttl=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+def make_response(url:str, body:bytes, etag:str=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers["Content-Type"] = "text/html"
+    if etag:
+        response.headers["ETag"] = etag
+    response._content = body
+    return response
+
+class TestHTTPDiskCache:
+    @pytest.fixture
+    def server(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(ProjectConfigs, "HTTP_CACHE_DIR", tmp_path / "http")
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        with FakeNHKServer(easy_news=3) as server:
+            yield server
+
+    def test_revalidate_with_304(self, server, monkeypatch):
+        monkeypatch.setattr(ProjectConfigs, "HTTP_CACHE_TTL", 0)
+        url = f"{server.url}/news/easy/news-list.json"
+        first = MyRequests().request("GET", url, params={"_": 1})
+        second = MyRequests().request("GET", url, params={"_": 2})
+
+        assert server.not_modified == 1
+        assert second.status_code == 200
+        assert second.json() == first.json()
+
+    def test_evicted_during_revalidation(self, server, monkeypatch):
+        monkeypatch.setattr(ProjectConfigs, "HTTP_CACHE_TTL", 0)
+        url = f"{server.url}/news/easy/news-list.json"
+        first = MyRequests().request("GET", url, params={"_": 1})
+        # MyRequests 使用的快取類別（src 內以模組名稱 cache 匯入）
+        cache_class = type(MyRequests()._cache)
+        lookup = cache_class.lookup
+
+        def lookup_then_evict(cache, full_url):
+            entry = lookup(cache, full_url)
+            # 其他執行緒在查詢與 304 之間淘汰了這筆快取
+            cache.clear()
+            return entry
+
+        monkeypatch.setattr(cache_class, "lookup", lookup_then_evict)
+        second = MyRequests().request("GET", url, params={"_": 2})
+
+        assert server.not_modified == 1
+        assert second.status_code == 200
+        assert second.json() == first.json()
+        monkeypatch.setattr(cache_class, "lookup", lookup)
+        assert MyRequests()._cache.lookup(second.url) is not None
+
+    def test_write_without_body(self, tmp_path):
+        cache = HTTPDiskCache(tmp_path, compression=None)
+        url = "https://example.com/a"
+        cache.store(url, make_response(url, b"a", etag='"v1"'))
+        entry = cache.lookup(url)
+        cache.clear()
+        not_modified = make_response(url, b"", etag='"v1"')
+        not_modified.status_code = 304
+
+        assert cache.revalidated(entry, not_modified, url) is None
+        cache._write(entry["digest"], not_modified, None)
+        assert cache.lookup(url) is None
+        assert len(cache) == 0
+
+    def test_fresh_entry_skips_network(self, server, monkeypatch):
+        monkeypatch.setattr(ProjectConfigs, "HTTP_CACHE_TTL", 60)
+        url = f"{server.url}/news/easy/news-list.json"
+        MyRequests().request("GET", url, params={"_": 1})
+        requests_sent = server.requests
+        assert MyRequests().request("GET", url, params={"_": 2}).status_code == 200
+        assert server.requests == requests_sent
+
+    def test_lru_eviction(self, tmp_path):
+        cache = HTTPDiskCache(tmp_path, max_bytes=2500, compression=None)
+        for name in ("a", "b"):
+            cache.store(f"https://example.com/{name}", make_response(f"https://example.com/{name}", b"x" * 1000))
+        entry = cache.lookup("https://example.com/a")
+        assert cache.response(entry, "https://example.com/a").content == b"x" * 1000
+        cache.store("https://example.com/c", make_response("https://example.com/c", b"y" * 1000))
+
+        assert cache.lookup("https://example.com/b") is None
+        assert cache.lookup("https://example.com/a") is not None
+        assert len(cache) == 2
+        # 重新載入時由磁碟重建索引
+        assert len(HTTPDiskCache(tmp_path, compression=None)) == 2
+
+    def test_conditional_headers(self, tmp_path):
+        cache = HTTPDiskCache(tmp_path)
+        cache.store("https://example.com/a?_=1", make_response("https://example.com/a", b"a", etag='"v1"'))
+        entry = cache.lookup("https://example.com/a?_=2")
+        assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"'}
@@ -0,0 +1,72 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_cassette.py
+@Time    :  2026/10/19 21:10:36
+@Author  :  Kevin Wang
+@Desc    :  以假 NHK 伺服器錄製流量後離線回放
+"""
+import pytest
+import requests
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.cassette import (CassetteAdapter,
+                          CassetteMiss,
+                          CassetteStore,
+                          request_key,
+                          )
+from src.crawler import NHKEasyWebCrawler
+from src.utils import ProjectConfigs
+
+def session_with(adapter:CassetteAdapter) -> requests.Session:
+    session = requests.Session()
+    session.mount("http://", adapter)
+    return session
+
+def test_request_key_ignores_cache_buster():
+    assert request_key("get", "https://a/b.json?_=1&x=2") == request_key("GET", "https://a/b.json?x=2&_=999")
+    assert request_key("GET", "https://a/b.json?x=2") != request_key("GET", "https://a/b.json?x=3")
+    assert request_key("POST", "https://a/b", b"1") != request_key("POST", "https://a/b", b"2")
+
+def test_record_and_replay(tmp_path):
+    store = CassetteStore(tmp_path)
+    with FakeNHKServer() as server:
+        url = f"{server.url}/news/easy/news-list.json"
+        recorded = session_with(CassetteAdapter(store, mode="record")).get(url, params={"_": 1})
+        session_with(CassetteAdapter(store, mode="record")).get(url, params={"_": 2})
+        session_with(CassetteAdapter(store, mode="record")).get(f"{server.url}/missing")
+
+    # 伺服器已關閉，回應全部來自 cassette，重複的 body 只存一份
+    session = session_with(CassetteAdapter(store, mode="replay"))
+    replayed = session.get(url, params={"_": 3})
+    assert replayed.status_code == 200
+    assert replayed.json() == recorded.json()
+    assert replayed.headers["Content-Type"] == "application/json"
+    assert session.get(f"{server.url}/missing").status_code == 404
+    assert len(list(store.bodies.iter_files(".body"))) == 2
+    with pytest.raises(CassetteMiss):
+        session.get(f"{server.url}/never-recorded")
+
+def test_replay_reproduces_errors(tmp_path):
+    store = CassetteStore(tmp_path)
+    with FakeNHKServer(error_rate=1.0) as server:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session_with(CassetteAdapter(store, mode="record")).get(f"{server.url}/news/easy/news-list.json")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session_with(CassetteAdapter(store, mode="replay")).get(f"{server.url}/news/easy/news-list.json")
+
+def test_crawler_offline_replay(tmp_path, monkeypatch):
+    monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+    monkeypatch.setattr(ProjectConfigs, "CASSETTE_DIR", tmp_path / "cassette")
+    with FakeNHKServer(easy_news=3, segments=2, segment_size=1024, error_rate=0.2, seed=3) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "CASSETTE_MODE", "record")
+        recorded = list(NHKEasyWebCrawler().iter_recent_news(save_dir=tmp_path / "recorded"))
+
+    monkeypatch.setattr(ProjectConfigs, "CASSETTE_MODE", "replay")
+    replayed = list(NHKEasyWebCrawler().iter_recent_news(save_dir=tmp_path / "replayed"))
+
+    assert [news.html_content.article for news in replayed] == [news.html_content.article for news in recorded]
+    assert ([news.media.filepath.read_bytes() for news in replayed]
+            == [news.media.filepath.read_bytes() for news in recorded])
@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_concurrency.py
+@Time    :  2026/10/20 02:03:58
+@Author  :  Kevin Wang
+@Desc    :  依延遲與錯誤自動調整每個 host 同時請求數的 AIMD 控制器
+"""
+from time import sleep
+import threading
+
+import pytest
+
+from src.budget import (AIMDLimit,
+                        HostConcurrency,
+                        HostRateLimiter,
+                        get_host_limiter,
+                        )
+from src.utils import ProjectConfigs
+
+def run_round(limit:AIMDLimit, latency:float=0.01, failed:bool=False) -> None:
+    """同時送出 limit 個請求（占滿所有 slot）後全部完成"""
+    slots = int(limit.limit)
+    for _ in range(slots):
+        limit.acquire()
+    for _ in range(slots):
+        limit.release(latency, failed)
+
+def test_increases_while_saturated_and_healthy():
+    limit = AIMDLimit("a.example", initial=2, maximum=6)
+    history = []
+    for _ in range(30):
+        run_round(limit)
+        history.append(limit.limit)
+    assert history == sorted(history)
+    assert history[-1] == 6
+
+def test_no_increase_without_demand():
+    limit = AIMDLimit("a.example", initial=4, maximum=16)
+    for _ in range(20):
+        limit.acquire()
+        limit.release(0.01, failed=False)
+    assert limit.limit == 4
+
+def test_failures_back_off_once_per_round():
+    limit = AIMDLimit("a.example", initial=8, maximum=16)
+    run_round(limit, latency=0.02)  # 建立延遲基準
+    before = limit.limit
+    run_round(limit, latency=0.02, failed=True)
+    assert limit.limit == before / 2
+    sleep(0.05)
+    run_round(limit, latency=0.02, failed=True)
+    assert limit.limit == before / 4
+    for _ in range(5):
+        sleep(0.05)
+        run_round(limit, latency=0.02, failed=True)
+    assert limit.limit == 1
+
+def test_latency_degradation_backs_off():
+    limit = AIMDLimit("a.example", initial=4, maximum=16, latency_floor=0.05)
+    run_round(limit, latency=0.1)
+    before = limit.limit
+    limit.acquire()
+    limit.release(0.5, failed=False)  # 超過基準的 2 倍
+    assert limit.limit == before / 2
+    assert limit.in_flight == 0
+
+def test_acquire_blocks_at_limit():
+    limit = AIMDLimit("a.example", initial=1, maximum=1)
+    limit.acquire()
+    acquired = threading.Event()
+
+    def second():
+        limit.acquire()
+        acquired.set()
+        limit.release(0.01, failed=False)
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limit.release(0.01, failed=False)
+    assert acquired.wait(5)
+    thread.join()
+
+def test_slot_reports_exceptions():
+    concurrency = HostConcurrency(initial=4, maximum=16)
+    with concurrency.slot("a.example") as outcome:
+        outcome.failed = False
+    with pytest.raises(TimeoutError):
+        with concurrency.slot("a.example"):
+            raise TimeoutError
+    assert concurrency.limit_for("a.example").limit == 2
+    assert concurrency.limit_for("b.example").limit == 4  # 其他 host 不受影響
+
+    disabled = HostConcurrency(initial=4, maximum=0)
+    with disabled.slot("a.example"):
+        pass
+
+def test_segment_host_only_throttled_by_window(monkeypatch):
+    limiter = HostRateLimiter(rate=1, exempt=["vod.example"])
+    assert limiter.wait("www.example") == 0
+    assert limiter.wait("www.example") > 0.5
+    assert limiter.wait("vod.example") == limiter.wait("vod.example") == 0
+
+    monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", "https://vod.example")
+    assert get_host_limiter().exempt == {"vod.example"}
+    # 關閉同時請求數控制時，影音 host 仍受每秒請求數限制
+    monkeypatch.setattr(ProjectConfigs, "HOST_CONCURRENCY_MAX", 0)
+    assert get_host_limiter().exempt == set()
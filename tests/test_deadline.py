@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_deadline.py
+@Time    :  2026/10/20 01:36:20
+@Author  :  Kevin Wang
+@Desc    :  最新與尚未儲存的新聞優先、到期時留下可接續的 remainder
+"""
+from datetime import (datetime,
+                      timedelta,
+                      )
+import json
+
+import pytest
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.crawler import (REMAINDER_FILE,
+                         NHKEasyWebCrawler,
+                         NHKWebCrawler,
+                         )
+from src.utils import ProjectConfigs
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeNHKServer(easy_news=3, news_per_category=2, segments=1, segment_size=1024) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        yield server
+
+def test_newest_first(server, tmp_path):
+    easy = list(NHKEasyWebCrawler().iter_recent_news(save_dir=tmp_path / "easy"))
+    assert [news.publication_time for news in easy] == sorted((news.publication_time for news in easy), reverse=True)
+    news = list(NHKWebCrawler().iter_recent_news(save_dir=tmp_path / "news"))
+    assert [item.publication_time for item in news] == sorted((item.publication_time for item in news), reverse=True)
+
+def test_new_articles_before_revisions(server, tmp_path):
+    stored = {item.html_content.id: item.html_content.modified_time
+              for item in NHKWebCrawler().iter_recent_news(save_dir=tmp_path)}
+    oldest = min(stored, key=stored.get)
+    server.revise(oldest)
+    del stored["k100105000011000"]
+    refreshed = NHKWebCrawler().iter_recent_news(save_dir=tmp_path,
+                                                 stored_times=lambda ids: {news_id: stored[news_id]
+                                                                           for news_id in ids if news_id in stored},
+                                                 )
+    assert [item.html_content.id for item in refreshed] == ["k100105000011000", oldest]
+
+def test_deadline_leaves_resumable_remainder(server, tmp_path):
+    save_dir = tmp_path / "easy"
+    before = server.requests
+    assert list(NHKEasyWebCrawler().iter_recent_news(save_dir=save_dir, deadline=datetime.now())) == []
+    assert server.requests - before == 1  # 只有列表
+    with open(save_dir / REMAINDER_FILE, "r", encoding="utf-8") as file:
+        remainder = json.load(file)
+    assert len(remainder) == 3
+
+    # 下一次執行即使日期範圍內沒有新聞，也會接續處理 remainder
+    long_ago = datetime.now() - timedelta(days=300)
+    resumed = list(NHKEasyWebCrawler().iter_recent_news(start_date=long_ago, end_date=long_ago, save_dir=save_dir))
+    assert [news.html_content.id for news in resumed] == [news["news_id"] for news in remainder]
+    assert not (save_dir / REMAINDER_FILE).exists()
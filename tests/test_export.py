@@ -0,0 +1,361 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_export.py
+@Time    :  2026/10/19 14:02:37
+@Author  :  Kevin Wang
+@Desc    :  資料庫相關測試需要 .env 中設定的 PostgreSQL，連不上時略過
+"""
+import datetime
+import json
+import time
+import uuid
+
+import psycopg2
+import pytest
+
+from src.export import (AsyncExporter,
+                        Export2PostgreSQL,
+                        _copy_line,
+                        )
+from src.search import (ngrams,
+                        normalize_text,
+                        )
+from src.spool import DeadLetterSpool
+from src.objects import (HTMLContent,
+                         Media,
+                         News,
+                         )
+
+def make_news(index:int, article:str="article") -> News:
+    html_content = HTMLContent(status=200,
+                               id=f"k{index}",
+                               url=f"https://example.com/k{index}.html",
+                               filepath=None,
+                               title=f"title {index}",
+                               article=article,
+                               publication_time=datetime.datetime(2024, 12, 5, 16, 0),
+                               download_time=datetime.datetime(2024, 12, 6),
+                               )
+    media = Media(status=200,
+                  id=f"v{index}",
+                  type="Audio",
+                  url=f"https://example.com/v{index}.m3u8",
+                  download_time=datetime.datetime(2024, 12, 6),
+                  )
+    return News("NHK Easy Web",
+                f"k{index}",
+                f"title {index}",
+                html_content.url,
+                datetime.datetime(2024, 12, 5, 16, 0),
+                datetime.datetime(2024, 12, 6),
+                None,
+                media,
+                html_content,
+                )
+
+def connect_exporter(tmp_path, **kwargs):
+    exporter = Export2PostgreSQL(schema=f"test_japanese_news_{uuid.uuid4().hex[:8]}",
+                                 spool=DeadLetterSpool(tmp_path, base_delay=0),
+                                 **kwargs,
+                                 )
+    try:
+        exporter.conn
+    except psycopg2.OperationalError as err:
+        pytest.skip(f"PostgreSQL not available: {err}")
+    yield exporter
+    exporter.cursor.execute(f'DROP SCHEMA "{exporter.schema}" CASCADE;')
+    exporter.conn.commit()
+    exporter.close()
+
+@pytest.fixture
+def exporter(tmp_path):
+    yield from connect_exporter(tmp_path, partitioned=False)
+
+@pytest.fixture
+def partitioned_exporter(tmp_path):
+    yield from connect_exporter(tmp_path, partitioned=True)
+
+class TestCopyLine:
+    def test_escape(self):
+        line = _copy_line(("a\tb\nc\\d", None, 1, datetime.datetime(2024, 12, 5, 16, 0)))
+        assert line == "a\\tb\\nc\\\\d\t\\N\t1\t2024-12-05T16:00:00\n"
+
+class TestLazyConnection:
+    def test_no_connection_before_use(self):
+        exporter = Export2PostgreSQL()
+        assert exporter._conn is None
+        exporter.close()
+
+class RecordingExporter:
+    """只記錄 insert_many 收到的批次，不連資料庫"""
+    def __init__(self):
+        self.batches = []
+
+    def insert_many(self, objs):
+        self.batches.append(list(objs))
+        return len(self.batches[-1])
+
+class TestAsyncExporter:
+    def test_batch_by_size_and_flush_on_close(self):
+        exporter = RecordingExporter()
+        with AsyncExporter(exporter, batch_size=4, flush_interval=60) as writer:
+            for index in range(10):
+                writer.put(make_news(index))
+        assert [len(batch) for batch in exporter.batches] == [4, 4, 2]
+
+    def test_failed_batch_is_recorded(self, exporter):
+        def broken(objs):
+            raise ValueError("cannot serialize")
+
+        exporter.insert_many = broken
+        with AsyncExporter(exporter, batch_size=2, flush_interval=60) as writer:
+            for index in range(3):
+                writer.put(make_news(index))
+        assert [str(err) for err in writer.errors] == ["cannot serialize"] * 2
+        assert len(exporter.spool) == 2
+
+    def test_flush_by_time(self):
+        exporter = RecordingExporter()
+        writer = AsyncExporter(exporter, batch_size=100, flush_interval=0.05)
+        writer.put(make_news(0))
+        time.sleep(0.3)
+        assert len(exporter.batches) == 1
+        writer.close()
+        with pytest.raises(RuntimeError):
+            writer.put(make_news(1))
+
+class TestExport2PostgreSQL:
+    def test_schema_version(self, exporter):
+        exporter.cursor.execute(f'SELECT version FROM "{exporter.schema}"."schema_version";')
+        assert exporter.cursor.fetchone()[0] == exporter._migrations()[-1][0]
+
+    def test_insert_many(self, exporter):
+        news_list = [make_news(index) for index in range(10)] + [make_news(0, "updated")]
+        assert exporter.insert_many(news_list) == 11
+
+        exporter.cursor.execute(f'SELECT count(*) FROM "{exporter.schema}"."news";')
+        assert exporter.cursor.fetchone()[0] == 10
+        assert exporter.fetch_html_contents(["k0"])["k0"].article == "updated"
+
+    def test_skip_unchanged(self, exporter):
+        exporter.insert_many([make_news(index) for index in range(3)])
+        assert exporter.stats["news"].inserted == 3
+
+        # 只有 download_time 不同視為未變動
+        news = make_news(0)
+        news.download_time = datetime.datetime(2025, 1, 1)
+        exporter.insert(news)
+        assert exporter.stats["news"].unchanged == 1
+
+        exporter.insert_many([make_news(1, "revised"), make_news(2)])
+        assert exporter.stats["html_contents"].updated == 1
+        assert exporter.stats["html_contents"].unchanged == 2
+        assert exporter.fetch_html_contents(["k1"])["k1"].article == "revised"
+
+    def test_failed_batch_is_spooled_and_replayed(self, exporter):
+        news = make_news(0)
+        news.media.type = "Other"  # 違反 CHECK constraint
+        assert exporter.insert_many([news]) == 0
+        assert len(exporter.spool) == 1
+
+        exporter.cursor.execute(f'ALTER TABLE "{exporter.schema}"."media" DROP CONSTRAINT media_type_check;')
+        exporter.conn.commit()
+        assert exporter.replay_dead_letters() == {"replayed": 1, "failed": 0, "dead": 0, "pending": 0}
+        assert len(exporter.spool) == 0
+        assert exporter.stats["news"].inserted == 1
+
+    def test_only_bad_rows_are_spooled(self, exporter):
+        news_list = [make_news(index) for index in range(7)]
+        news_list[2].title = "x" * 300  # 超過 VARCHAR(255)
+        news_list[5].media.type = "Other"  # 違反 CHECK constraint
+        assert exporter.insert_many(news_list) == 5
+
+        exporter.cursor.execute(f'SELECT source_id FROM "{exporter.schema}"."news" ORDER BY source_id;')
+        assert [row[0] for row in exporter.cursor.fetchall()] == ["k0", "k1", "k3", "k4", "k6"]
+        exporter.conn.commit()
+        spooled = sorted(item["source_id"] for path in exporter.spool._entries()
+                         for item in json.loads(path.read_text(encoding="utf-8"))["items"])
+        assert spooled == ["k2", "k5"]
+        assert len(exporter.spool) == 2
+
+class TestRevisions:
+    def test_revision_history(self, exporter):
+        first = "東京で雨。大阪で雪。\n名古屋で晴れ。"
+        second = "東京で雨。大阪で雨。\n名古屋で晴れ。"
+        third = second + "続報です。"
+        exporter.insert_many([make_news(0, first), make_news(1)])
+        exporter.insert_many([make_news(0, second)])
+        exporter.insert_many([make_news(0, second)])  # 未變動不另存版本
+        news = make_news(0, third)
+        news.html_content.modified_time = datetime.datetime(2024, 12, 7, tzinfo=datetime.timezone.utc)
+        exporter.insert(news)
+
+        revisions = exporter.get_revisions("k0")
+        assert [(revision["revision"], revision["article"]) for revision in revisions] == [(3, third),
+                                                                                          (2, second),
+                                                                                          (1, first),
+                                                                                          ]
+        exporter.cursor.execute(f'SELECT delta FROM "{exporter.schema}"."html_content_revisions" WHERE revision = 2;')
+        assert exporter.cursor.fetchone()[0] == '[["=",4],["-",1]]'
+        assert exporter.get_revisions("k1")[0]["revision"] == 1
+        assert exporter.get_revisions("missing") == []
+
+    def test_failed_insert_keeps_history(self, exporter):
+        exporter.insert(make_news(0, "first"))
+        news = make_news(0, "second")
+        news.media.type = "Other"  # 違反 CHECK constraint，整筆回滾
+        exporter.insert(news)
+
+        assert exporter.fetch_html_contents(["k0"])["k0"].article == "first"
+        assert [revision["article"] for revision in exporter.get_revisions("k0")] == ["first"]
+        assert len(exporter.spool) == 1
+        exporter.cursor.execute(f'ALTER TABLE "{exporter.schema}"."media" DROP CONSTRAINT media_type_check;')
+        exporter.conn.commit()
+        exporter.replay_dead_letters()
+        assert [revision["article"] for revision in exporter.get_revisions("k0")] == ["second", "first"]
+
+    def test_fetch_modified_times(self, exporter):
+        news = make_news(0)
+        news.html_content.modified_time = datetime.datetime(2024, 12, 7, tzinfo=datetime.timezone.utc)
+        exporter.insert_many([news, make_news(1)])
+
+        times = exporter.fetch_modified_times(["k0", "k1", "missing"])
+        assert times["k0"] == news.html_content.modified_time
+        assert times["k1"] == datetime.datetime(2024, 12, 5, 16, 0).astimezone()
+        assert "missing" not in times
+
+class TestReadNews:
+    def test_list_news_pages(self, exporter):
+        news_list = [make_news(index) for index in range(5)]
+        for index, news in enumerate(news_list):
+            news.publication_time = datetime.datetime(2024, 12, 1 + index // 2)
+        news_list[4].publication_time = None
+        exporter.insert_many(news_list)
+
+        pages, after = [], None
+        while True:
+            rows, after = exporter.list_news(after=after, limit=2)
+            pages.append([row["source_id"] for row in rows])
+            if after is None:
+                break
+        assert sorted(sum(pages[:2], [])[:2]) == ["k2", "k3"]
+        assert sorted(sum(pages, [])) == ["k0", "k1", "k2", "k3", "k4"]
+        assert pages[-1] == ["k4"]
+        rows, after = exporter.list_news(start_time=datetime.datetime(2024, 12, 2), limit=10)
+        assert (sorted(row["source_id"] for row in rows), after) == (["k2", "k3"], None)
+        assert exporter.list_news(source="NHK News") == ([], None)
+
+    def test_get_news(self, exporter):
+        exporter.insert_many([make_news(1)])
+        news_id = exporter.list_news()[0][0]["id"]
+        news = exporter.get_news(news_id)
+        assert news["html_content"]["article"] == "article"
+        assert news["media"]["id"] == "v1"
+        assert exporter.get_news("missing") is None
+
+class TestSearch:
+    def test_ngrams_match_database(self, exporter):
+        text = "中村さんが亡くなってから５年　ＮＨＫ\n水路"
+        exporter.cursor.execute(f'SELECT "{exporter.schema}".search_ngrams("{exporter.schema}".search_document(%s, NULL));',
+                                (text,))
+        grams = set(exporter.cursor.fetchone()[0])
+        exporter.conn.commit()
+        assert grams == ngrams(normalize_text(text + "\n"))
+
+    def test_search(self, exporter):
+        water, school, old = make_news(1, "アフガニスタンに新しい水路ができました"), make_news(2, "学校の水"), make_news(3, "水路")
+        water.html_content.title = "水路の話"
+        old.html_content.publication_time = datetime.datetime(2023, 1, 1)
+        exporter.insert_many([water, school, old])
+
+        results = exporter.search("水路")
+        assert [result["html_content_id"] for result in results] == ["k1", "k3"]
+        assert results[0]["source"] == "NHK Easy Web"
+        assert "水路" in results[0]["snippet"]
+        assert [result["html_content_id"] for result in exporter.search("水")] == ["k1", "k2", "k3"]
+        assert exporter.search("水路 学校") == []
+        assert [result["html_content_id"]
+                for result in exporter.search("水路", start_time=datetime.datetime(2024, 1, 1))] == ["k1"]
+        assert exporter.search("水路", source="NHK News") == []
+
+class TestPartitioned:
+    def partitions(self, exporter, table):
+        exporter.cursor.execute("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(%s)
+        ORDER BY child.relname;
+        """, (f'"{exporter.schema}"."{table}"',))
+        return [row[0] for row in exporter.cursor.fetchall()]
+
+    def test_monthly_partitions(self, partitioned_exporter):
+        exporter = partitioned_exporter
+        assert exporter.partitioned
+        december, january = make_news(1), make_news(2)
+        january.publication_time = datetime.datetime(2025, 1, 3, 9, 0)
+        january.html_content.publication_time = None
+        assert exporter.insert_many([december, january]) == 2
+        exporter.insert(make_news(1, article="changed"))
+
+        assert self.partitions(exporter, exporter.news_table) == ["news_default", "news_p202412", "news_p202501"]
+        assert self.partitions(exporter, exporter.html_content_table) == ["html_contents_default",
+                                                                          "html_contents_p202412",
+                                                                          ]
+        exporter.cursor.execute(f'SELECT id, article FROM "{exporter.schema}"."{exporter.html_content_table}" ORDER BY id;')
+        assert exporter.cursor.fetchall() == [("k1", "changed"), ("k2", "article")]
+        assert exporter.stats[exporter.html_content_table].updated == 1
+        exporter.conn.commit()
+
+    def test_changed_publication_time_keeps_one_row(self, partitioned_exporter):
+        exporter = partitioned_exporter
+        assert exporter.insert_many([make_news(1)]) == 1
+        # 改版後發布時間改變，換到另一個月份分區
+        revised = make_news(1, article="revised")
+        revised.publication_time = revised.html_content.publication_time = datetime.datetime(2025, 1, 3, 9, 0)
+        assert exporter.insert_many([revised]) == 1
+        moved_again = make_news(1, article="moved again")
+        moved_again.publication_time = moved_again.html_content.publication_time = datetime.datetime(2025, 2, 1, 9, 0)
+        exporter.insert(moved_again)
+
+        for table in (exporter.news_table, exporter.html_content_table):
+            exporter.cursor.execute(f'SELECT id, publication_time FROM "{exporter.schema}"."{table}";')
+            rows = exporter.cursor.fetchall()
+            assert len(rows) == 1
+            assert rows[0][1] == datetime.datetime(2025, 2, 1, 9, 0)
+            assert exporter.stats[table].inserted == 1
+            assert exporter.stats[table].updated == 2
+        exporter.conn.commit()
+
+    def test_query_indexes(self, exporter):
+        exporter.cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = %s;", (exporter.schema,))
+        indexes = {row[0] for row in exporter.cursor.fetchall()}
+        exporter.conn.commit()
+        assert {"news_source_publication_time_idx", "news_source_id_idx"} <= indexes
+
+class TestExport2Parquet:
+    @pytest.fixture(params=["parquet", "ipc"])
+    def columnar(self, tmp_path, request):
+        pytest.importorskip("pyarrow")
+        from src.export import Export2Parquet  # pylint: disable=import-outside-toplevel
+        return Export2Parquet(tmp_path, file_format=request.param)
+
+    def test_append_and_read(self, columnar):
+        december, january = make_news(1), make_news(2)
+        january.publication_time = datetime.datetime(2025, 1, 3, 9, 0)
+        assert columnar.insert_many([december, january]) == 2
+        columnar.insert_many([make_news(1, article="changed")])
+        assert columnar.stats == {"media": 3, "html_contents": 3, "news": 3}
+
+        contents = columnar.read("html_contents", columns=["id", "article"])
+        assert sorted(contents.to_pylist(), key=lambda row: row["id"]) == [{"id": "k1", "article": "changed"},
+                                                                            {"id": "k2", "article": "article"}]
+        assert columnar.read("html_contents", latest=False).num_rows == 3
+        news = columnar.read("news", columns=["source_id"], start_time=datetime.datetime(2025, 1, 1))
+        assert news.to_pylist() == [{"source_id": "k2"}]
+
+        assert columnar.compact("html_contents") == 2
+        assert columnar.read("html_contents", latest=False).num_rows == 2
+
+    def test_read_empty(self, columnar):
+        assert columnar.read("news", columns=["id"]).num_rows == 0
@@ -0,0 +1,44 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_fake_nhk.py
+@Time    :  2026/10/19 20:31:47
+@Author  :  Kevin Wang
+@Desc    :  以本機假 NHK 伺服器離線測試爬蟲與 HLS 下載
+"""
+import pytest
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.crawler import (NHKEasyWebCrawler,
+                         NHKWebCrawler,
+                         )
+from src.utils import (HLSMediaDownloader,
+                       ProjectConfigs,
+                       )
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeNHKServer(easy_news=4, news_per_category=2, segments=3, segment_size=1024,
+                       error_rate=0.1, seed=1) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        yield server
+
+def test_hls_save_decrypts(server, tmp_path):
+    path = HLSMediaDownloader().save(f"{server.url}/news/easy_audio/v1/index.m3u8", tmp_path / "v1.mp3")
+    expected = b"".join(server.plain_segment("v1", index) for index in range(3))
+    assert path.read_bytes() == expected
+
+def test_easy_crawler(server, tmp_path):
+    news = list(NHKEasyWebCrawler().iter_recent_news(save_dir=tmp_path))
+
+    assert [item.html_content.id for item in news] == [item["news_id"] for item in server.easy_items()]
+    assert all(item.html_content.article and item.media.filepath.exists() for item in news)
+    assert tmp_path.joinpath("news.json").exists()
+
+def test_news_crawler(server, tmp_path):
+    news = list(NHKWebCrawler().iter_recent_news(save_dir=tmp_path))
+
+    assert len(news) == 7 * 2
+    assert sum(item.media is not None for item in news) == 7
+    assert all(item.html_content.title and item.html_content.article for item in news)
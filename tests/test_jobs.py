@@ -0,0 +1,66 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_jobs.py
+@Time    :  2026/10/19 18:20:44
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+import threading
+import time
+
+import pytest
+
+from src.jobs import JobManager
+
+def wait_done(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+class TestJobManager:
+    def test_merge_identical_jobs(self):
+        release = threading.Event()
+        calls = []
+
+        def runner(params, progress):
+            calls.append(params)
+            progress(1)
+            release.wait(5)
+            return [params["n"]]
+
+        manager = JobManager({"count": runner})
+        job, created = manager.submit("count", {"n": 1})
+        same, same_created = manager.submit("count", {"n": 1})
+        other, _ = manager.submit("count", {"n": 2})
+        assert created and not same_created
+        assert same is job and other is not job
+
+        release.set()
+        assert wait_done(job).status == "succeeded"
+        assert job.result == [1] and job.progress == 1
+        assert manager.get(job.id).to_json_dict()["status"] == "succeeded"
+        assert wait_done(other).result == [2]
+        assert len(calls) == 2
+
+        # 已完成的 job 不再合併
+        again, created = manager.submit("count", {"n": 1})
+        assert created and again is not job
+        wait_done(again)
+        manager.shutdown()
+
+    def test_failed_job(self):
+        def runner(params, progress):
+            raise RuntimeError("boom")
+
+        manager = JobManager({"fail": runner}, max_finished=1)
+        first = wait_done(manager.submit("fail", {"n": 1})[0])
+        assert first.status == "failed" and "boom" in first.error
+        second = wait_done(manager.submit("fail", {"n": 2})[0])
+        manager.shutdown()
+        assert manager.get(first.id) is None
+        assert manager.get(second.id) is second
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            JobManager({}).submit("unknown")
@@ -0,0 +1,109 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_media_queue.py
+@Time    :  2026/10/20 01:07:42
+@Author  :  Kevin Wang
+@Desc    :  先交出文章、影音由背景佇列依優先順序下載，以及影音下載的頻寬上限
+"""
+from datetime import datetime
+from time import monotonic
+import json
+import threading
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.budget import BandwidthLimiter
+from src.crawler import (NEWS_FILE,
+                         NHKEasyWebCrawler,
+                         NHKWebCrawler,
+                         _NewsJson,
+                         )
+from src.media_queue import MediaDownloadQueue
+from src.objects import (Media,
+                         News,
+                         )
+from src.utils import ProjectConfigs
+
+def make_news(source_id:str, hour:int) -> News:
+    return News("NHK News", source_id, source_id, f"https://example.com/{source_id}", datetime(2024, 12, 1, hour))
+
+def test_downloads_by_priority():
+    started = threading.Event()
+    release = threading.Event()
+    order, done = [], []
+
+    def download(name, media_type):
+        def run():
+            if name == "blocker":
+                started.set()
+                release.wait(5)
+            order.append(name)
+            return Media(status=200, id=name, type=media_type, url="")
+        return run
+
+    with MediaDownloadQueue(done.append, workers=1) as media_queue:
+        media_queue.submit(make_news("blocker", 0), download("blocker", "Video"), "Video")
+        started.wait(5)
+        for name, hour, media_type in [("old_video", 1, "Video"), ("new_video", 9, "Video"), ("audio", 5, "Audio")]:
+            media_queue.submit(make_news(name, hour), download(name, media_type), media_type)
+        assert media_queue.pending == 3
+        release.set()
+
+    assert order == ["blocker", "audio", "new_video", "old_video"]
+    assert [news.media.id for news in done] == order
+
+def test_failed_download_is_recorded():
+    def broken():
+        raise ConnectionError("down")
+
+    done = []
+    with MediaDownloadQueue(done.append) as media_queue:
+        media_queue.submit(make_news("a", 0), broken, "Audio")
+    assert done == []
+    assert isinstance(media_queue.errors[0], ConnectionError)
+
+def test_crawlers_yield_articles_before_media(tmp_path, monkeypatch):
+    with FakeNHKServer(easy_news=3, news_per_category=2, segments=1, segment_size=1024) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        done = []
+        with MediaDownloadQueue(done.append) as media_queue:
+            easy = list(NHKEasyWebCrawler().iter_recent_news(save_dir=tmp_path / "easy", media_queue=media_queue))
+            news = list(NHKWebCrawler().iter_recent_news(save_dir=tmp_path / "news", media_queue=media_queue))
+
+    assert len(easy) == 3 and len(news) == 14
+    assert all(item.media is None for item in easy + news)
+    # Easy 全部有音檔，NHK News 一半有影片
+    assert len(done) == 3 + 7
+    assert all(item.media is not None and item.media.filepath.is_file() for item in done)
+    assert {item.source_id for item in done} <= {item.source_id for item in easy + news}
+    # 影音在 news.json 寫入之後才下載完成，佇列清空時 news.json 會補上
+    for directory, count in [("easy", 3), ("news", 7)]:
+        entries = json.loads((tmp_path / directory / NEWS_FILE).read_text(encoding="utf-8"))
+        assert sum(entry["media"] is not None for entry in entries) == count
+
+def test_news_json_not_patched_after_newer_run(tmp_path):
+    release = threading.Event()
+
+    def download():
+        release.wait(5)
+        return Media(status=200, id="v0", type="Audio", url="")
+
+    news_json = _NewsJson(tmp_path / NEWS_FILE)
+    with MediaDownloadQueue(lambda news: None) as media_queue:
+        media_queue.submit(make_news("a", 0), news_json.defer(news_json.append(make_news("a", 0)), download), "Audio")
+        news_json.write()
+        newer = _NewsJson(tmp_path / NEWS_FILE)
+        newer.append(make_news("b", 1))
+        newer.write()
+        release.set()
+    entries = json.loads((tmp_path / NEWS_FILE).read_text(encoding="utf-8"))
+    assert [entry["source_id"] for entry in entries] == ["b"]
+
+def test_bandwidth_limiter():
+    limiter = BandwidthLimiter(rate=10_000)
+    assert limiter.consume(10_000) == 0  # 一秒份的額度可以直接使用
+    start = monotonic()
+    assert limiter.consume(2_000) > 0.1
+    assert monotonic() - start >= 0.1
+    assert BandwidthLimiter(rate=0).consume(10 ** 9) == 0
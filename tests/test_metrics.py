@@ -0,0 +1,57 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_metrics.py
+@Time    :  2026/10/19 19:44:05
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+import pytest
+
+from src.metrics import (Counter,
+                         Gauge,
+                         Histogram,
+                         Registry,
+                         )
+
+class TestMetrics:
+    def test_render(self):
+        registry = Registry()
+        requests = Counter("requests_total", "Requests.", ("host",), registry=registry)
+        latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1), registry=registry)
+        requests.labels(host="a").inc()
+        requests.labels(host="a").inc(2)
+        latency.observe(0.1)
+        latency.observe(0.5)
+        latency.observe(5)
+
+        assert registry.render().splitlines() == ["# HELP requests_total Requests.",
+                                                  "# TYPE requests_total counter",
+                                                  'requests_total{host="a"} 3',
+                                                  "# HELP latency_seconds Latency.",
+                                                  "# TYPE latency_seconds histogram",
+                                                  'latency_seconds_bucket{le="0.1"} 1',
+                                                  'latency_seconds_bucket{le="1"} 2',
+                                                  'latency_seconds_bucket{le="+Inf"} 3',
+                                                  "latency_seconds_sum 5.6",
+                                                  "latency_seconds_count 3",
+                                                  ]
+
+    def test_gauge(self):
+        registry = Registry()
+        limit = Gauge("limit", "Limit.", ("host",), registry=registry)
+        limit.labels(host="a").set(4)
+        limit.labels(host="a").set(2.5)
+        assert registry.render().splitlines() == ["# HELP limit Limit.",
+                                                  "# TYPE limit gauge",
+                                                  'limit{host="a"} 2.5',
+                                                  ]
+
+    def test_invalid(self):
+        registry = Registry()
+        counter = Counter("c_total", "C.", ("host",), registry=registry)
+        with pytest.raises(ValueError):
+            counter.labels(path="/")
+        with pytest.raises(ValueError):
+            counter.labels(host="a").inc(-1)
+        with pytest.raises(ValueError):
+            Counter("c_total", "Duplicate.", registry=registry)
@@ -0,0 +1,34 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_objects.py
+@Time    :  2026/10/20 03:12:44
+@Author  :  Kevin Wang
+@Desc    :  News.id 必須跨 process 穩定，資料庫主鍵、spool 重送與查詢都依賴它
+"""
+from pathlib import Path
+import os
+import subprocess
+import sys
+
+from src.objects import News
+
+ROOT = Path(__file__).resolve().parents[1]
+
+def test_id_is_stable_across_processes():
+    news = News("NHK News", "k10014660201000", "title", "https://example.com")
+    script = ("from src.objects import News; "
+              "print(News('NHK News', 'k10014660201000', 'title', 'https://example.com').id)")
+    ids = set()
+    for seed in ("1", "2"):
+        # 不同的 PYTHONHASHSEED 下 hash() 會不同，id 不應受影響
+        result = subprocess.run([sys.executable, "-c", script],
+                                cwd=ROOT,
+                                env={**os.environ, "PYTHONHASHSEED": seed, "PYTHONPATH": f"{ROOT / 'src'}{os.pathsep}{ROOT}"},
+                                capture_output=True,
+                                text=True,
+                                check=True,
+                                )
+        ids.add(int(result.stdout))
+    assert ids == {news.id}
+    assert 0 <= news.id <= 0x7FFFFFFF
+    assert News("NHK Easy News", "k10014660201000", "title", "https://example.com").id != news.id
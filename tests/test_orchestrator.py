@@ -0,0 +1,140 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_orchestrator.py
+@Time    :  2026/10/20 00:21:17
+@Author  :  Kevin Wang
+@Desc    :  同時執行所有爬蟲與共用的連線池、每個 host 的速率限制、下載上限
+"""
+from time import (monotonic,
+                  sleep,
+                  )
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.budget import (HostRateLimiter,
+                        download_slot,
+                        )
+from src.crawler import (LOCK_FILE,
+                         NEWS_FILE,
+                         NHKEasyWebCrawler,
+                         _source_lock,
+                         )
+from src.orchestrator import (CrawlOrchestrator,
+                              discover_crawlers,
+                              )
+from src.utils import (MyRequests,
+                       ProjectConfigs,
+                       )
+
+def test_rate_limiter_spaces_requests_per_host():
+    limiter = HostRateLimiter(rate=20)
+    start = monotonic()
+    waits = [limiter.wait("a.example") for _ in range(4)]
+    assert monotonic() - start >= 3 / 20 * 0.9
+    assert waits[0] == 0
+    assert limiter.wait("b.example") == 0  # 其他 host 不受影響
+    assert HostRateLimiter(rate=0).wait("a.example") == 0
+
+def test_download_slots_are_shared(monkeypatch):
+    monkeypatch.setattr(ProjectConfigs, "DOWNLOAD_CONCURRENCY", 2)
+    lock = threading.Lock()
+    active, peak = 0, 0
+
+    def download():
+        nonlocal active, peak
+        with download_slot():
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            sleep(0.05)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=download) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+
+def test_clients_share_one_session():
+    assert MyRequests()._session is MyRequests(use_cache=False)._session
+
+def test_discover_crawlers():
+    assert list(discover_crawlers()) == ["NHKEasyWebCrawler", "NHKWebCrawler"]
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeNHKServer(easy_news=3, news_per_category=2, segments=1, segment_size=1024) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        yield server
+
+def test_crawls_run_concurrently_into_one_sink(server, tmp_path):
+    def crawl(cls):
+        return lambda start_date, end_date: cls().iter_recent_news(start_date, end_date, save_dir=tmp_path / cls.__name__)
+
+    threads, received = set(), []
+
+    def sink(name, news):
+        threads.add(threading.current_thread().name)
+        received.append((name, news.html_content.id))
+
+    orchestrator = CrawlOrchestrator({name: crawl(cls) for name, cls in discover_crawlers().items()})
+    counts = orchestrator.run(sink)
+    assert counts == {"NHKEasyWebCrawler": 3, "NHKWebCrawler": 14}
+    assert len(received) == 17
+    assert len(threads) == 2
+    assert orchestrator.errors == {}
+
+def test_failing_source_does_not_stop_others():
+    def broken(start_date, end_date):
+        yield "first"
+        raise ConnectionError("down")
+
+    def working(start_date, end_date):
+        return iter(["a", "b"])
+
+    received = []
+    orchestrator = CrawlOrchestrator({"broken": broken, "working": working})
+    counts = orchestrator.run(lambda name, news: received.append(news))
+    assert counts == {"broken": 1, "working": 2}
+    assert sorted(received) == ["a", "b", "first"]
+    assert isinstance(orchestrator.errors["broken"], ConnectionError)
+
+def test_runs_of_one_source_take_turns(server, tmp_path):
+    results = []
+
+    def crawl():
+        results.append(len(list(NHKEasyWebCrawler().iter_recent_news(save_dir=tmp_path))))
+
+    # 另一個 process 正在爬同一個來源
+    holder = subprocess.Popen([sys.executable, "-c",
+                               "import fcntl, sys, time; file = open(sys.argv[1], 'a'); "
+                               "fcntl.flock(file.fileno(), fcntl.LOCK_EX); print('locked', flush=True); time.sleep(0.5)",
+                               str(tmp_path / LOCK_FILE)],
+                              stdout=subprocess.PIPE,
+                              text=True,
+                              )
+    assert holder.stdout.readline().strip() == "locked"
+    start = monotonic()
+    with _source_lock(tmp_path):
+        assert monotonic() - start > 0.3  # 等到另一個 process 結束才取得
+        assert holder.wait(5) == 0
+        threads = [threading.Thread(target=crawl) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        sleep(0.2)
+        assert results == []  # 同一個 process 內的其他爬取也在等待
+    for thread in threads:
+        thread.join()
+    assert results == [3, 3]
+    news = json.loads((tmp_path / NEWS_FILE).read_text(encoding="utf-8"))
+    assert len(news) == 3
+    assert not list(tmp_path.glob("*.tmp"))
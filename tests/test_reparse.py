@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_reparse.py
+@Time    :  2026/10/19 10:48:02
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+import datetime
+import re
+import shutil
+
+import pytest
+
+from src.objects import HTMLContent
+from src.reparse import (diff_parsed,
+                         iter_archive,
+                         iter_parsed,
+                         )
+
+class TestIterParsed:
+    def test_parse_archive(self, tmp_path):
+        shutil.copy("tests/data/ne2024120411451.html", tmp_path)
+        tmp_path.joinpath("broken.html").write_text("<html></html>", encoding="utf-8")
+
+        results = {path.stem: (obj, error)
+                   for path, obj, error in iter_parsed("easy", iter_archive(tmp_path), max_workers=2)}
+
+        obj, error = results["ne2024120411451"]
+        assert error is None
+        assert re.sub(r"\s", "", obj.title) == "中村さんが亡くなってから5年アフガニスタンに新しい水路"
+        assert obj.publication_time == datetime.datetime(2024, 12, 4, 19, 23)
+
+        obj, error = results["broken"]
+        assert obj is None
+        assert error
+
+    def test_unknown_source(self, tmp_path):
+        with pytest.raises(ValueError):
+            list(iter_parsed("unknown", iter_archive(tmp_path)))
+
+class TestDiffParsed:
+    stored = HTMLContent(status=200,
+                         id="k1",
+                         url="https://example.com/k1.html",
+                         filepath=None,
+                         title="title",
+                         article="article",
+                         publication_time=None,
+                         )
+
+    def test_unchanged(self):
+        parsed = HTMLContent(None, "k1", None, None, title="title", article="article")
+        assert diff_parsed(parsed, self.stored) is None
+
+    def test_changed(self):
+        time = datetime.datetime(2024, 12, 4, 19, 23)
+        parsed = HTMLContent(None, "k1", None, None, title="title", article="fixed", publication_time=time)
+        updated = diff_parsed(parsed, self.stored)
+        assert updated.article == "fixed"
+        assert updated.publication_time == time
+        assert updated.url == self.stored.url
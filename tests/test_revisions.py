@@ -0,0 +1,79 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_revisions.py
+@Time    :  2026/10/19 22:58:26
+@Author  :  Kevin Wang
+@Desc    :  文章改版的 delta 與只抓改版文章的 refresh 模式
+"""
+import json
+
+import pytest
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.crawler import NHKWebCrawler
+from src.revisions import (apply_delta,
+                           apply_text_delta,
+                           make_delta,
+                           make_text_delta,
+                           split_units,
+                           )
+from src.utils import ProjectConfigs
+
+class TestDelta:
+    def test_split_units_round_trip(self):
+        text = "一文目。二文目！\n\n三文目？？終わり"
+        assert split_units(text) == ["一文目。", "二文目！", "\n", "\n", "三文目？？", "終わり"]
+        assert "".join(split_units(text)) == text
+
+    @pytest.mark.parametrize("source, target", [
+        ("東京で雨。大阪で雪。\n名古屋で晴れ。", "東京で雨。大阪で雨。\n名古屋で晴れ。続報です。"),
+        ("", "新しい記事。"),
+        ("消える記事。", ""),
+        ("同じ。", "同じ。"),
+    ])
+    def test_round_trip(self, source, target):
+        assert apply_delta(source, make_delta(source, target)) == target
+
+    def test_unchanged_sentences_are_not_stored(self):
+        source = "".join(f"{index}番目の長い文章がここに入ります。" for index in range(100))
+        target = source.replace("50番目", "五十番目")
+        delta = make_delta(source, target)
+        assert json.loads(delta) == [["=", 50], ["-", 1], ["+", "五十番目の長い文章がここに入ります。"], ["=", 49]]
+
+    def test_invalid_delta(self):
+        with pytest.raises(ValueError):
+            apply_delta("短い。", '[["=",5]]')
+        with pytest.raises(ValueError):
+            apply_delta("短い。", '[["?",1]]')
+
+    def test_nullable(self):
+        assert make_text_delta("old", None) is None
+        assert apply_text_delta("new", None) is None
+        assert apply_text_delta(None, make_text_delta(None, "old")) == "old"
+
+def test_refresh_only_changed_articles(tmp_path, monkeypatch):
+    with FakeNHKServer(news_per_category=2, segments=1, segment_size=1024) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        stored = {news.html_content.id: news.html_content.modified_time
+                  for news in NHKWebCrawler().iter_recent_news(save_dir=tmp_path)}
+        assert len(stored) == 14
+
+        lookups = []
+        def stored_times(ids):
+            lookups.append(ids)
+            return {news_id: stored[news_id] for news_id in ids if news_id in stored}
+
+        server.revise("k100103000001000")
+        del stored["k100105000011000"]
+        before = server.requests
+        refreshed = list(NHKWebCrawler().iter_recent_news(save_dir=tmp_path, stored_times=stored_times))
+
+    assert sorted(news.html_content.id for news in refreshed) == ["k100103000001000", "k100105000011000"]
+    revised = refreshed[[news.html_content.id for news in refreshed].index("k100103000001000")]
+    assert "1回目の訂正があります。" in revised.html_content.article
+    assert revised.html_content.modified_time > stored["k100103000001000"]
+    assert len(lookups) == 7  # 每個分類查詢一次
+    # 7 個分類列表 + 2 篇文章 + 改版文章的影片 playlist（影片已存於 MediaStore，不再下載）
+    assert server.requests - before == 7 + 2 + 1
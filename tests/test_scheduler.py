@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_scheduler.py
+@Time    :  2026/10/19 23:44:05
+@Author  :  Kevin Wang
+@Desc    :  依發布時間調整輪詢間隔的常駐排程
+"""
+from datetime import (datetime,
+                      timedelta,
+                      )
+import threading
+
+import pytest
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.crawler import (NHKEasyWebCrawler,
+                         NHKWebCrawler,
+                         )
+from src.scheduler import (AdaptiveInterval,
+                           KnownArticles,
+                           PollingScheduler,
+                           )
+from src.utils import ProjectConfigs
+
+def every(minutes:int, count:int=10):
+    start = datetime(2024, 12, 1, 9)
+    return [start + timedelta(minutes=minutes * index) for index in range(count)]
+
+class TestAdaptiveInterval:
+    def test_minimum_until_learned(self):
+        interval = AdaptiveInterval(60, 1800)
+        assert interval.next_interval(found_new=True) == 60
+        interval.observe([datetime(2024, 12, 1)])
+        assert interval.next_interval(found_new=False) == 60
+
+    def test_learns_from_publications(self):
+        interval = AdaptiveInterval(60, 1800, factor=0.5)
+        interval.observe(every(10))
+        assert interval.median_gap == 600
+        assert interval.next_interval(found_new=True) == 300
+
+    def test_backoff_capped_by_gap_and_bounds(self):
+        interval = AdaptiveInterval(60, 1800, factor=0.5, backoff=2)
+        interval.observe(every(10))
+        assert [interval.next_interval(found_new=False) for _ in range(3)] == [600, 600, 600]
+        assert interval.next_interval(found_new=True) == 300
+
+        slow = AdaptiveInterval(60, 1800)
+        slow.observe(every(24 * 60))
+        assert slow.next_interval(found_new=True) == 1800
+        fast = AdaptiveInterval(60, 1800)
+        fast.observe(every(1))
+        assert fast.next_interval(found_new=True) == 60
+
+    def test_window_keeps_newest(self):
+        interval = AdaptiveInterval(60, 1800, window=5)
+        interval.observe(every(60))
+        interval.observe(every(1, 5))  # 較舊的時間不影響
+        assert interval.median_gap == 3600
+
+    def test_invalid_bounds(self):
+        with pytest.raises(ValueError):
+            AdaptiveInterval(60, 30)
+
+def test_known_articles_cache():
+    calls = []
+    def lookup(ids):
+        calls.append(list(ids))
+        return {news_id: datetime(2024, 12, 1) for news_id in ids if news_id != "new"}
+
+    known = KnownArticles(lookup)
+    assert set(known(["a", "b", "new"])) == {"a", "b"}
+    assert set(known(["a", "b", "new"])) == {"a", "b"}
+    assert calls == [["a", "b", "new"], ["new"]]
+
+def test_known_articles_bounded():
+    calls = []
+    def lookup(ids):
+        calls.append(list(ids))
+        return {news_id: datetime(2024, 12, 1) for news_id in ids}
+
+    known = KnownArticles(lookup, max_size=3)
+    known(["a", "b", "c"])
+    known(["a"])  # a 最近出現過，淘汰的是 b
+    known(["d"])
+    assert len(known) == 3
+    assert set(known(["a", "c", "d"])) == {"a", "c", "d"}
+    assert known(["b"]) == {"b": datetime(2024, 12, 1)}
+    assert calls == [["a", "b", "c"], ["d"], ["b"]]
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeNHKServer(easy_news=3, news_per_category=2, segments=1, segment_size=1024) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        yield server
+
+def test_poll_crawls_only_new_articles(server, tmp_path):
+    lookups = []
+    def lookup(ids):
+        lookups.append(list(ids))
+        return {}
+
+    scheduler = PollingScheduler({"easy": lambda stored_times: NHKEasyWebCrawler().iter_recent_news(
+                                      save_dir=tmp_path / "easy", stored_times=stored_times),
+                                  "news": lambda stored_times: NHKWebCrawler().iter_recent_news(
+                                      save_dir=tmp_path / "news", stored_times=stored_times),
+                                  },
+                                 lookup=lookup,
+                                 min_interval=1,
+                                 max_interval=3600,
+                                 )
+    assert scheduler.poll("easy") == 3
+    assert scheduler.poll("news") == 14
+    # 假伺服器的 NHK News 每 2 小時（各分類錯開 1 分鐘）發布一篇
+    assert scheduler.sources["news"].interval.median_gap == 60
+
+    before, lookups[:] = server.requests, []
+    assert scheduler.poll("easy") == 0
+    assert scheduler.poll("news") == 0
+    assert server.requests - before == 1 + 7  # 只有列表，沒有下載任何文章
+    assert lookups == []  # 已知的 id 不再查詢資料庫
+    assert scheduler.sources["easy"].interval.idle_polls == 1
+
+    server.revise("k100102000011000")
+    assert scheduler.poll("news") == 1
+
+def test_run_until_stopped():
+    polls = []
+    def crawl(stored_times):
+        polls.append(stored_times)
+        return iter(())
+
+    scheduler = PollingScheduler({"easy": crawl, "news": crawl},
+                                 lookup=lambda ids: {},
+                                 min_interval=0.01,
+                                 max_interval=1,
+                                 )
+    scheduler.run(max_polls=4)
+    assert len(polls) == 4
+
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    scheduler.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
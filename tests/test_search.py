@@ -0,0 +1,33 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_search.py
+@Time    :  2026/10/19 17:21:48
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+from src.search import (make_snippet,
+                        ngrams,
+                        query_grams,
+                        query_terms,
+                        )
+
+class TestNgrams:
+    def test_ngrams(self):
+        assert ngrams("水路 あ") == {"水", "路", "あ", "水路"}
+
+    def test_query(self):
+        terms = query_terms("ＮＨＫ　水路 水路 あ")
+        assert terms == ["nhk", "水路", "あ"]
+        assert query_grams(terms) == sorted({"nh", "hk", "水路", "あ"})
+
+    def test_snippet(self):
+        text = "前" * 100 + "水路" + "後" * 100
+        snippet = make_snippet(text, ["水路"], width=20)
+        assert "水路" in snippet
+        assert snippet.startswith("…") and snippet.endswith("…")
+
+    def test_snippet_full_width(self):
+        snippet = make_snippet("x" * 200 + "ＡＢＣ株式会社" + "y" * 200, query_terms("ABC"), width=20)
+        assert "ＡＢＣ株式会社" in snippet
+        snippet = make_snippet("前" * 100 + "ｶﾞｽ料金" + "後" * 100, query_terms("ガス"), width=20)
+        assert "ｶﾞｽ料金" in snippet
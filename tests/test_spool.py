@@ -0,0 +1,94 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_spool.py
+@Time    :  2026/10/19 17:12:45
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+import datetime
+import json
+import os
+
+from src.objects import (HTMLContent,
+                         News,
+                         )
+from src.spool import DeadLetterSpool
+
+def make_news(index:int) -> News:
+    html_content = HTMLContent(200, f"k{index}", "https://example.com", None, "title", "article",
+                               datetime.datetime(2024, 12, 5, 16, 0))
+    return News("NHK News", f"k{index}", "title", "https://example.com",
+                datetime.datetime(2024, 12, 5, 16, 0), None, None, None, html_content)
+
+class TestDeadLetterSpool:
+    def test_replay_success_removes_entry(self, tmp_path):
+        spool = DeadLetterSpool(tmp_path, base_delay=0)
+        spool.push("news", [make_news(0), make_news(1)], "connection refused")
+        assert len(spool) == 1
+
+        received = []
+        def handler(kind, objs):
+            received.append((kind, objs))
+            return True
+
+        assert spool.replay(handler) == {"replayed": 1, "failed": 0, "dead": 0, "pending": 0}
+        assert len(spool) == 0
+        kind, objs = received[0]
+        assert kind == "news"
+        assert [obj.to_json_dict() for obj in objs] == [make_news(0).to_json_dict(), make_news(1).to_json_dict()]
+
+    def test_failure_backs_off(self, tmp_path):
+        spool = DeadLetterSpool(tmp_path, base_delay=60, max_delay=100)
+        path = spool.push("news", [make_news(0)], "connection refused")
+
+        # 尚未到重試時間
+        assert spool.replay(lambda kind, objs: True) == {"replayed": 0, "failed": 0, "dead": 0, "pending": 1}
+
+        def handler(kind, objs):
+            raise ConnectionError("still down")
+
+        assert spool.replay(handler, force=True)["failed"] == 1
+        entry = json.loads(path.read_text(encoding="utf-8"))
+        assert entry["attempts"] == 1
+        assert entry["error"] == "still down"
+        assert entry["next_attempt"] - datetime.datetime.now().timestamp() > 90
+
+    def test_exhausted_entry_moves_to_dead(self, tmp_path):
+        spool = DeadLetterSpool(tmp_path, base_delay=0, max_attempts=2)
+        path = spool.push("news", [make_news(0)], "value too long")
+        assert spool.replay(lambda kind, objs: False)["failed"] == 1
+        assert spool.replay(lambda kind, objs: False) == {"replayed": 0, "failed": 0, "dead": 1, "pending": 0}
+        assert len(spool) == 0
+        assert json.loads(spool.dead_directory.joinpath(path.name).read_text(encoding="utf-8"))["attempts"] == 2
+        # dead/ 中的 entry 不再重送
+        assert spool.replay(lambda kind, objs: True)["replayed"] == 0
+        assert not list(tmp_path.glob(".*.tmp"))
+
+    def test_entry_claimed_by_another_replay(self, tmp_path):
+        spool = DeadLetterSpool(tmp_path, base_delay=0)
+        first = spool.push("news", [make_news(0)], "connection refused")
+        spool.push("news", [make_news(1)], "connection refused")
+
+        received = []
+        def handler(kind, objs):
+            # 另一個 process 在這之間取走了第一個 entry 以外的 entry
+            if not received:
+                for path in spool._entries():
+                    path.rename(path.with_name(path.name + ".claimed"))
+            received.append(objs[0].source_id)
+            return True
+
+        assert spool.replay(handler)["replayed"] == 1
+        assert received == ["k0"]
+        assert not first.exists()
+
+    def test_stale_claim_is_released(self, tmp_path):
+        spool = DeadLetterSpool(tmp_path, base_delay=0, claim_timeout=60)
+        path = spool.push("news", [make_news(0)], "connection refused")
+        claimed = path.with_name(path.name + ".claimed")
+        path.rename(claimed)  # 重送中的 process 中止
+        long_ago = datetime.datetime.now().timestamp() - 120
+        os.utime(claimed, (long_ago, long_ago))
+        assert len(spool) == 0
+        assert spool.replay(lambda kind, objs: True)["replayed"] == 1
+        assert not list(tmp_path.iterdir())
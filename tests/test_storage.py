@@ -0,0 +1,105 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_storage.py
+@Time    :  2026/10/19 11:40:19
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.storage import (MediaStore,
+                         RawStorage,
+                         migrate_raw_tree,
+                         read_raw,
+                         )
+from src.utils import HLSMediaDownloader
+
+class TestRawStorage:
+    def test_write_sharded_gzip(self, tmp_path):
+        storage = RawStorage(tmp_path, shard_depth=2, compression="gzip")
+        path = storage.write("k1", b"<html>k1</html>", ".html")
+
+        assert path.name == "k1.html.gz"
+        assert path.relative_to(tmp_path).parts[:2] == storage.shard_dir("k1").relative_to(tmp_path).parts
+        assert storage.read("k1", ".html") == b"<html>k1</html>"
+        assert list(storage.iter_files(".html")) == [path]
+
+    def test_write_zstd(self, tmp_path):
+        pytest.importorskip("zstandard")
+        storage = RawStorage(tmp_path, compression="zstd")
+        path = storage.write("k1", b"<html>k1</html>", ".html")
+        assert path.name == "k1.html.zst"
+        assert read_raw(path) == b"<html>k1</html>"
+
+    def test_rewrite_removes_stale_copy(self, tmp_path):
+        RawStorage(tmp_path, shard_depth=0, compression=None).write("k1", b"old", ".html")
+        storage = RawStorage(tmp_path, shard_depth=2, compression="gzip")
+        storage.write("k1", b"new", ".html")
+        assert not tmp_path.joinpath("k1.html").exists()
+        assert storage.read("k1", ".html") == b"new"
+
+    def test_concurrent_writes_of_same_key(self, tmp_path):
+        storage = RawStorage(tmp_path, shard_depth=2, compression=None)
+        payloads = [bytes([index]) * 100_000 for index in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            paths = set(executor.map(lambda data: storage.write("k1", data, ".html"), payloads * 4))
+        assert len(paths) == 1
+        assert read_raw(paths.pop()) in payloads  # 不會混到兩份寫入的內容
+        assert not list(tmp_path.rglob("*.tmp"))
+
+    def test_unknown_compression(self, tmp_path):
+        with pytest.raises(ValueError):
+            RawStorage(tmp_path, compression="lzma")
+
+class TestMigrate:
+    def test_migrate_flat_tree(self, tmp_path):
+        contents = tmp_path.joinpath("nhk_easy_web/contents")
+        voices = tmp_path.joinpath("nhk_easy_web/voices")
+        contents.mkdir(parents=True)
+        voices.mkdir(parents=True)
+        contents.joinpath("k1.html").write_bytes(b"<html>k1</html>")
+        voices.joinpath("v1.mp3").write_bytes(b"mp3")
+
+        results = migrate_raw_tree(tmp_path, shard_depth=2, compression="gzip")
+
+        assert len(results[contents]) == 1
+        assert len(results[voices]) == 1
+        assert not contents.joinpath("k1.html").exists()
+        assert results[voices][voices.joinpath("v1.mp3")].read_bytes() == b"mp3"
+        assert MediaStore(voices, shard_depth=2).get("v1").path == results[voices][voices.joinpath("v1.mp3")]
+        # 資料庫中仍記錄舊路徑時也能讀回
+        assert read_raw(contents.joinpath("k1.html")) == b"<html>k1</html>"
+        # 已轉換過的不會再搬一次
+        assert migrate_raw_tree(tmp_path, shard_depth=2, compression="gzip") == {contents: {}, voices: {}}
+
+class TestMediaStore:
+    def test_duplicate_content_shares_blob(self, tmp_path):
+        store = MediaStore(tmp_path)
+        first = store.put("v1", b"same clip", ".mp3")
+        second = store.put("v2", b"same clip", ".mp3")
+
+        assert first.path == second.path
+        assert first.size == len(b"same clip")
+        assert store.get("v2").digest == first.digest
+        assert len(list(tmp_path.joinpath("blobs").rglob("*.mp3"))) == 1
+
+    def test_get_detects_incomplete_blob(self, tmp_path):
+        store = MediaStore(tmp_path)
+        blob = store.put("v1", b"clip", ".mp3")
+        assert store.get("unknown") is None
+
+        blob.path.write_bytes(b"clap")  # 同大小但內容損毀
+        assert store.get("v1") is not None
+        assert store.get("v1", verify=True) is None
+
+        blob.path.write_bytes(b"cl")  # 下載中斷
+        assert store.get("v1") is None
+
+    def test_downloader_skips_stored_media(self, tmp_path):
+        store = MediaStore(tmp_path)
+        blob = store.put("v1", b"clip", ".mp3")
+        # 已存在完整檔案時不會去抓 m3u8
+        path = HLSMediaDownloader().save("http://invalid.invalid/index.m3u8", "v1.mp3", store=store)
+        assert path == blob.path
@@ -0,0 +1,66 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :  test_tracing.py
+@Time    :  2026/10/19 21:58:13
+@Author  :  Kevin Wang
+@Desc    :  None
+"""
+import json
+import time
+
+from benchmarks.fake_nhk import FakeNHKServer
+from src.crawler import NHKEasyWebCrawler
+from src.tracing import (NOOP_SPAN,
+                         profile_run,
+                         span,
+                         )
+from src.utils import ProjectConfigs
+# src 內的模組以 `tracing` 互相 import，爬蟲的 span 只會送到這個模組的 profile
+import tracing as crawler_tracing
+
+class TestTracing:
+    def test_noop_without_profile(self):
+        with span("idle") as traced:
+            assert traced is NOOP_SPAN
+
+    def test_nested_spans(self, tmp_path):
+        with profile_run("run", tmp_path) as profile:
+            for _ in range(2):
+                with span("outer") as outer:
+                    outer.add_bytes(10)
+                    with span("inner"):
+                        time.sleep(0.01)
+
+        stats = profile.stats()
+        assert set(stats) == {("run",), ("run", "outer"), ("run", "outer", "inner")}
+        outer, inner = stats[("run", "outer")], stats[("run", "outer", "inner")]
+        assert (outer.count, outer.bytes, inner.count) == (2, 20, 2)
+        assert inner.total >= 0.02
+        assert outer.self_time < outer.total - inner.total + 1e-6
+
+        json_path = next(tmp_path.glob("run-*.json"))
+        data = json.loads(json_path.read_text(encoding="utf-8"))
+        assert data["spans"][0]["path"] == "run"
+        folded = json_path.with_suffix(".folded").read_text(encoding="utf-8").splitlines()
+        assert "run;outer;inner" in [line.rsplit(" ", 1)[0] for line in folded]
+
+    def test_profile_off_without_directory(self, monkeypatch):
+        monkeypatch.setattr(ProjectConfigs, "TRACE_DIR", None)
+        with profile_run("run") as profile:
+            assert profile is None
+
+def test_crawler_profile(tmp_path, monkeypatch):
+    with FakeNHKServer(easy_news=2, segments=2, segment_size=1024) as server:
+        monkeypatch.setattr(ProjectConfigs, "NHK_WEB_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "NHK_VOD_BASE_URL", server.url)
+        monkeypatch.setattr(ProjectConfigs, "REQUEST_LAPSE", 0)
+        with crawler_tracing.profile_run("crawl", tmp_path / "profiles") as profile:
+            list(NHKEasyWebCrawler().iter_recent_news(save_dir=tmp_path))
+
+    stats = profile.stats()
+    assert stats[("crawl", "easy.news_list", "http.request")].count == 1
+    assert stats[("crawl", "easy.download_html", "parse")].count == 2
+    segments = stats[("crawl", "easy.download_voice", "hls.download", "hls.segment")]
+    assert (segments.count, segments.bytes) == (4, 4 * 1024)
+    assert stats[("crawl", "easy.download_voice", "hls.download", "hls.decrypt")].bytes == 4 * 1024
+    assert ("crawl", "news_json.write") in stats